@@ -17,9 +17,18 @@ bl_info = {
 }
 
 import bpy
+import fnmatch
+import hashlib
+import json
 import math
+import numpy as np
+import os
 import re
+import sys
+import time
 import urllib.request
+from contextlib import contextmanager
+from mathutils import Vector
 
 def _to_raw_github_url(url: str) -> str:
     """将 GitHub blob 页面 URL 转换为 raw 内容 URL"""
@@ -132,6 +141,2620 @@ def get_unique_base_name(original_base_name, existing_bones):
         test_base_name = f"{original_base_name}_{counter}"
         counter += 1
 
+def unique_base_names(original_base_name, count, existing_bones):
+    """一次取 count 个互不冲突的基础名称，结果与每建一条链后调用一次 get_unique_base_name 相同
+
+    只遍历一次骨骼，依次给出 original_base_name、original_base_name_1… 中未被占用的名称。
+    """
+    used = set()
+    for bone in existing_bones:
+        base, num = split_numbered_name(bone.name)
+        if num is not None:
+            used.add(base)
+    names, counter, test_base_name = [], 1, original_base_name
+    while len(names) < count:
+        if test_base_name not in used:
+            names.append(test_base_name)
+        test_base_name = f"{original_base_name}_{counter}"
+        counter += 1
+    return names
+
+def _get_addon_prefs():
+    """读取插件偏好设置，插件未注册（如直接运行脚本）时返回 None"""
+    try:
+        addon = bpy.context.preferences.addons.get(__name__ if __name__ != "__main__" else "damped_track_addon")
+        return addon.preferences if addon else None
+    except Exception:
+        return None
+
+# --- 核心API：显式传入数据，不依赖活动骨骼、选择状态和弹窗，可在脚本和 blender -b 中调用 ---
+#
+# 链描述 (chain) 是一个普通字典：
+#   armature    骨架对象名
+#   base_name   基础名称，变形骨骼为 base_name.001…
+#   deform      按顺序排列的变形骨骼名列表
+#   tip         末端骨骼名 (base_name.000)，没有时为 None
+#   controls    FK控制骨骼名列表 (build_fk 之后)
+#   shape       控制器自定义图形对象名 (build_fk 之后)
+#   collections [全部集合名, 第一根集合名] (build_fk 之后)
+#   tracked     带阻尼追踪约束的骨骼名列表 (apply_damped_track 之后)
+#   curve       样条IK曲线对象名 (apply_spline_ik 之后)
+#   bbone_segments  每根变形骨骼的 B-Bone 段数 (仅 subdivide_bbone_chain)
+
+SUBDIVIDE_MODES = ('FIB', 'AVERAGE')
+# 链在每帧求值时用到的约束类型
+CHAIN_CONSTRAINT_TYPES = {'COPY_ROTATION', 'DAMPED_TRACK', 'SPLINE_IK'}
+# 已烘焙链的记录保存在骨架对象的这个自定义属性上：{基础名: [起始帧, 结束帧, 步长]}
+BAKED_CHAINS_PROP = "cartilage_baked"
+# 烘焙前变形骨骼的旋转状态，撤销烘焙时原样恢复：{基础名: {"had_action": 0/1, "bones": {骨骼名: 记录}}}
+BAKE_BACKUP_PROP = "cartilage_bake_backup"
+# 注册到实时抖动的链：{基础名: 1}
+JIGGLE_CHAINS_PROP = "cartilage_jiggle"
+# 加入实时抖动前变形骨骼的旋转模式和旋转值，移出时恢复：{基础名: {骨骼名: 记录}}
+JIGGLE_BACKUP_PROP = "cartilage_jiggle_backup"
+
+def split_numbered_name(name):
+    """拆分形如 base.001 的名称，返回 (base, 数字)，没有数字后缀时数字为 None"""
+    base, sep, suffix = name.rpartition('.')
+    if sep and suffix.isdigit():
+        return base, int(suffix)
+    return name, None
+
+def resolve_chain_base_name(bone_name, bones):
+    """从链中任意一根骨骼（包括 ctr_ 控制骨骼）推断链的基础名称"""
+    if bone_name.startswith('ctr_'):
+        bone_name = bone_name[len('ctr_'):]
+    original_part, _ = split_numbered_name(bone_name)
+    if any(split_numbered_name(b.name)[0] == original_part for b in bones):
+        return original_part
+    # 处理可能包含下划线数字后缀的名称 (如 bone_1.001)，仅在原名不成链时回退
+    potential_base, sep, suffix = original_part.rpartition('_')
+    if sep and suffix.isdigit() and any(split_numbered_name(b.name)[0] == potential_base for b in bones):
+        return potential_base
+    return original_part
+
+def _collect_chain_names(bones, base_name):
+    """按编号收集链的变形骨骼名和末端骨骼名"""
+    numbered, tip = [], None
+    for b in bones:
+        base, num = split_numbered_name(b.name)
+        if base != base_name or num is None:
+            continue
+        if num == 0:
+            tip = b.name
+        else:
+            numbered.append((num, b.name))
+    numbered.sort()
+    return [name for _, name in numbered], tip
+
+def _chain_descriptor(armature, base_name, deform, tip=None):
+    return {
+        "armature": armature.name,
+        "base_name": base_name,
+        "deform": list(deform),
+        "tip": tip,
+        "controls": [],
+        "shape": None,
+        "collections": [],
+        "tracked": [],
+        "curve": None,
+    }
+
+def _ensure_mode(armature, mode):
+    """仅在需要时切换骨架的模式，已处于目标模式时不做任何事"""
+    if armature.mode == mode:
+        return
+    view_layer = bpy.context.view_layer
+    if view_layer.objects.active is not armature:
+        view_layer.objects.active = armature
+    bpy.ops.object.mode_set(mode=mode)
+
+def _select_bone(armature, bone_name):
+    """只选中指定骨骼并设为活动骨骼"""
+    arm = armature.data
+    bones = arm.edit_bones if armature.mode == 'EDIT' else arm.bones
+    target = bones.get(bone_name)
+    if not target:
+        return
+    for b in bones:
+        b.select = False
+    target.select = True
+    bones.active = target
+
+def _bone_head_tail(bone):
+    """返回骨骼在骨架空间的 (头, 尾)，编辑骨骼和 Bone 都适用"""
+    if isinstance(bone, bpy.types.Bone):
+        return bone.head_local, bone.tail_local
+    return bone.head, bone.tail
+
+def _remove_constraints(pose_bone, constraint_type):
+    """移除指定类型的约束，连同驱动其强度的驱动器一起删除"""
+    anim_data = pose_bone.id_data.animation_data
+    for const in [c for c in pose_bone.constraints if c.type == constraint_type]:
+        if anim_data:
+            fcurve = anim_data.drivers.find(const.path_from_id("influence"))
+            if fcurve:
+                anim_data.drivers.remove(fcurve)
+        pose_bone.constraints.remove(const)
+
+def _add_single_prop_driver(owner, path, index, var_name, target, data_path):
+    """添加一个直接读取单个属性的驱动器"""
+    fcurve = owner.driver_add(path, index) if index >= 0 else owner.driver_add(path)
+    driver = fcurve.driver
+    driver.expression = var_name
+    var = driver.variables.new()
+    var.name, var.type = var_name, 'SINGLE_PROP'
+    var.targets[0].id = target
+    var.targets[0].data_path = data_path
+    return fcurve
+
+def _shape_resolution():
+    """控制器圆环的顶点数，来自偏好设置"""
+    prefs = _get_addon_prefs()
+    return prefs.control_shape_resolution if prefs else 16
+
+def _circle_mesh(name, radius, vertices):
+    """创建只有边的圆环网格。自定义图形本身按线框绘制，不需要修改器，求值时直接使用这份网格"""
+    verts = [(radius * math.cos(2 * math.pi * i / vertices), radius * math.sin(2 * math.pi * i / vertices), 0.0)
+             for i in range(vertices)]
+    edges = [(i, (i + 1) % vertices) for i in range(vertices)]
+    mesh = bpy.data.meshes.new(name)
+    mesh.from_pydata(verts, edges, [])
+    return mesh
+
+def _create_circle_shape(armature, name, radius, vertices=None):
+    """用数据API创建圆环控制图形，不依赖 bpy.ops 和活动对象，vertices 为 None 时使用偏好中的分辨率"""
+    old_shape = bpy.data.objects.get(name)
+    if old_shape:
+        bpy.data.objects.remove(old_shape, do_unlink=True)
+
+    mesh = _circle_mesh(name, radius, vertices or _shape_resolution())
+    cir_shap = bpy.data.objects.new(name, mesh)
+    collection = armature.users_collection[0] if armature.users_collection else bpy.context.scene.collection
+    collection.objects.link(cir_shap)
+    cir_shap.location = armature.location
+    cir_shap.rotation_euler = (math.radians(90), 0, 0)
+    cir_shap.hide_render = True
+    cir_shap.hide_viewport = True # Compatibility fix for 4.x
+    return cir_shap
+
+def rebake_control_shape(shape, vertices=None):
+    """把控制器图形重建为指定分辨率、不带修改器的圆环，半径取原网格顶点到原点的最大距离"""
+    old = shape.data
+    co = np.empty(len(old.vertices) * 3, dtype=np.float32)
+    old.vertices.foreach_get("co", co)
+    radius = float(np.linalg.norm(co.reshape(-1, 3), axis=1).max()) if len(co) else 1.0
+    name = old.name
+    shape.modifiers.clear()
+    shape.data = _circle_mesh(name, radius, vertices or _shape_resolution())
+    if old.users == 0:
+        bpy.data.meshes.remove(old)
+        shape.data.name = name
+    return shape
+
+def rebake_control_shapes(vertices=None):
+    """把文件中所有本地的 cir_ctr_* / cir_lib_* 控制器图形重建为当前分辨率、不带修改器的圆环，返回处理数量"""
+    shapes = [o for o in bpy.data.objects
+              if o.name.startswith(("cir_ctr_", "cir_lib_")) and o.type == 'MESH' and o.library is None]
+    for shape in shapes:
+        rebake_control_shape(shape, vertices)
+    return len(shapes)
+
+# 共享控制器图形按半径的对数量化，相邻两档相差 5%，半径接近的链共用一个图形
+SHAPE_RADIUS_STEP = 1.05
+
+def control_shape_name(radius):
+    """返回半径量化后的共享图形名称和量化半径"""
+    key = round(math.log(max(radius, 1e-6)) / math.log(SHAPE_RADIUS_STEP))
+    quantised = SHAPE_RADIUS_STEP ** key
+    return f"cir_lib_{quantised:.4g}", quantised
+
+def control_shape(armature, radius):
+    """从共享图形库中取半径量化后的圆环控制图形，库中没有时创建一个"""
+    name, quantised = control_shape_name(radius)
+    shape = bpy.data.objects.get(name)
+    if shape is not None and shape.type == 'MESH':
+        # 旧版本生成的图形带线框修改器，或分辨率与当前偏好不同，原地重建，所有使用者随之更新
+        if shape.library is None and (shape.modifiers or len(shape.data.vertices) != _shape_resolution()):
+            rebake_control_shape(shape)
+        return shape
+    return _create_circle_shape(armature, name, quantised)
+
+# 本次会话中已从资产库链接的控制器图形：(库文件绝对路径, 对象名) -> ((对象名, 库的 filepath), 图形半径)
+_linked_shapes = {}
+
+def _shape_radius(shape):
+    """图形网格顶点到原点的最大距离"""
+    co = np.empty(len(shape.data.vertices) * 3, dtype=np.float32)
+    shape.data.vertices.foreach_get("co", co)
+    return float(np.linalg.norm(co.reshape(-1, 3), axis=1).max()) if len(co) else 0.0
+
+def find_linked_shape(path, object_name):
+    """查找当前文件中已从 path 链接的图形对象，不加载任何数据，返回 (对象, 半径)，没有时返回 (None, 0)"""
+    path = os.path.normpath(bpy.path.abspath(path))
+    cached = _linked_shapes.get((path, object_name))
+    if cached:
+        obj = bpy.data.objects.get(cached[0])
+        if obj is not None:
+            return obj, cached[1]
+    # 重新打开文件后缓存失效，但库可能已经链接在文件里
+    for library in bpy.data.libraries:
+        if os.path.normpath(bpy.path.abspath(library.filepath)) != path:
+            continue
+        obj = bpy.data.objects.get((object_name, library.filepath))
+        if obj is not None and obj.type == 'MESH':
+            _linked_shapes[(path, object_name)] = ((object_name, library.filepath), _shape_radius(obj))
+            return obj, _linked_shapes[(path, object_name)][1]
+    return None, 0.0
+
+def linked_control_shape(path, object_name):
+    """从资产库 .blend 链接（而不是追加）控制器图形对象，每个会话只加载一次
+
+    所有链和所有文件共用库中的同一份数据，不在当前文件中创建网格。
+    返回 (对象, 半径)，库文件或对象不存在时返回 (None, 0)。
+    """
+    obj, radius = find_linked_shape(path, object_name)
+    if obj is not None:
+        return obj, radius
+    abs_path = os.path.normpath(bpy.path.abspath(path))
+    if not os.path.isfile(abs_path):
+        return None, 0.0
+    with bpy.data.libraries.load(abs_path, link=True) as (data_from, data_to):
+        data_to.objects = [object_name] if object_name in data_from.objects else []
+    obj = data_to.objects[0] if data_to.objects else None
+    if obj is None or obj.type != 'MESH':
+        return None, 0.0
+    radius = _shape_radius(obj)
+    _linked_shapes[(abs_path, object_name)] = ((obj.name, obj.library.filepath), radius)
+    return obj, radius
+
+def _mesh_bytes(mesh):
+    """粗略估算网格数据占用的内存：坐标、边、面角和面"""
+    return len(mesh.vertices) * 12 + len(mesh.edges) * 8 + len(mesh.loops) * 8 + len(mesh.polygons) * 12
+
+def collect_control_shape_garbage(remove=True):
+    """找出没有任何姿态骨骼使用的 cir_* 控制器图形，以及链已经不存在的空 ctrl_*_all/_first 骨骼集合
+
+    链仍有 base.001… 变形骨骼时，即使它的控制集合是空的（用户手动清空）也会保留。
+    只遍历一次 bpy.data 中的骨架，用集合索引判断引用。remove 为 False 时只统计不删除。
+    返回 (图形对象数, 骨骼集合数, 估算回收的字节数)。
+    """
+    used = set()
+    stale = []
+    for obj in bpy.data.objects:
+        if obj.type != 'ARMATURE' or obj.pose is None:
+            continue
+        used.update(pb.custom_shape.name for pb in obj.pose.bones if pb.custom_shape)
+    for arm in bpy.data.armatures:
+        if arm.library:
+            continue
+        # 与 list_chains 相同的判断：存在编号大于 0 的骨骼即认为链还在
+        live = set()
+        for bone in (arm.edit_bones if arm.is_editmode else arm.bones):
+            base, num = split_numbered_name(bone.name)
+            if num:
+                live.add(base)
+        for c in arm.collections_all:
+            if not c.name.startswith("ctrl_") or len(c.bones):
+                continue
+            for suffix in ("_all", "_first"):
+                if c.name.endswith(suffix) and c.name[len("ctrl_"):-len(suffix)] not in live:
+                    stale.append((arm, c))
+                    break
+
+    orphans = [o for o in bpy.data.objects
+               if o.name.startswith(("cir_ctr_", "cir_lib_")) and o.type == 'MESH' and o.library is None
+               and o.name not in used]
+    reclaimed = sum(_mesh_bytes(o.data) for o in orphans if o.data.users == 1)
+    if remove:
+        for obj in orphans:
+            mesh = obj.data
+            bpy.data.objects.remove(obj, do_unlink=True)
+            if mesh.users == 0:
+                bpy.data.meshes.remove(mesh)
+        for arm, collection in stale:
+            arm.collections.remove(collection)
+    return len(orphans), len(stale), reclaimed
+
+# 斐波那契细分中单段长度占整根骨骼的最小比例
+MIN_SEGMENT_FRACTION = 1e-5
+
+def segment_lengths(length, segments, mode='FIB', coefficient=1.0):
+    """按细分模式计算由根到梢的每段骨骼长度"""
+    if mode == 'FIB':
+        fib = [1.0, 1.0]
+        for i in range(2, segments):
+            fib.append(fib[-1] + coefficient * fib[-2])
+            # 段数很多时数列会溢出，整体缩小不影响比例
+            if fib[-1] > 1e200:
+                fib = [f * 1e-200 for f in fib]
+        fib = fib[:segments]
+        fib = fib[::-1]
+        sum_f = sum(fib)
+        # 极端的段数和系数下最短的段会趋近于零，Blender 会删除零长度骨骼，这里保留一个下限
+        fractions = [max(f / sum_f, MIN_SEGMENT_FRACTION) for f in fib]
+        sum_f = sum(fractions)
+        return [(f / sum_f) * length for f in fractions]
+    return [length / segments] * segments
+
+def density_bounds(t, normals, segments, bins=128, curvature_weight=1.0, floor=0.1):
+    """由顶点在骨骼轴上的投影比例 t (0…1) 和顶点法线计算各段边界比例 (段+1,)，只依赖 NumPy
+
+    沿骨骼轴做直方图：顶点越密、同一区间内法线方向越分散（曲率越大）的区域分到的段越短。
+    floor 为均匀分布的保底权重占比，避免没有顶点的区域只分到零长度。
+    """
+    edges = np.linspace(0.0, 1.0, bins + 1)
+    uniform = np.linspace(0.0, 1.0, segments + 1)
+    if len(t) == 0:
+        return uniform
+    idx = np.minimum((np.asarray(t) * bins).astype(np.int64), bins - 1)
+    counts = np.bincount(idx, minlength=bins).astype(np.float64)
+    weight = counts / counts.sum()
+    if normals is not None and curvature_weight > 0.0:
+        summed = np.stack([np.bincount(idx, normals[:, k], minlength=bins) for k in range(3)], axis=1)
+        # 区间内平均法线越短，说明法线越分散
+        spread = 1.0 - np.linalg.norm(summed, axis=1) / np.maximum(counts, 1.0)
+        weight *= 1.0 + curvature_weight * np.where(counts > 0, spread, 0.0)
+        weight /= weight.sum()
+    weight = (1.0 - floor) * weight + floor / bins
+    cdf = np.concatenate([[0.0], np.cumsum(weight)])
+    return np.interp(uniform, cdf / cdf[-1], edges)
+
+def bone_mesh_samples(armature, head, tail, radius_scale=0.5):
+    """收集绑定到骨架的网格中位于骨骼附近的顶点，返回 (轴向比例 t, 法线)
+
+    只取投影落在骨骼范围内、到骨骼轴的距离小于骨骼长度乘 radius_scale 的顶点。
+    """
+    head, tail = np.asarray(head, dtype=np.float64), np.asarray(tail, dtype=np.float64)
+    axis = tail - head
+    length_sq = axis @ axis
+    radius = np.sqrt(length_sq) * radius_scale
+    arm_inv = np.array(armature.matrix_world.inverted())
+    ts, normals = [], []
+    for obj in bpy.data.objects:
+        if obj.type != 'MESH' or not any(m.type == 'ARMATURE' and m.object == armature for m in obj.modifiers):
+            continue
+        mesh = obj.data
+        count = len(mesh.vertices)
+        co = np.empty(count * 3, dtype=np.float32)
+        no = np.empty(count * 3, dtype=np.float32)
+        mesh.vertices.foreach_get("co", co)
+        mesh.vertices.foreach_get("normal", no)
+        to_arm = arm_inv @ np.array(obj.matrix_world)
+        points = co.reshape(-1, 3) @ to_arm[:3, :3].T + to_arm[:3, 3]
+        t = (points - head) @ axis / length_sq
+        dist = np.linalg.norm(points - head - t[:, None] * axis, axis=1)
+        near = (t >= 0.0) & (t <= 1.0) & (dist <= radius)
+        n = no.reshape(-1, 3)[near] @ to_arm[:3, :3].T
+        ts.append(t[near])
+        normals.append(n / np.maximum(np.linalg.norm(n, axis=1, keepdims=True), 1e-12))
+    if not ts:
+        return np.zeros(0), np.zeros((0, 3))
+    return np.concatenate(ts), np.concatenate(normals)
+
+def chain_bone_name(base_name, index, segments):
+    """返回链中第 index 根骨骼的名称（0 为末端骨骼），编号至少三位，段数更多时按需加宽"""
+    return f"{base_name}.{index:0{max(3, len(str(segments)))}d}"
+
+def _build_chain_bones(edit_bones, base_name, joints, parent, add_tip):
+    """沿关节点 joints (段+1, 3) 创建 base.001…base.NNN 骨骼，add_tip 时再加一根 .000 末端骨骼
+
+    返回 (变形骨骼列表, 末端骨骼或 None)。每根骨骼只做一次创建和赋值，耗时与段数成线性关系。
+    """
+    segments = len(joints) - 1
+    points = [Vector(p) for p in joints]
+    new_bones = []
+    for i in range(segments):
+        new_bone = edit_bones.new(chain_bone_name(base_name, i + 1, segments))
+        new_bone.head, new_bone.tail = points[i], points[i + 1]
+        new_bone.use_deform = True
+        new_bone.parent = new_bones[-1] if new_bones else parent
+        new_bones.append(new_bone)
+
+    tip = None
+    if add_tip:
+        last_bone = new_bones[-1]
+        tip = edit_bones.new(chain_bone_name(base_name, 0, segments))
+        tip.head = last_bone.tail
+        tip.tail = last_bone.tail + (last_bone.tail - last_bone.head)
+        tip.use_deform = True
+        tip.parent = last_bone
+    return new_bones, tip
+
+# 可选的权重量化精度：开启后写入顶点组前把权重取整到该精度，使 vertex_groups.add 的调用次数与顶点数无关
+WEIGHT_QUANTUM = 1.0 / 1024.0
+# 自动精度下网格顶点数超过该值时量化写入，否则按原值写入（逐值调用 add 的耗时与顶点数成正比）
+EXACT_WEIGHT_MAX_VERTICES = 50000
+# 权重精度选项：自动、原值、量化，对应 weight_quantum 为 None、0、WEIGHT_QUANTUM
+WEIGHT_PRECISION_ITEMS = [
+    ('AUTO', "自动", f"网格不超过 {EXACT_WEIGHT_MAX_VERTICES} 个顶点时按原值写入，更大的网格量化写入"),
+    ('EXACT', "原值", "按计算出的原值写入，权重之和与原权重一致，超大网格上较慢"),
+    ('QUANTIZED', "量化", "取整到 1/1024 后批量写入，写入次数与顶点数无关，每个权重最多有约 0.0005 的误差"),
+]
+WEIGHT_PRECISION_QUANTUM = {'AUTO': None, 'EXACT': 0.0, 'QUANTIZED': WEIGHT_QUANTUM}
+
+def resolve_weight_quantum(weight_quantum, vertex_count):
+    """weight_quantum 为 None 时按网格顶点数自动选择原值写入或量化写入，否则原样返回"""
+    if weight_quantum is None:
+        return WEIGHT_QUANTUM if vertex_count > EXACT_WEIGHT_MAX_VERTICES else 0.0
+    return weight_quantum
+
+def split_weights_along_axis(points, weights, head, tail, bounds, falloff=0.5):
+    """把一根骨骼的权重按到骨骼轴的投影分配给细分后的各段，只依赖 NumPy
+
+    points (顶点, 3) 与 head/tail 位于同一空间，bounds 为各段边界在骨骼上的比例（0…1，共 段+1 个）。
+    falloff 为相邻两段中心之间的平滑过渡宽度比例，0 为硬切分。
+    返回 (顶点索引, 段索引, 权重)，每个顶点最多分给相邻两段，两段权重之和等于原权重。
+    """
+    head, tail = np.asarray(head, dtype=np.float64), np.asarray(tail, dtype=np.float64)
+    axis = tail - head
+    t = np.clip((np.asarray(points, dtype=np.float64) - head) @ axis / (axis @ axis), 0.0, 1.0)
+    bounds = np.asarray(bounds, dtype=np.float64)
+    centers = 0.5 * (bounds[:-1] + bounds[1:])
+    verts = np.arange(len(t))
+    if len(centers) == 1:
+        return verts, np.zeros(len(t), dtype=np.int64), np.asarray(weights, dtype=np.float64)
+
+    seg = np.clip(np.searchsorted(centers, t) - 1, 0, len(centers) - 2)
+    u = np.clip((t - centers[seg]) / (centers[seg + 1] - centers[seg]), 0.0, 1.0)
+    if falloff > 0.0:
+        u = np.clip((u - 0.5) / falloff + 0.5, 0.0, 1.0)
+        u = u * u * (3.0 - 2.0 * u)
+    else:
+        u = (u >= 0.5).astype(np.float64)
+    return (np.concatenate([verts, verts]), np.concatenate([seg, seg + 1]),
+            np.concatenate([weights * (1.0 - u), weights * u]))
+
+def _read_group_weights(obj, groups):
+    """一次遍历顶点读取多个顶点组的权重，返回 (顶点数, 组数) 数组，不在组中的顶点为 0"""
+    # Blender 没有批量读取形变权重的接口，只能逐顶点遍历；所有组共用这一次遍历
+    columns = {group.index: k for k, group in enumerate(groups)}
+    rows, cols, values = [], [], []
+    for v in obj.data.vertices:
+        for g in v.groups:
+            k = columns.get(g.group)
+            if k is not None:
+                rows.append(v.index)
+                cols.append(k)
+                values.append(g.weight)
+    weights = np.zeros((len(obj.data.vertices), len(groups)))
+    weights[rows, cols] = values
+    return weights
+
+def _write_group_weights(group, verts, values, mode='REPLACE', quantum=0.0):
+    """按权重值分组批量写入顶点组，每个不同的权重值只调用一次 add
+
+    quantum 为 0 时写入原值，调用次数等于不同权重值的个数；大于 0 时先把权重取整到该精度，
+    调用次数不超过 1/quantum，但权重会有最多 quantum/2 的误差。
+    """
+    if not len(values):
+        return
+    values = np.asarray(values, dtype=np.float64)
+    if quantum > 0.0:
+        values = np.rint(values / quantum) * quantum
+    order = np.argsort(values, kind='stable')
+    values, verts = values[order], np.asarray(verts)[order]
+    starts = np.flatnonzero(np.r_[True, values[1:] != values[:-1]])
+    for start, stop in zip(starts, np.r_[starts[1:], len(values)]):
+        if values[start] > 0.0:
+            group.add(verts[start:stop].tolist(), float(values[start]), mode)
+
+def _bound_meshes(armature):
+    """返回带有指向该骨架的骨架修改器的网格对象"""
+    return [obj for obj in bpy.data.objects if obj.type == 'MESH' and
+            any(m.type == 'ARMATURE' and m.object == armature for m in obj.modifiers)]
+
+def cache_source_weights(armature, source_names, weight_cache):
+    """把绑定网格中 source_names 各顶点组的 (顶点索引, 骨架空间坐标, 权重) 存入 weight_cache
+
+    键为 (网格名, 顶点组名)，已缓存的跳过。每个网格只遍历一次顶点，读取全部尚未缓存的组。
+    """
+    arm_inv = np.array(armature.matrix_world.inverted())
+    for obj in _bound_meshes(armature):
+        groups = [obj.vertex_groups[name] for name in dict.fromkeys(source_names)
+                  if (obj.name, name) not in weight_cache and name in obj.vertex_groups]
+        if not groups:
+            continue
+        mesh = obj.data
+        co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+        mesh.vertices.foreach_get("co", co)
+        to_arm = arm_inv @ np.array(obj.matrix_world)
+        points = co.reshape(-1, 3) @ to_arm[:3, :3].T + to_arm[:3, 3]
+        weights = _read_group_weights(obj, groups)
+        for k, group in enumerate(groups):
+            in_group = np.flatnonzero(weights[:, k] > 0.0)
+            weight_cache[(obj.name, group.name)] = (in_group, points[in_group], weights[in_group, k])
+
+def read_source_weights(armature, source_name, weight_cache=None):
+    """读取绑定网格中名为 source_name 的顶点组，返回 [(网格对象, (顶点索引, 骨架空间坐标, 权重))]
+
+    weight_cache 为字典时优先使用其中已读取的结果（原顶点组已删除时也可用），并把新读取的结果存入其中。
+    同时要读多个组时先用 cache_source_weights 一次读出。
+    """
+    if weight_cache is None:
+        weight_cache = {}
+    cache_source_weights(armature, [source_name], weight_cache)
+    return [(obj, weight_cache[(obj.name, source_name)]) for obj in _bound_meshes(armature)
+            if (obj.name, source_name) in weight_cache]
+
+def clear_vertex_groups(armature, names):
+    """删除绑定网格中指定名称的顶点组，返回删除的数量"""
+    removed = 0
+    for obj in _bound_meshes(armature):
+        for name in names:
+            group = obj.vertex_groups.get(name)
+            if group:
+                obj.vertex_groups.remove(group)
+                removed += 1
+    return removed
+
+def split_vertex_groups(armature, source_name, head, tail, target_names, bounds, falloff=0.5, weight_cache=None,
+                        weight_quantum=None, accumulate=False):
+    """把绑定到骨架的网格中名为 source_name 的顶点组拆分到 target_names 各段并删除原顶点组
+
+    head/tail 为原骨骼在骨架空间的位置，bounds 为各段边界比例。accumulate 为 False 时先清空
+    同名的目标顶点组，重复执行或有残留的同名组时权重不会叠加；为 True 时累加到目标组已有的权重上，
+    用于多根原骨骼拆分到同一段，调用方需要在第一次拆分前用 clear_vertex_groups 清空目标组。
+    weight_cache 的含义同 read_source_weights。weight_quantum 为 0 时写入原值，大于 0 时按该精度量化后写入
+    （见 WEIGHT_QUANTUM），为 None 时按网格顶点数自动选择（见 resolve_weight_quantum）。返回处理的网格对象数量。
+    """
+    count = 0
+    for obj, (in_group, points, weights) in read_source_weights(armature, source_name, weight_cache):
+        verts, segs, values = split_weights_along_axis(points, weights, head, tail, bounds, falloff)
+        verts = in_group[verts]
+        quantum = resolve_weight_quantum(weight_quantum, len(obj.data.vertices))
+        source = obj.vertex_groups.get(source_name)
+        if source:
+            obj.vertex_groups.remove(source)
+        for j, name in enumerate(target_names):
+            group = obj.vertex_groups.get(name)
+            if group and not accumulate:
+                obj.vertex_groups.remove(group)
+                group = None
+            group = group or obj.vertex_groups.new(name=name)
+            picked = segs == j
+            _write_group_weights(group, verts[picked], values[picked], 'ADD', quantum)
+        count += 1
+    return count
+
+def segment_distances(points, heads, tails):
+    """计算每个点到每根骨骼线段的距离，返回 (点, 骨骼)，只依赖 NumPy"""
+    # 展开成矩阵乘法，避免生成 (点, 骨骼, 3) 的临时数组
+    axis = tails - heads
+    length_sq = np.maximum((axis * axis).sum(axis=1), 1e-12)
+    rel_axis = points @ axis.T - (heads * axis).sum(axis=1)
+    rel_sq = (points * points).sum(axis=1)[:, None] - 2.0 * (points @ heads.T) + (heads * heads).sum(axis=1)
+    t = np.clip(rel_axis / length_sq, 0.0, 1.0)
+    return np.sqrt(np.maximum(rel_sq - 2.0 * t * rel_axis + t * t * length_sq, 0.0))
+
+def top_k_weights(verts, bones, dists, vertex_count, max_influences=4, falloff=2.0):
+    """从 (顶点, 骨骼, 距离) 候选中为每个顶点保留最近的 max_influences 根骨骼并归一化
+
+    权重与距离的 falloff 次方成反比。返回过滤后的 (顶点, 骨骼, 权重)，只依赖 NumPy。
+    """
+    order = np.lexsort((dists, verts))
+    verts, bones, dists = verts[order], bones[order], dists[order]
+    first = np.searchsorted(verts, np.arange(vertex_count))
+    rank = np.arange(len(verts)) - first[verts]
+    keep = rank < max_influences
+    verts, bones, dists = verts[keep], bones[keep], dists[keep]
+    weights = 1.0 / np.maximum(dists, 1e-6) ** falloff
+    weights /= np.bincount(verts, weights, minlength=vertex_count)[verts]
+    return verts, bones, weights
+
+def envelope_skin(armature, mesh_obj, bone_names=None, max_influences=4, falloff=2.0, use_kdtree=True,
+                  search_scale=1.0, max_pairs=1 << 20, weight_quantum=None):
+    """按顶点到骨骼线段的距离为网格计算权重，批量写入顶点组并添加骨架修改器
+
+    bone_names 默认为所有形变骨骼。use_kdtree 时先用 mathutils.kdtree 为每根骨骼查找半径
+    （骨骼长度的一半乘 search_scale 再加半个骨骼长度）内的顶点，只对这些候选计算距离；
+    没有落入任何骨骼范围的顶点再与全部骨骼计算。weight_quantum 的含义同 split_vertex_groups。
+    返回写入的 (顶点组数, 权重数)。
+    """
+    bones = armature.data.bones
+    names = [n for n in (bone_names or [b.name for b in bones if b.use_deform]) if n in bones]
+    if not names:
+        return 0, 0
+    arm_world = np.array(armature.matrix_world)
+    heads = np.array([bones[n].head_local for n in names]) @ arm_world[:3, :3].T + arm_world[:3, 3]
+    tails = np.array([bones[n].tail_local for n in names]) @ arm_world[:3, :3].T + arm_world[:3, 3]
+
+    mesh = mesh_obj.data
+    vertex_count = len(mesh.vertices)
+    co = np.empty(vertex_count * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", co)
+    mesh_world = np.array(mesh_obj.matrix_world)
+    points = co.reshape(-1, 3).astype(np.float64) @ mesh_world[:3, :3].T + mesh_world[:3, 3]
+
+    pair_verts, pair_bones, pair_dists = [], [], []
+    remaining = np.arange(vertex_count)
+    if use_kdtree:
+        from mathutils import kdtree
+        tree = kdtree.KDTree(vertex_count)
+        for i, p in enumerate(points):
+            tree.insert(p, i)
+        tree.balance()
+        covered = np.zeros(vertex_count, dtype=bool)
+        for b in range(len(names)):
+            half = 0.5 * np.linalg.norm(tails[b] - heads[b])
+            found = tree.find_range(0.5 * (heads[b] + tails[b]), half * (1.0 + search_scale))
+            if not found:
+                continue
+            idx = np.fromiter((f[1] for f in found), dtype=np.int64, count=len(found))
+            pair_verts.append(idx)
+            pair_bones.append(np.full(len(idx), b))
+            pair_dists.append(segment_distances(points[idx], heads[b:b + 1], tails[b:b + 1])[:, 0])
+            covered[idx] = True
+        remaining = np.flatnonzero(~covered)
+
+    # 未被任何骨骼范围覆盖的顶点分块与全部骨骼计算，每块先取最近的几根骨骼，限制临时数组大小
+    step = max(1, max_pairs // len(names))
+    k = min(max_influences, len(names))
+    for start in range(0, len(remaining), step):
+        idx = remaining[start:start + step]
+        dists = segment_distances(points[idx], heads, tails)
+        nearest = np.argpartition(dists, k - 1, axis=1)[:, :k]
+        pair_verts.append(np.repeat(idx, k))
+        pair_bones.append(nearest.ravel())
+        pair_dists.append(np.take_along_axis(dists, nearest, axis=1).ravel())
+
+    verts, bone_idx, weights = top_k_weights(np.concatenate(pair_verts), np.concatenate(pair_bones),
+                                             np.concatenate(pair_dists), vertex_count, max_influences, falloff)
+    quantum = resolve_weight_quantum(weight_quantum, vertex_count)
+    for b, name in enumerate(names):
+        group = mesh_obj.vertex_groups.get(name)
+        if group:
+            mesh_obj.vertex_groups.remove(group)
+        group = mesh_obj.vertex_groups.new(name=name)
+        picked = bone_idx == b
+        _write_group_weights(group, verts[picked], weights[picked], quantum=quantum)
+
+    if not any(m.type == 'ARMATURE' and m.object == armature for m in mesh_obj.modifiers):
+        mod = mesh_obj.modifiers.new(name="Armature", type='ARMATURE')
+        mod.object = armature
+    if mesh_obj.parent != armature:
+        world = mesh_obj.matrix_world.copy()
+        mesh_obj.parent = armature
+        mesh_obj.matrix_world = world
+    return len(names), len(verts)
+
+def find_chain(armature, bone_name):
+    """根据链中任意一根骨骼查找已有的链，返回链描述，找不到时返回 None"""
+    arm = armature.data
+    bones = arm.edit_bones if armature.mode == 'EDIT' else arm.bones
+    base_name = resolve_chain_base_name(bone_name, bones)
+    deform, tip = _collect_chain_names(bones, base_name)
+    if not deform:
+        return None
+    chain = _chain_descriptor(armature, base_name, deform, tip)
+    controls = [f"ctr_{name}" for name in deform]
+    if all(bones.get(name) for name in controls):
+        chain["controls"] = controls
+    collection_names = [f"ctrl_{base_name}_all", f"ctrl_{base_name}_first"]
+    if all(name in arm.collections_all for name in collection_names):
+        chain["collections"] = collection_names
+    # 共享图形库中的图形不带链名，优先从第一根控制骨骼上读取
+    first_control = armature.pose.bones.get(controls[0]) if chain["controls"] else None
+    shape_name = f"cir_ctr_{base_name}"
+    if first_control and first_control.custom_shape:
+        chain["shape"] = first_control.custom_shape.name
+    elif shape_name in bpy.data.objects:
+        chain["shape"] = shape_name
+    curve_name = f"spl_{base_name}"
+    if curve_name in bpy.data.objects:
+        chain["curve"] = curve_name
+    return chain
+
+def list_chains(armature):
+    """列出骨架上所有已生成FK绑定的链，以 ctrl_<base>_all / ctrl_<base>_first 集合对为索引
+
+    只遍历一次骨骼和集合，适合有上百条链的骨架。
+    """
+    arm = armature.data
+    bones = arm.edit_bones if armature.mode == 'EDIT' else arm.bones
+    grouped = {}
+    for b in bones:
+        base, num = split_numbered_name(b.name)
+        if num is not None:
+            grouped.setdefault(base, []).append((num, b.name))
+
+    collection_names = {c.name for c in arm.collections_all}
+    chains = []
+    for name in sorted(collection_names):
+        if not (name.startswith("ctrl_") and name.endswith("_all")):
+            continue
+        base_name = name[len("ctrl_"):-len("_all")]
+        if f"ctrl_{base_name}_first" not in collection_names or base_name not in grouped:
+            continue
+        numbered = sorted(grouped[base_name])
+        deform = [n for num, n in numbered if num > 0]
+        tip = next((n for num, n in numbered if num == 0), None)
+        if not deform:
+            continue
+        chain = _chain_descriptor(armature, base_name, deform, tip)
+        chain["controls"] = [f"ctr_{n}" for n in deform]
+        chain["collections"] = [name, f"ctrl_{base_name}_first"]
+        chains.append(chain)
+    return chains
+
+def _single_bone_joints(armature, head, tail, segments, mode='FIB', coefficient=1.0, density_blend=0.0, plan=None):
+    """返回单根骨骼细分后的关节点 (段+1, 3) 和各段长度列表，plan 不为 None 时缓存网格采样"""
+    head, tail = np.asarray(head, dtype=np.float64), np.asarray(tail, dtype=np.float64)
+    length = float(np.linalg.norm(tail - head))
+    lengths = segment_lengths(length, segments, mode, coefficient)
+    if density_blend > 0.0:
+        samples = plan.get("samples") if plan is not None else None
+        if samples is None:
+            samples = bone_mesh_samples(armature, head, tail)
+            if plan is not None:
+                plan["samples"] = samples
+        t, normals = samples
+        if len(t):
+            base = np.concatenate([[0.0], np.cumsum(lengths)]) / length
+            bounds = (1.0 - density_blend) * base + density_blend * density_bounds(t, normals, segments)
+            lengths = list(np.diff(bounds) * length)
+    offsets = np.concatenate([[0.0], np.cumsum(lengths)])
+    return head + offsets[:, None] * ((tail - head) / length), lengths
+
+def subdivide_chain(armature, bone_name, segments, mode='FIB', coefficient=1.0, add_tip=None,
+                    split_weights=True, weight_falloff=0.5, density_blend=0.0, plan=None, weight_quantum=None):
+    """将单根骨骼细分为 base.001…base.NNN 链并返回链描述，无法细分时返回 None
+
+    add_tip 为 None 时按模式决定：斐波那契细分生成 .000 末端骨骼，平均细分不生成。
+    split_weights 时把绑定网格中原骨骼的顶点组按位置拆分到各段，weight_falloff 为段间过渡宽度，
+    weight_quantum 的含义同 split_vertex_groups。
+    density_blend 大于 0 时按绑定网格沿骨骼的顶点密度和曲率调整分段位置，1 为完全按密度分布。
+    plan 为 plan_subdivision 返回的计划时直接使用其中的基础名称和子骨骼，不再扫描全部骨骼。
+    """
+    _ensure_mode(armature, 'EDIT')
+    edit_bones = armature.data.edit_bones
+    bone = edit_bones.get(bone_name)
+    if bone is None or bone.length == 0:
+        return None
+    if add_tip is None:
+        add_tip = mode == 'FIB'
+
+    parent = bone.parent
+    head, tail = bone.head.copy(), bone.tail.copy()
+
+    if plan is not None and not plan["rescan"][0]:
+        children = [edit_bones[name] for name in plan["children"][0]]
+    else:
+        children = [c for c in edit_bones if c.parent == bone]
+    if plan is not None:
+        base_name = plan["base_name"]
+    else:
+        # Extract base name and find a unique base name that doesn't conflict with existing bones
+        original_base_name, _ = split_numbered_name(bone.name)
+        base_name = get_unique_base_name(original_base_name, edit_bones)
+
+    source_name = bone.name
+    joints, lengths = _single_bone_joints(armature, head, tail, segments, mode, coefficient, density_blend, plan)
+    new_bones, tip = _build_chain_bones(edit_bones, base_name, joints, parent, add_tip)
+    tip_name = tip.name if tip else None
+
+    for child in children:
+        child.parent = tip or new_bones[-1]
+    deform_names = [b.name for b in new_bones]
+    edit_bones.remove(bone)
+    if split_weights:
+        bounds = np.concatenate([[0.0], np.cumsum(lengths)]) / sum(lengths)
+        split_vertex_groups(armature, source_name, head, tail, deform_names, bounds, weight_falloff,
+                            plan["weights"] if plan is not None else None, weight_quantum)
+    return _chain_descriptor(armature, base_name, deform_names, tip_name)
+
+def subdivide_bbone_chain(armature, bone_name, segments, controllers=3, mode='AVERAGE', coefficient=1.0):
+    """用少量真实骨骼加 B-Bone 段数代替逐段细分，返回链描述
+
+    链由 controllers 根变形骨骼和 .000 末端骨骼组成，弯曲由 B-Bone 曲线平滑，
+    每根骨骼的 B-Bone 段数合计约为 segments。返回的链可以直接交给 build_fk 和 apply_damped_track。
+    """
+    controllers = max(1, min(controllers, segments))
+    chain = subdivide_chain(armature, bone_name, controllers, mode, coefficient, add_tip=True)
+    if chain is None:
+        return None
+
+    # B-Bone 段数上限为 32
+    bbone_segments = max(1, min(32, round(segments / controllers)))
+    edit_bones = armature.data.edit_bones
+    for i, name in enumerate(chain["deform"] + [chain["tip"]]):
+        eb = edit_bones[name]
+        # 相连的骨骼才能让自动手柄沿整条链平滑过渡
+        eb.use_connect = i > 0
+        eb.bbone_segments = bbone_segments if name != chain["tip"] else 1
+        eb.bbone_handle_type_start = 'AUTO'
+        eb.bbone_handle_type_end = 'AUTO'
+    chain["bbone_segments"] = bbone_segments
+    return chain
+
+def resample_polyline(points, fractions):
+    """按弧长比例在折线上插值，返回 (len(fractions), 3)，只依赖 NumPy"""
+    points = np.asarray(points, dtype=np.float64)
+    seg = np.linalg.norm(np.diff(points, axis=0), axis=1)
+    # 去掉重合的点，保证弧长严格递增
+    keep = np.r_[True, seg > 1e-9]
+    points, seg = points[keep], seg[keep[1:]]
+    arc = np.concatenate([[0.0], np.cumsum(seg)])
+    target = np.asarray(fractions, dtype=np.float64) * arc[-1]
+    return np.stack([np.interp(target, arc, points[:, k]) for k in range(3)], axis=1)
+
+def resample_polylines(polylines, fractions):
+    """按弧长比例同时在多条折线上插值，返回 (折线数, len(fractions), 3)，只依赖 NumPy
+
+    每条折线的弧长归一化到 0…1 后加上 2×折线序号，拼成一条严格递增的键，所有折线只做一次插值。
+    每条折线的总长需大于 0。
+    """
+    fractions = np.asarray(fractions, dtype=np.float64)
+    if not len(polylines):
+        return np.zeros((0, len(fractions), 3))
+    sizes = np.array([len(p) for p in polylines])
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    points = np.concatenate(polylines).astype(np.float64)
+    line = np.repeat(np.arange(len(sizes)), sizes)
+    seg = np.linalg.norm(np.diff(points, axis=0), axis=1)
+    seg[starts[1:] - 1] = 0.0
+    arc = np.concatenate([[0.0], np.cumsum(seg)])
+    arc -= arc[starts][line]
+    total = arc[starts + sizes - 1]
+    # 去掉重合的点，保证键严格递增
+    keep = np.r_[True, seg > 1e-9]
+    keep[starts] = True
+    keys = (2.0 * line + arc / total[line])[keep]
+    target = (2.0 * np.arange(len(sizes))[:, None] + fractions).ravel()
+    out = np.stack([np.interp(target, keys, points[keep, k]) for k in range(3)], axis=1)
+    return out.reshape(len(sizes), len(fractions), 3)
+
+def _spline_polyline(spline):
+    """返回样条线的折线点 (点, 3)
+
+    贝塞尔样条按 resolution_u 批量求值三次曲线；多段线直接取控制点；NURBS 以控制点近似。
+    """
+    if spline.type == 'BEZIER':
+        count = len(spline.bezier_points)
+        co, left, right = (np.empty(count * 3, dtype=np.float32) for _ in range(3))
+        spline.bezier_points.foreach_get("co", co)
+        spline.bezier_points.foreach_get("handle_left", left)
+        spline.bezier_points.foreach_get("handle_right", right)
+        co, left, right = co.reshape(-1, 3), left.reshape(-1, 3), right.reshape(-1, 3)
+        nxt = np.roll(np.arange(count), -1) if spline.use_cyclic_u else np.arange(1, count)
+        cur = np.arange(len(nxt))
+        if not len(cur):
+            return co
+        t = np.linspace(0.0, 1.0, max(1, spline.resolution_u), endpoint=False)[None, :, None]
+        p0, p1, p2, p3 = co[cur, None], right[cur, None], left[nxt, None], co[nxt, None]
+        pts = ((1 - t) ** 3 * p0 + 3 * (1 - t) ** 2 * t * p1 + 3 * (1 - t) * t ** 2 * p2 + t ** 3 * p3).reshape(-1, 3)
+        return np.vstack([pts, co[nxt[-1]]])
+    count = len(spline.points)
+    co = np.empty(count * 4, dtype=np.float32)
+    spline.points.foreach_get("co", co)
+    co = co.reshape(-1, 4)[:, :3]
+    return np.vstack([co, co[:1]]) if spline.use_cyclic_u else co
+
+def chains_from_curve(armature, curve_obj, segments, mode='AVERAGE', coefficient=1.0, add_tip=None):
+    """沿曲线对象的每条样条线生成一条 base.001…base.NNN 链，返回链描述列表
+
+    各段长度按 segment_lengths 的比例沿弧长分配，骨骼名以曲线对象名为基础，
+    多条样条线依次得到 name、name_1… 基础名。所有骨骼在同一次编辑模式中创建。
+    样条线的点只能逐条读取，之后的坐标变换和重采样对所有样条线一次完成。
+    """
+    if add_tip is None:
+        add_tip = mode == 'FIB'
+    to_arm = np.array(armature.matrix_world.inverted() @ curve_obj.matrix_world)
+    fractions = np.concatenate([[0.0], np.cumsum(segment_lengths(1.0, segments, mode, coefficient))])
+    polylines = [pts for pts in map(_spline_polyline, curve_obj.data.splines) if len(pts) >= 2]
+    if polylines:
+        sizes = [len(pts) for pts in polylines]
+        pts = np.concatenate(polylines) @ to_arm[:3, :3].T + to_arm[:3, 3]
+        polylines = np.split(pts, np.cumsum(sizes)[:-1])
+    polylines = [pts for pts in polylines if np.linalg.norm(np.diff(pts, axis=0), axis=1).sum() > 1e-6]
+    joints_list = resample_polylines(polylines, fractions)
+
+    _ensure_mode(armature, 'EDIT')
+    edit_bones = armature.data.edit_bones
+    original_base_name, _ = split_numbered_name(curve_obj.name)
+    chains = []
+    for base_name, joints in zip(unique_base_names(original_base_name, len(joints_list), edit_bones), joints_list):
+        new_bones, tip = _build_chain_bones(edit_bones, base_name, joints, None, add_tip)
+        chains.append(_chain_descriptor(armature, base_name, [b.name for b in new_bones], tip.name if tip else None))
+    return chains
+
+def mesh_islands(vertex_count, edges):
+    """用向量化的标签传播求网格连通块，返回每个顶点的岛编号 (0…岛数-1)，只依赖 NumPy"""
+    labels = np.arange(vertex_count)
+    if len(edges):
+        a, b = edges[:, 0], edges[:, 1]
+        while True:
+            low = np.minimum(labels[a], labels[b])
+            updated = labels.copy()
+            np.minimum.at(updated, a, low)
+            np.minimum.at(updated, b, low)
+            # 指针跳跃，让标签沿链条快速收敛
+            updated = updated[updated]
+            if np.array_equal(updated, labels):
+                break
+            labels = updated
+    return np.unique(labels, return_inverse=True)[1].ravel()
+
+def island_centerlines(points, labels, bins=32, min_points=3):
+    """对每个岛做主成分分析，沿主轴分箱求质心，返回每个岛由一端到另一端的中心折线列表
+
+    所有岛的协方差和分箱质心都用 bincount 一次求出，只依赖 NumPy。
+    """
+    count = labels.max() + 1 if len(labels) else 0
+    sizes = np.bincount(labels, minlength=count).astype(np.float64)
+    means = np.stack([np.bincount(labels, points[:, k], minlength=count) for k in range(3)], axis=1)
+    means /= np.maximum(sizes, 1.0)[:, None]
+    rel = points - means[labels]
+    cov = np.empty((count, 3, 3))
+    for i in range(3):
+        for j in range(i, 3):
+            cov[:, i, j] = cov[:, j, i] = np.bincount(labels, rel[:, i] * rel[:, j], minlength=count)
+    # eigh 按特征值升序排列，最后一列为主轴
+    axes = np.linalg.eigh(cov)[1][:, :, -1]
+    t = (rel * axes[labels]).sum(axis=1)
+    t_min = np.full(count, np.inf)
+    t_max = np.full(count, -np.inf)
+    np.minimum.at(t_min, labels, t)
+    np.maximum.at(t_max, labels, t)
+    span = np.maximum(t_max - t_min, 1e-12)
+    bin_idx = np.minimum(((t - t_min[labels]) / span[labels] * bins).astype(np.int64), bins - 1)
+    key = labels * bins + bin_idx
+    bin_count = np.bincount(key, minlength=count * bins).reshape(count, bins)
+    centroids = np.stack([np.bincount(key, points[:, k], minlength=count * bins) for k in range(3)], axis=1)
+    centroids = centroids.reshape(count, bins, 3) / np.maximum(bin_count, 1)[..., None]
+
+    lines = []
+    for island in range(count):
+        if sizes[island] < min_points:
+            continue
+        filled = bin_count[island] > 0
+        line = centroids[island, filled]
+        axis = axes[island]
+        # 两端补到主轴投影的极值处，折线覆盖整条网格带
+        start = line[0] + axis * (t_min[island] - (line[0] - means[island]) @ axis)
+        end = line[-1] + axis * (t_max[island] - (line[-1] - means[island]) @ axis)
+        lines.append(np.vstack([start, line, end]))
+    return lines
+
+def orient_polylines(lines, root_hint=None):
+    """让每条折线从根端开始：离 root_hint 较近的一端，root_hint 为 None 时取 Z 较大的一端，只依赖 NumPy"""
+    if not lines:
+        return []
+    first = np.array([line[0] for line in lines])
+    last = np.array([line[-1] for line in lines])
+    if root_hint is not None:
+        hint = np.asarray(root_hint)
+        reverse = np.linalg.norm(last - hint, axis=1) < np.linalg.norm(first - hint, axis=1)
+    else:
+        reverse = last[:, 2] > first[:, 2]
+    return [line[::-1] if flip else line for line, flip in zip(lines, reverse)]
+
+def chains_from_mesh(armature, mesh_obj, segments, mode='AVERAGE', coefficient=1.0, add_tip=None, bins=32,
+                     root_hint=None):
+    """沿网格每个连通块（如头发片、飘带）的中心线生成一条 base.001…base.NNN 链，返回链描述列表
+
+    root_hint 为世界空间的点，链从离它较近的一端开始；为 None 时从较高（Z 较大）的一端开始。
+    所有骨骼在同一次编辑模式中创建。
+    """
+    if add_tip is None:
+        add_tip = mode == 'FIB'
+    mesh = mesh_obj.data
+    co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", co)
+    edges = np.empty(len(mesh.edges) * 2, dtype=np.int32)
+    mesh.edges.foreach_get("vertices", edges)
+    world = np.array(mesh_obj.matrix_world)
+    points = co.reshape(-1, 3).astype(np.float64) @ world[:3, :3].T + world[:3, 3]
+    lines = island_centerlines(points, mesh_islands(len(points), edges.reshape(-1, 2)), bins)
+
+    arm_inv = np.array(armature.matrix_world.inverted())
+    fractions = np.concatenate([[0.0], np.cumsum(segment_lengths(1.0, segments, mode, coefficient))])
+    lines = orient_polylines(lines, root_hint)
+    if lines:
+        sizes = [len(line) for line in lines]
+        pts = np.concatenate(lines) @ arm_inv[:3, :3].T + arm_inv[:3, 3]
+        lines = np.split(pts, np.cumsum(sizes)[:-1])
+    lines = [line for line in lines if np.linalg.norm(np.diff(line, axis=0), axis=1).sum() > 1e-6]
+    joints_list = resample_polylines(lines, fractions)
+
+    _ensure_mode(armature, 'EDIT')
+    edit_bones = armature.data.edit_bones
+    original_base_name, _ = split_numbered_name(mesh_obj.name)
+    chains = []
+    for base_name, joints in zip(unique_base_names(original_base_name, len(joints_list), edit_bones), joints_list):
+        new_bones, tip = _build_chain_bones(edit_bones, base_name, joints, None, add_tip)
+        chains.append(_chain_descriptor(armature, base_name, [b.name for b in new_bones], tip.name if tip else None))
+    return chains
+
+def group_connected_bones(edit_bones, bone_names):
+    """把选中的骨骼按首尾相连关系分组，返回由根到梢排序的骨骼名列表的列表
+
+    遇到分叉时只沿唯一相连的子骨骼继续，其余子骨骼各自开始新的一组。
+    edit_bones 也可以是 armature.data.bones，用于不进入编辑模式的规划。
+    """
+    selected = set(bone_names)
+
+    def depth(name):
+        bone, d = edit_bones[name], 0
+        while bone.parent:
+            bone, d = bone.parent, d + 1
+        return d
+
+    def linked_children(bone):
+        return [c for c in bone.children if c.name in selected and c.name not in claimed
+                and (c.use_connect or (_bone_head_tail(c)[0] - _bone_head_tail(bone)[1]).length < 1e-5)]
+
+    claimed, runs = set(), []
+    for name in sorted(bone_names, key=depth):
+        if name in claimed:
+            continue
+        run, bone = [name], edit_bones[name]
+        claimed.add(name)
+        while True:
+            children = linked_children(bone)
+            if len(children) != 1:
+                break
+            bone = children[0]
+            run.append(bone.name)
+            claimed.add(bone.name)
+        runs.append(run)
+    return runs
+
+def subdivide_bone_run(armature, bone_names, segments, mode='FIB', coefficient=1.0, add_tip=None,
+                       split_weights=True, weight_falloff=0.5, density_blend=0.0, plan=None, weight_quantum=None):
+    """把首尾相连的多根骨骼作为一个整体沿折线按弧长细分为一条 base.001…base.NNN 链
+
+    bone_names 需按由根到梢排序（见 group_connected_bones），只有一根时等同于 subdivide_chain；
+    density_blend 目前只对单根骨骼生效。
+    原骨骼的其他子骨骼改为挂到弧长位置对应的新骨骼上，绑定网格的顶点组按各原骨骼的范围拆分。
+    plan、weight_quantum 的含义同 subdivide_chain。
+    """
+    if len(bone_names) == 1:
+        return subdivide_chain(armature, bone_names[0], segments, mode, coefficient, add_tip,
+                               split_weights, weight_falloff, density_blend, plan, weight_quantum)
+    _ensure_mode(armature, 'EDIT')
+    edit_bones = armature.data.edit_bones
+    bones = [edit_bones.get(name) for name in bone_names]
+    if any(b is None for b in bones):
+        return None
+    if add_tip is None:
+        add_tip = mode == 'FIB'
+
+    polyline = np.array([bones[0].head] + [b.tail for b in bones])
+    spans = np.concatenate([[0.0], np.cumsum(np.linalg.norm(np.diff(polyline, axis=0), axis=1))])
+    if spans[-1] == 0:
+        return None
+    spans /= spans[-1]
+    fractions = np.concatenate([[0.0], np.cumsum(segment_lengths(1.0, segments, mode, coefficient))])
+    joints = resample_polyline(polyline, fractions)
+
+    run = set(bone_names)
+    parent = bones[0].parent
+    # 原骨骼上挂着的其他子骨骼，记录它们所在原骨骼的末端弧长位置
+    outside_children = []
+    for i, b in enumerate(bones):
+        if plan is not None and not plan["rescan"][i]:
+            outside_children += [(edit_bones[name], spans[i + 1]) for name in plan["children"][i]]
+        else:
+            outside_children += [(c, spans[i + 1]) for c in b.children if c.name not in run]
+    sources = [(b.name, b.head.copy(), b.tail.copy()) for b in bones]
+
+    original_base_name, _ = split_numbered_name(bone_names[0])
+    for b in bones:
+        edit_bones.remove(b)
+    base_name = plan["base_name"] if plan is not None else get_unique_base_name(original_base_name, edit_bones)
+
+    new_bones, tip = _build_chain_bones(edit_bones, base_name, joints, parent, add_tip)
+    tip_name = tip.name if tip else None
+
+    for child, position in outside_children:
+        index = min(int(np.searchsorted(fractions, position, side='left')) - 1, segments - 1)
+        child.parent = new_bones[max(index, 0)] if position < 1.0 else (tip or new_bones[-1])
+
+    deform_names = [b.name for b in new_bones]
+    if split_weights:
+        splits = []
+        for k, (name, head, tail) in enumerate(sources):
+            # 新链各段边界换算到这根原骨骼自身的 0…1 范围内，只拆分给与它重叠的段
+            local = np.clip((fractions - spans[k]) / (spans[k + 1] - spans[k]), 0.0, 1.0)
+            overlap = np.flatnonzero(local[1:] > local[:-1])
+            if len(overlap):
+                bounds = np.concatenate([local[overlap], [local[overlap[-1] + 1]]])
+                splits.append((name, head, tail, [deform_names[j] for j in overlap], bounds))
+        # 新链可能与原骨骼同名：先读出全部原权重，再一次性清空原顶点组和残留的目标组，之后各原骨骼的拆分结果累加
+        weight_cache = plan["weights"] if plan is not None else {}
+        cache_source_weights(armature, [name for name, *_ in splits], weight_cache)
+        clear_vertex_groups(armature, [name for name, *_ in splits] + deform_names)
+        for name, head, tail, targets, bounds in splits:
+            split_vertex_groups(armature, name, head, tail, targets, bounds, weight_falloff,
+                                weight_cache, weight_quantum, accumulate=True)
+    return _chain_descriptor(armature, base_name, deform_names, tip_name)
+
+# --- 细分计划：与段数、系数无关的部分（基础名称、要改挂的子骨骼、网格采样和原权重）只算一次 ---
+
+# 最近一次细分操作的计划，在重做面板中调整段数或系数时复用
+_subdivide_plan_cache = {}
+# 每次从界面调用细分操作时递增，计划只在同一次调用的重做中复用
+_subdivide_plan_serial = 0
+
+def new_subdivide_plan_token():
+    """开始一次新的细分操作：丢弃上次的计划，返回交给 cached_subdivide_plans 的新编号"""
+    global _subdivide_plan_serial
+    _subdivide_plan_serial += 1
+    _subdivide_plan_cache.clear()
+    return _subdivide_plan_serial
+
+def plan_subdivision(armature, runs):
+    """为按顺序依次细分 runs（由根到梢排序的骨骼名列表的列表）预先算好基础名称和要改挂的子骨骼
+
+    返回与 runs 一一对应的计划字典列表（骨骼不存在时为 None），交给 subdivide_bone_run 的 plan 参数。
+    骨骼只遍历一次，得到的名称与不带计划逐个细分时相同。
+    """
+    _ensure_mode(armature, 'EDIT')
+    return _plan_runs(armature.data.edit_bones, runs)
+
+def _plan_runs(bones, runs):
+    """plan_subdivision 的实现，bones 可以是编辑骨骼或 armature.data.bones"""
+    # 每个基础名称下带数字后缀的骨骼数量，与 get_unique_base_name 的冲突判断一致
+    counts, children = {}, {}
+    for b in bones:
+        base, num = split_numbered_name(b.name)
+        if num is not None:
+            counts[base] = counts.get(base, 0) + 1
+        if b.parent:
+            children.setdefault(b.parent.name, []).append(b.name)
+
+    def release(names):
+        for name in names:
+            base, num = split_numbered_name(name)
+            if num is not None:
+                counts[base] -= 1
+
+    # 子骨骼本身也要细分时，它会被替换成新链的根骨骼，名称取决于段数，只能在细分时重新查找
+    selected = {name for run in runs for name in run}
+    plans = []
+    for run in runs:
+        if any(bones.get(name) is None for name in run):
+            plans.append(None)
+            continue
+        # 整链细分先删除原骨骼再取名，单根细分取名时原骨骼仍在
+        if len(run) > 1:
+            release(run)
+        original_base_name, _ = split_numbered_name(run[0])
+        base_name, counter = original_base_name, 1
+        while counts.get(base_name):
+            base_name = f"{original_base_name}_{counter}"
+            counter += 1
+        counts[base_name] = counts.get(base_name, 0) + 1
+        if len(run) == 1:
+            release(run)
+        members = set(run)
+        plans.append({
+            "bones": list(run),
+            "base_name": base_name,
+            "children": [[c for c in children.get(name, []) if c not in members] for name in run],
+            "rescan": [any(c in selected and c not in members for c in children.get(name, [])) for name in run],
+            "weights": {},
+        })
+    return plans
+
+def cached_subdivide_plans(armature, bone_names, as_chain=False, token=0):
+    """返回 (runs, plans)：骨骼分组和对应的细分计划
+
+    token 为操作符在 invoke 中由 new_subdivide_plan_token 取得的编号，重做面板撤销后重新执行时编号不变。
+    编号、选中骨骼、骨骼数量和它们的位置都与上次相同时直接复用上次的结果（包括网格采样和原权重）。
+    token 为 0（脚本直接执行、没有经过 invoke）时绑定网格和权重可能已经改变，总是重新规划。
+    """
+    edit_bones = armature.data.edit_bones
+    key = (token, armature.name, len(edit_bones), tuple(bone_names), as_chain,
+           tuple(tuple(edit_bones[name].head) + tuple(edit_bones[name].tail) for name in bone_names))
+    if not token or _subdivide_plan_cache.get("key") != key:
+        runs = group_connected_bones(edit_bones, bone_names) if as_chain else [[name] for name in bone_names]
+        _subdivide_plan_cache.clear()
+        _subdivide_plan_cache.update(key=key, runs=runs, plans=plan_subdivision(armature, runs))
+    return _subdivide_plan_cache["runs"], _subdivide_plan_cache["plans"]
+
+def _assign_chain_collections(arm, base_name, control_names):
+    """重建链的 ctrl_<base>_all / ctrl_<base>_first 骨骼集合并分配控制骨骼"""
+    collection_name_all = f"ctrl_{base_name}_all"
+    collection_name_first = f"ctrl_{base_name}_first"
+
+    # 删除可能已存在的同名集合
+    for name in (collection_name_all, collection_name_first):
+        if name in arm.collections_all:
+            arm.collections.remove(arm.collections_all[name])
+
+    ctrl_collection_all = arm.collections.new(name=collection_name_all)
+    ctrl_collection_first = arm.collections.new(name=collection_name_first)
+    for ctrl_bone_name in control_names:
+        bone = arm.bones.get(ctrl_bone_name)
+        if bone:
+            ctrl_collection_all.assign(bone)
+    first_ctrl_bone = arm.bones.get(control_names[0])
+    if first_ctrl_bone:
+        ctrl_collection_first.assign(first_ctrl_bone)
+
+    # 新链默认显示全部控制器（'ALL' 状态）
+    ctrl_collection_all.is_visible = True
+    ctrl_collection_first.is_visible = False
+    return [collection_name_all, collection_name_first]
+
+def build_fk(armature, chain, circle_scale=None):
+    """为链生成FK控制骨骼、自定义图形、缩放驱动器和骨骼集合，返回更新后的链描述
+
+    链过短（变形骨骼加末端骨骼不足2节）时返回 None。结束时骨架处于姿态模式。
+    """
+    arm = armature.data
+    if len(chain["deform"]) + (1 if chain.get("tip") else 0) < 2:
+        return None
+
+    _ensure_mode(armature, 'EDIT')
+    edit_bones = arm.edit_bones
+    control_names = [f"ctr_{name}" for name in chain["deform"]]
+
+    # 编辑骨骼按名称查找是线性的，长链先建一次索引，保证耗时与段数成线性关系
+    bone_index = {b.name: b for b in edit_bones}
+
+    # 移除上一次生成的控制骨骼，重复执行时不会产生重名骨骼
+    for name in control_names:
+        old_bone = bone_index.pop(name, None)
+        if old_bone:
+            edit_bones.remove(old_bone)
+
+    deform_bones = [bone_index.get(name) for name in chain["deform"]]
+    if None in deform_bones:
+        return None
+    original_parent = deform_bones[0].parent
+
+    # 控制骨骼复制变形骨骼的位置，ctr_N 跟随变形骨骼 N-1，ctr_1 挂到原链的父骨骼上
+    control_bones = []
+    for i, def_bone in enumerate(deform_bones):
+        ctrl = edit_bones.new(control_names[i])
+        ctrl.head, ctrl.tail, ctrl.roll = def_bone.head.copy(), def_bone.tail.copy(), def_bone.roll
+        ctrl.use_deform = False
+        ctrl.parent = deform_bones[i - 1] if i else original_parent
+        control_bones.append(ctrl)
+    deform_bones[0].parent = control_bones[0]
+
+    radius = (control_bones[0].length * armature.scale.x) / 2
+    prefs = _get_addon_prefs()
+    cir_shap, scale_expression = None, "scale_var"
+    if prefs and prefs.use_shape_library and prefs.shape_library_path:
+        cir_shap, library_radius = linked_control_shape(prefs.shape_library_path, prefs.shape_library_object)
+        if cir_shap is not None and library_radius > 0:
+            # 库图形大小固定，用驱动器表达式换算到与生成的圆环相同的显示大小
+            scale_expression = f"scale_var * {radius / library_radius:.6g}"
+        elif cir_shap is None:
+            print(f"无法从 {prefs.shape_library_path} 链接控制器图形 {prefs.shape_library_object}，改为生成圆环")
+    if cir_shap is None:
+        if prefs is None or prefs.share_control_shapes:
+            cir_shap = control_shape(armature, radius)
+        else:
+            cir_shap = _create_circle_shape(armature, f"cir_ctr_{chain['base_name']}", radius)
+
+    _ensure_mode(armature, 'POSE')
+    pose_bones = armature.pose.bones
+    if circle_scale is None:
+        circle_scale = prefs.default_circle_scale if prefs else 1.0
+    scale_controller_bone_name = control_names[0]
+    pose_bones[scale_controller_bone_name].my_tool_props.circle_scale = circle_scale
+    pose_bones[scale_controller_bone_name].my_tool_props.chain_base = chain["base_name"]
+    data_path = f'pose.bones["{scale_controller_bone_name}"].my_tool_props.circle_scale'
+
+    for name in control_names:
+        pb = pose_bones[name]
+        pb.custom_shape = cir_shap
+        pb.custom_shape_rotation_euler = (math.radians(90), 0, 0)
+        for i in range(2):
+            fcurve = _add_single_prop_driver(pb, "custom_shape_scale_xyz", i, "scale_var", armature, data_path)
+            fcurve.driver.expression = scale_expression
+
+    chain = dict(chain)
+    chain["controls"] = control_names
+    chain["shape"] = cir_shap.name
+    chain["collections"] = _assign_chain_collections(arm, chain["base_name"], control_names)
+    return chain
+
+def apply_damped_track(armature, chain, influence=None):
+    """为链添加复制旋转(FK)与阻尼追踪约束，并把追踪强度驱动到第一根控制骨骼上
+
+    返回更新后的链描述。结束时骨架处于姿态模式。
+    """
+    if chain.get("curve"):
+        chain = remove_spline_ik(armature, chain)
+    _ensure_mode(armature, 'POSE')
+    pose_bones = armature.pose.bones
+    deform = chain["deform"]
+
+    # --- 1. FK Constraints ---
+    for name in deform:
+        def_bone = pose_bones.get(name)
+        if def_bone:
+            _remove_constraints(def_bone, 'COPY_ROTATION')
+            const = def_bone.constraints.new('COPY_ROTATION')
+            const.target, const.subtarget = armature, f"ctr_{name}"
+
+    # --- 2. Damped Track Constraints ---
+    # 每根变形骨骼追踪下一根，最后一根追踪末端骨骼
+    constrained_bones = []
+    targets = deform[1:] + [chain.get("tip")]
+    for name, target_name in zip(deform, targets):
+        pose_bone = pose_bones.get(name)
+        if not pose_bone or not target_name or not pose_bones.get(target_name):
+            continue
+        _remove_constraints(pose_bone, 'DAMPED_TRACK')
+        const = pose_bone.constraints.new('DAMPED_TRACK')
+        const.target, const.subtarget = armature, target_name
+        constrained_bones.append(pose_bone)
+
+    # --- 3. Driver Setup ---
+    controller_bone = pose_bones.get(f"ctr_{deform[0]}") if deform else None
+    if controller_bone and constrained_bones:
+        if influence is None:
+            prefs = _get_addon_prefs()
+            influence = prefs.default_damped_track_influence if prefs else 0.6
+        controller_bone.my_tool_props.damped_track_influence = influence
+        data_path = f'pose.bones["{controller_bone.name}"].my_tool_props.damped_track_influence'
+        for bone in constrained_bones:
+            for const in bone.constraints:
+                if const.type == 'DAMPED_TRACK':
+                    _add_single_prop_driver(const, "influence", -1, "influence_var", armature, data_path)
+
+    chain = dict(chain)
+    chain["tracked"] = [b.name for b in constrained_bones]
+    return chain
+
+def _set_control_parenting(armature, chain, spline):
+    """样条IK风格下控制骨骼串成纯FK链，否则 ctr_N 跟随变形骨骼 N-1"""
+    _ensure_mode(armature, 'EDIT')
+    edit_bones = armature.data.edit_bones
+    controls, deform = chain["controls"], chain["deform"]
+    for i in range(1, len(controls)):
+        ctrl = edit_bones.get(controls[i])
+        parent = edit_bones.get(controls[i - 1] if spline else deform[i - 1])
+        if ctrl and parent:
+            ctrl.parent = parent
+
+def apply_spline_ik(armature, chain):
+    """用一条由 ctr_ 控制骨骼钩挂的曲线和单个样条IK约束驱动整条链，返回更新后的链描述
+
+    约束数量与链长无关，适合很长的链。需要先执行 build_fk；会替换链上的复制旋转和阻尼追踪约束。
+    结束时骨架处于姿态模式。
+    """
+    controls, deform = chain.get("controls"), chain["deform"]
+    if not controls:
+        return None
+
+    # 控制骨骼若仍跟随变形骨骼，曲线 -> 变形骨骼 -> 控制骨骼 -> 曲线会形成依赖循环
+    _set_control_parenting(armature, chain, spline=True)
+    _ensure_mode(armature, 'POSE')
+    pose_bones, bones = armature.pose.bones, armature.data.bones
+    for name in deform:
+        pb = pose_bones.get(name)
+        if pb:
+            for constraint_type in ('COPY_ROTATION', 'DAMPED_TRACK', 'SPLINE_IK'):
+                _remove_constraints(pb, constraint_type)
+
+    # 曲线点依次位于每根变形骨骼的头部和最后一根的尾部（骨架空间）
+    points = [bones[name].head_local for name in deform] + [bones[deform[-1]].tail_local]
+    curve_name = f"spl_{chain['base_name']}"
+    old_curve = bpy.data.objects.get(curve_name)
+    if old_curve:
+        bpy.data.objects.remove(old_curve, do_unlink=True)
+    curve_data = bpy.data.curves.new(curve_name, 'CURVE')
+    curve_data.dimensions = '3D'
+    spline = curve_data.splines.new('NURBS')
+    spline.points.add(len(points) - 1)
+    spline.points.foreach_set("co", [c for p in points for c in (p.x, p.y, p.z, 1.0)])
+    spline.order_u = min(4, len(points))
+    spline.use_endpoint_u = True
+
+    curve_obj = bpy.data.objects.new(curve_name, curve_data)
+    collection = armature.users_collection[0] if armature.users_collection else bpy.context.scene.collection
+    collection.objects.link(curve_obj)
+    curve_obj.matrix_world = armature.matrix_world
+    curve_obj.display_type = 'WIRE'
+    curve_obj.hide_render = True
+    curve_obj.hide_select = True
+
+    # 第0个点跟随 ctr_1 的头部，第i个点跟随 ctr_i 的尾部
+    curve_to_arm = armature.matrix_world.inverted() @ curve_obj.matrix_world
+    for i in range(len(points)):
+        ctrl_name = controls[max(0, i - 1)]
+        hook = curve_obj.modifiers.new(name=f"Hook_{ctrl_name}", type='HOOK')
+        hook.object, hook.subtarget = armature, ctrl_name
+        hook.matrix_inverse = bones[ctrl_name].matrix_local.inverted() @ curve_to_arm
+        hook.vertex_indices_set([i])
+
+    const = pose_bones[deform[-1]].constraints.new('SPLINE_IK')
+    const.target = curve_obj
+    const.chain_count = len(deform)
+    const.y_scale_mode = 'FIT_CURVE'
+    const.xz_scale_mode = 'NONE'
+
+    chain = dict(chain)
+    chain["curve"] = curve_obj.name
+    chain["tracked"] = []
+    return chain
+
+def remove_spline_ik(armature, chain):
+    """撤销 apply_spline_ik：删除样条IK约束和曲线，并恢复控制骨骼原来的父子关系"""
+    _ensure_mode(armature, 'POSE')
+    for name in chain["deform"]:
+        pb = armature.pose.bones.get(name)
+        if pb:
+            _remove_constraints(pb, 'SPLINE_IK')
+    curve_obj = bpy.data.objects.get(chain.get("curve") or "")
+    if curve_obj:
+        curve_data = curve_obj.data
+        bpy.data.objects.remove(curve_obj, do_unlink=True)
+        if curve_data.users == 0:
+            bpy.data.curves.remove(curve_data)
+    if chain.get("controls"):
+        _set_control_parenting(armature, chain, spline=False)
+    _ensure_mode(armature, 'POSE')
+    chain = dict(chain)
+    chain["curve"] = None
+    return chain
+
+def set_chain_constraints_muted(armature, chain, muted):
+    """静音或恢复链上变形骨骼的求值约束及其强度驱动器"""
+    anim_data = armature.animation_data
+    for name in chain["deform"]:
+        pb = armature.pose.bones.get(name)
+        if not pb:
+            continue
+        for const in pb.constraints:
+            if const.type not in CHAIN_CONSTRAINT_TYPES:
+                continue
+            const.mute = muted
+            fcurve = anim_data.drivers.find(const.path_from_id("influence")) if anim_data else None
+            if fcurve:
+                fcurve.mute = muted
+
+def _action_fcurves(armature):
+    """返回骨架当前动作中属于该对象的F曲线集合（兼容分层动作的动作槽）"""
+    anim_data = armature.animation_data
+    action = anim_data.action if anim_data else None
+    if action is None:
+        return None
+    slot = getattr(anim_data, "action_slot", None)
+    if slot is not None:
+        try:
+            from bpy_extras import anim_utils
+            channelbag = anim_utils.action_get_channelbag_for_slot(action, slot)
+            if channelbag is not None:
+                return channelbag.fcurves
+        except (ImportError, AttributeError):
+            pass
+    return action.fcurves
+
+def _pose_basis_matrix(pose_bone):
+    """由求值后的姿态矩阵反推骨骼自身的局部变换（相对父骨骼求值结果）"""
+    bone = pose_bone.bone
+    if pose_bone.parent:
+        rest = pose_bone.parent.bone.matrix_local.inverted() @ bone.matrix_local
+        return (pose_bone.parent.matrix @ rest).inverted() @ pose_bone.matrix
+    return bone.matrix_local.inverted() @ pose_bone.matrix
+
+def write_fcurve_samples(armature, pose_bone, prop, frames, channels, interpolation='LINEAR'):
+    """用 keyframe_points.add 加 foreach_set 批量写入一条属性的所有通道关键帧，替换原有关键帧
+
+    channels 为每个通道一列数值，与 frames 一一对应。
+    """
+    # 先插入一帧，确保F曲线（以及新版的动作槽）按Blender自己的规则创建
+    pose_bone.keyframe_insert(prop, frame=frames[0], group=pose_bone.name)
+    fcurves = _action_fcurves(armature)
+    data_path = pose_bone.path_from_id(prop)
+    ipo = bpy.types.Keyframe.bl_rna.properties["interpolation"].enum_items[interpolation].value
+    for index, values in enumerate(channels):
+        fcurve = fcurves.find(data_path, index=index)
+        if fcurve is None:
+            continue
+        co = np.empty(len(frames) * 2, dtype=np.float32)
+        co[0::2], co[1::2] = frames, values
+        points = fcurve.keyframe_points
+        points.clear()
+        points.add(len(frames))
+        points.foreach_set("co", co)
+        points.foreach_set("interpolation", np.full(len(frames), ipo, dtype=np.int32))
+        fcurve.update()
+
+def _rotation_channels(pose_bone, matrices):
+    """把局部矩阵序列转换成骨骼旋转模式对应的通道数值，保持相邻帧连续"""
+    if pose_bone.rotation_mode == 'AXIS_ANGLE':
+        pose_bone.rotation_mode = 'QUATERNION'
+    if pose_bone.rotation_mode == 'QUATERNION':
+        values, prev = [], None
+        for m in matrices:
+            q = m.to_quaternion()
+            if prev is not None:
+                q.make_compatible(prev)
+            values.append(q)
+            prev = q
+        return "rotation_quaternion", [[q[i] for q in values] for i in range(4)]
+    values, prev = [], None
+    for m in matrices:
+        e = m.to_euler(pose_bone.rotation_mode, prev) if prev is not None else m.to_euler(pose_bone.rotation_mode)
+        values.append(e)
+        prev = e
+    return "rotation_euler", [[e[i] for e in values] for i in range(3)]
+
+# 烘焙会写入的旋转属性及其通道数
+ROTATION_CHANNELS = (("rotation_quaternion", 4), ("rotation_euler", 3))
+# 备份F曲线关键帧时读取的浮点数组属性和枚举属性
+KEYFRAME_FLOAT_PROPS = ("co", "handle_left", "handle_right")
+KEYFRAME_ENUM_PROPS = ("interpolation", "handle_left_type", "handle_right_type")
+
+def _pose_rotation_record(pose_bone):
+    """记录姿态骨骼的旋转模式和各旋转属性的当前值"""
+    return {
+        "rotation_mode": pose_bone.rotation_mode,
+        "rotation_quaternion": list(pose_bone.rotation_quaternion),
+        "rotation_euler": list(pose_bone.rotation_euler),
+        "rotation_axis_angle": list(pose_bone.rotation_axis_angle),
+    }
+
+def _apply_pose_rotation_record(pose_bone, record):
+    """按 _pose_rotation_record 的记录恢复旋转模式和旋转值"""
+    pose_bone.rotation_mode = record["rotation_mode"]
+    pose_bone.rotation_quaternion = record["rotation_quaternion"]
+    pose_bone.rotation_euler = record["rotation_euler"]
+    pose_bone.rotation_axis_angle = record["rotation_axis_angle"]
+
+def _backup_chain_rotations(armature, chain):
+    """记录链上变形骨骼烘焙前的旋转模式、旋转值和已有旋转F曲线的全部关键帧"""
+    anim_data = armature.animation_data
+    fcurves = _action_fcurves(armature)
+    bones = {}
+    for name in chain["deform"]:
+        pb = armature.pose.bones.get(name)
+        if not pb:
+            continue
+        curves = {}
+        for prop, count in ROTATION_CHANNELS:
+            data_path = pb.path_from_id(prop)
+            for index in range(count):
+                fcurve = fcurves.find(data_path, index=index) if fcurves is not None else None
+                if fcurve is None:
+                    continue
+                points = fcurve.keyframe_points
+                record = {"count": len(points)}
+                if len(points):
+                    for key in KEYFRAME_FLOAT_PROPS:
+                        buf = np.empty(len(points) * 2, dtype=np.float32)
+                        points.foreach_get(key, buf)
+                        record[key] = buf.tolist()
+                    for key in KEYFRAME_ENUM_PROPS:
+                        buf = np.empty(len(points), dtype=np.int32)
+                        points.foreach_get(key, buf)
+                        record[key] = buf.tolist()
+                curves[f"{prop}[{index}]"] = record
+        bones[name] = dict(_pose_rotation_record(pb), curves=curves)
+    return {"had_action": int(bool(anim_data and anim_data.action)), "bones": bones}
+
+def _restore_chain_rotations(armature, chain, backup):
+    """撤销烘焙写入的旋转：删除烘焙新建的F曲线，原有F曲线恢复烘焙前的关键帧，静态旋转值和旋转模式一并恢复
+
+    backup 为 None 时（旧版本烘焙的链没有备份）删除全部旋转F曲线并归零旋转。
+    """
+    fcurves = _action_fcurves(armature)
+    bones = backup["bones"] if backup else {}
+    for name in chain["deform"]:
+        pb = armature.pose.bones.get(name)
+        if not pb:
+            continue
+        record = bones.get(name)
+        curves = record["curves"] if record else {}
+        for prop, count in ROTATION_CHANNELS:
+            data_path = pb.path_from_id(prop)
+            for index in range(count):
+                fcurve = fcurves.find(data_path, index=index) if fcurves is not None else None
+                if fcurve is None:
+                    continue
+                saved = curves.get(f"{prop}[{index}]")
+                if saved is None:
+                    fcurves.remove(fcurve)
+                    continue
+                points = fcurve.keyframe_points
+                points.clear()
+                points.add(saved["count"])
+                if saved["count"]:
+                    for key in KEYFRAME_FLOAT_PROPS:
+                        points.foreach_set(key, np.asarray(saved[key], dtype=np.float32))
+                    for key in KEYFRAME_ENUM_PROPS:
+                        points.foreach_set(key, np.asarray(saved[key], dtype=np.int32))
+                fcurve.update()
+        if record:
+            _apply_pose_rotation_record(pb, record)
+        else:
+            pb.rotation_quaternion = (1.0, 0.0, 0.0, 0.0)
+            pb.rotation_euler = (0.0, 0.0, 0.0)
+
+    # 动作是烘焙时才创建的，恢复后已经没有任何F曲线时一并移除
+    anim_data = armature.animation_data
+    if backup and not backup["had_action"] and fcurves is not None and not len(fcurves):
+        action = anim_data.action
+        anim_data.action = None
+        if action.users == 0:
+            bpy.data.actions.remove(action)
+
+def _record_bake(armature, chains, frames, step):
+    """静音链的约束并记录烘焙范围"""
+    baked = dict(armature.get(BAKED_CHAINS_PROP) or {})
+    for chain in chains:
+        set_chain_constraints_muted(armature, chain, True)
+        baked[chain["base_name"]] = [frames[0], frames[-1], step]
+    armature[BAKED_CHAINS_PROP] = baked
+    _lod_index.pop(armature.name, None)
+
+def _backup_unbaked_chains(armature, chains):
+    """为尚未烘焙的链备份原有旋转，已烘焙的链保留第一次烘焙前的备份"""
+    backups = armature.get(BAKE_BACKUP_PROP)
+    backups = backups.to_dict() if backups else {}
+    for chain in chains:
+        if chain["base_name"] not in backups:
+            backups[chain["base_name"]] = _backup_chain_rotations(armature, chain)
+    armature[BAKE_BACKUP_PROP] = backups
+
+def bake_chains(armature, chains, frame_start, frame_end, step=1):
+    """在帧范围内求值各链，把变形骨骼的旋转批量写成关键帧并静音约束和驱动器，返回烘焙的帧数
+
+    每帧只调用一次 frame_set，所有链一起采样，采样期间暂停链LOD；写入时每条F曲线只做一次 add 和 foreach_set。
+    """
+    scene = bpy.context.scene
+    _ensure_mode(armature, 'POSE')
+    frames = list(range(frame_start, frame_end + 1, max(1, step)))
+    bone_names = [name for chain in chains for name in chain["deform"] if armature.pose.bones.get(name)]
+    if not frames or not bone_names:
+        return 0
+
+    samples = {name: [] for name in bone_names}
+    original_frame = scene.frame_current
+    with chain_lod_suspended(scene):
+        for frame in frames:
+            scene.frame_set(frame)
+            pose_eval = armature.evaluated_get(bpy.context.evaluated_depsgraph_get()).pose.bones
+            for name in bone_names:
+                samples[name].append(_pose_basis_matrix(pose_eval[name]))
+        scene.frame_set(original_frame)
+
+    _backup_unbaked_chains(armature, chains)
+    for name in bone_names:
+        pb = armature.pose.bones[name]
+        prop, channels = _rotation_channels(pb, samples[name])
+        write_fcurve_samples(armature, pb, prop, frames, channels)
+    _record_bake(armature, chains, frames, max(1, step))
+    return len(frames)
+
+def unbake_chains(armature, chains):
+    """撤销 bake_chains：删除烘焙写入的旋转关键帧，恢复烘焙前的动画和姿态以及约束和驱动器，返回恢复的链数量"""
+    _ensure_mode(armature, 'POSE')
+    baked = dict(armature.get(BAKED_CHAINS_PROP) or {})
+    backups = armature.get(BAKE_BACKUP_PROP)
+    backups = backups.to_dict() if backups else {}
+    restored = 0
+    for chain in chains:
+        if chain["base_name"] not in baked:
+            continue
+        _restore_chain_rotations(armature, chain, backups.pop(chain["base_name"], None))
+        set_chain_constraints_muted(armature, chain, False)
+        del baked[chain["base_name"]]
+        _lod_muted.pop((armature.name, chain["base_name"]), None)
+        restored += 1
+    armature[BAKED_CHAINS_PROP] = baked
+    armature[BAKE_BACKUP_PROP] = backups
+    _lod_index.pop(armature.name, None)
+    return restored
+
+# 估算 .blend 中每个关键帧（BezTriple 结构）占用的字节数
+KEYFRAME_BYTES = 72
+
+def reduce_keys(frames, values, tolerance, quaternion=False):
+    """误差受限的关键帧精简（并行版 Ramer-Douglas-Peucker），返回保留关键帧的布尔掩码
+
+    values 为 (通道, 帧)，所有通道共享保留的关键帧。每轮对每个区间同时插入误差最大的采样，
+    直到线性插值与原曲线的误差都不超过 tolerance：四元数按夹角（弧度）计算，其他按通道最大差值。
+    本函数只依赖 NumPy。
+    """
+    frames = np.asarray(frames, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    count = len(frames)
+    keep = np.zeros(count, dtype=bool)
+    keep[[0, -1]] = True
+    if count <= 2:
+        keep[:] = True
+        return keep
+    samples = np.arange(count)
+    if quaternion:
+        unit = values / np.linalg.norm(values, axis=0)
+    while True:
+        kept = np.flatnonzero(keep)
+        seg = np.minimum(np.searchsorted(kept, samples, side='right') - 1, len(kept) - 2)
+        a, b = kept[seg], kept[seg + 1]
+        t = (frames - frames[a]) / (frames[b] - frames[a])
+        approx = values[:, a] + (values[:, b] - values[:, a]) * t
+        if quaternion:
+            approx /= np.linalg.norm(approx, axis=0)
+            error = 2.0 * np.arccos(np.clip(np.abs((approx * unit).sum(axis=0)), 0.0, 1.0))
+        else:
+            error = np.abs(approx - values).max(axis=0)
+        error[keep] = 0.0
+        # 采样按帧排序，每个区间是连续的一段，可以直接 reduceat 求区间最大误差
+        seg_max = np.maximum.reduceat(error, kept[:-1])
+        worst = (error > tolerance) & (error == seg_max[seg])
+        if not worst.any():
+            return keep
+        keep |= worst
+
+def reduce_chain_keys(armature, chains, tolerance=0.5):
+    """按角度容差精简已烘焙链的旋转关键帧，返回 (精简前关键帧数, 精简后关键帧数)
+
+    tolerance 为角度（度），也可以传入 {基础名: 角度} 为每条链单独设置。
+    """
+    fcurves = _action_fcurves(armature)
+    baked = armature.get(BAKED_CHAINS_PROP) or {}
+    if fcurves is None:
+        return 0, 0
+    before = after = 0
+    for chain in chains:
+        if chain["base_name"] not in baked:
+            continue
+        tol = tolerance.get(chain["base_name"], 0.5) if isinstance(tolerance, dict) else tolerance
+        for name in chain["deform"]:
+            pb = armature.pose.bones.get(name)
+            if pb is None:
+                continue
+            quaternion = pb.rotation_mode == 'QUATERNION'
+            prop = "rotation_quaternion" if quaternion else "rotation_euler"
+            data_path = pb.path_from_id(prop)
+            curves = [fcurves.find(data_path, index=i) for i in range(4 if quaternion else 3)]
+            if any(c is None for c in curves) or len({len(c.keyframe_points) for c in curves}) != 1:
+                continue
+            count = len(curves[0].keyframe_points)
+            co = np.empty((len(curves), count * 2), dtype=np.float32)
+            for i, fcurve in enumerate(curves):
+                fcurve.keyframe_points.foreach_get("co", co[i])
+            frames, values = co[0, 0::2], co[:, 1::2]
+            keep = reduce_keys(frames, values, math.radians(tol), quaternion)
+            before += count * len(curves)
+            after += int(keep.sum()) * len(curves)
+            if not keep.all():
+                write_fcurve_samples(armature, pb, prop, frames[keep], values[:, keep])
+    return before, after
+
+def _auto_rig_chains(armature, chains):
+    """对细分得到的链依次执行FK绑定和阻尼追踪，返回成功绑定的链"""
+    rigged = []
+    for chain in chains:
+        chain = build_fk(armature, chain)
+        if chain:
+            rigged.append(apply_damped_track(armature, chain))
+    return rigged
+
+# --- 试运行规划：只读取数据，预先算出细分 + FK绑定 + 阻尼追踪会生成的全部内容 ---
+
+def _plan_vector(v):
+    return [round(float(x), 6) for x in v]
+
+def plan_rig(armature, bone_names, segments, mode='FIB', coefficient=1.0, as_chain=False, add_tip=None,
+             density_blend=0.0, rig=True, circle_scale=None, influence=None):
+    """计算对 bone_names 细分并（rig 为真时）执行FK绑定和阻尼追踪将生成的骨骼、约束、驱动器和骨骼集合
+
+    不切换模式，也不写入任何数据；骨架处于编辑模式时读取编辑骨骼，否则读取 Bone。
+    返回只由字符串、数字、布尔值、列表和字典组成的计划，可以直接 json.dump，
+    用于在批量处理前检查结果、估算规模，或比较不同版本插件的输出。
+    """
+    arm = armature.data
+    bones = arm.edit_bones if armature.mode == 'EDIT' else arm.bones
+    if add_tip is None:
+        add_tip = mode == 'FIB'
+    prefs = _get_addon_prefs()
+    if circle_scale is None:
+        circle_scale = prefs.default_circle_scale if prefs else 1.0
+    if influence is None:
+        influence = prefs.default_damped_track_influence if prefs else 0.6
+
+    runs = group_connected_bones(bones, bone_names) if as_chain else [[name] for name in bone_names]
+    fractions = np.concatenate([[0.0], np.cumsum(segment_lengths(1.0, segments, mode, coefficient))])
+    # 被细分的原骨骼 -> 它的子骨骼改挂到的新骨骼
+    replaced, reparented = {}, {}
+    chains, roots = [], []
+    created_shapes = set()
+    selected = {name for run in runs for name in run}
+    for run, run_plan in zip(runs, _plan_runs(bones, runs)):
+        if run_plan is None:
+            continue
+        points = [_bone_head_tail(bones[name]) for name in run]
+        polyline = np.array([points[0][0]] + [tail for _, tail in points], dtype=np.float64)
+        spans = np.concatenate([[0.0], np.cumsum(np.linalg.norm(np.diff(polyline, axis=0), axis=1))])
+        if spans[-1] == 0:
+            continue
+        spans /= spans[-1]
+        if len(run) == 1:
+            joints, _ = _single_bone_joints(armature, polyline[0], polyline[1], segments, mode, coefficient,
+                                            density_blend)
+        else:
+            joints = resample_polyline(polyline, fractions)
+
+        base_name = run_plan["base_name"]
+        source_parent = bones[run[0]].parent
+        parent = source_parent.name if source_parent else None
+        deform = [chain_bone_name(base_name, i + 1, segments) for i in range(segments)]
+        tip = chain_bone_name(base_name, 0, segments) if add_tip else None
+        new_bones = [{"name": name, "head": _plan_vector(joints[i]), "tail": _plan_vector(joints[i + 1]),
+                      "roll": 0.0, "parent": deform[i - 1] if i else parent, "use_deform": True}
+                     for i, name in enumerate(deform)]
+        if tip:
+            new_bones.append({"name": tip, "head": _plan_vector(joints[-1]),
+                              "tail": _plan_vector(2.0 * joints[-1] - joints[-2]),
+                              "roll": 0.0, "parent": deform[-1], "use_deform": True})
+
+        for k, name in enumerate(run):
+            if len(run) == 1 or spans[k + 1] >= 1.0:
+                replaced[name] = tip or deform[-1]
+            else:
+                index = min(int(np.searchsorted(fractions, spans[k + 1], side='left')) - 1, segments - 1)
+                replaced[name] = deform[max(index, 0)]
+            for child in run_plan["children"][k]:
+                if child not in selected:
+                    reparented[child] = replaced[name]
+        roots.append(new_bones[0])
+
+        chain = {
+            "base_name": base_name,
+            "source": list(run),
+            "bones": new_bones,
+            "removed": list(run),
+            "constraints": [],
+            "drivers": [],
+            "collections": {},
+            "objects": [],
+            "properties": {},
+        }
+        if rig and len(deform) + (1 if tip else 0) >= 2:
+            controls = [f"ctr_{name}" for name in deform]
+            for i, name in enumerate(controls):
+                chain["bones"].append({"name": name, "head": new_bones[i]["head"], "tail": new_bones[i]["tail"],
+                                       "roll": 0.0, "parent": deform[i - 1] if i else parent, "use_deform": False})
+            new_bones[0]["parent"] = controls[0]
+            roots[-1] = chain["bones"][-len(controls)]
+
+            radius = float(np.linalg.norm(joints[1] - joints[0])) * armature.scale.x / 2
+            scale_expression = "scale_var"
+            if prefs and prefs.use_shape_library and prefs.shape_library_path:
+                # 规划时不加载资产库：图形尚未链接时记为待链接，换算比例要到链接后才能确定
+                shape = prefs.shape_library_object
+                linked, library_radius = find_linked_shape(prefs.shape_library_path, shape)
+                if linked is not None and library_radius > 0:
+                    scale_expression = f"scale_var * {radius / library_radius:.6g}"
+                if linked is None and shape not in created_shapes:
+                    created_shapes.add(shape)
+                    chain["objects"].append({"name": shape, "type": 'MESH', "library": prefs.shape_library_path,
+                                             "linked": True})
+            else:
+                if prefs is None or prefs.share_control_shapes:
+                    shape, radius = control_shape_name(radius)
+                    shared = True
+                else:
+                    shape, shared = f"cir_ctr_{base_name}", False
+                # 共享图形已存在时不会再创建
+                if not (shared and (shape in bpy.data.objects or shape in created_shapes)):
+                    created_shapes.add(shape)
+                    chain["objects"].append({"name": shape, "type": 'MESH', "radius": round(radius, 6),
+                                             "shared": shared})
+            scale_path = f'pose.bones["{controls[0]}"].my_tool_props.circle_scale'
+            influence_path = f'pose.bones["{controls[0]}"].my_tool_props.damped_track_influence'
+            chain["properties"] = {scale_path: circle_scale, influence_path: influence}
+            for name in controls:
+                for i in range(2):
+                    chain["drivers"].append({"data_path": f'pose.bones["{name}"].custom_shape_scale_xyz', "index": i,
+                                             "expression": scale_expression, "source": scale_path})
+            chain["collections"] = {
+                f"ctrl_{base_name}_all": {"bones": controls, "is_visible": True},
+                f"ctrl_{base_name}_first": {"bones": controls[:1], "is_visible": False},
+            }
+
+            for name in deform:
+                chain["constraints"].append({"bone": name, "type": 'COPY_ROTATION', "target": armature.name,
+                                             "subtarget": f"ctr_{name}"})
+            for name, target in zip(deform, deform[1:] + [tip]):
+                if not target:
+                    continue
+                chain["constraints"].append({"bone": name, "type": 'DAMPED_TRACK', "target": armature.name,
+                                             "subtarget": target})
+                chain["drivers"].append({"data_path": f'pose.bones["{name}"].constraints["Damped Track"].influence',
+                                         "index": 0, "expression": "influence_var", "source": influence_path})
+        chains.append(chain)
+
+    # 父骨骼也被细分时，新链挂到父骨骼细分后对应的新骨骼上
+    for root in roots:
+        root["parent"] = replaced.get(root["parent"], root["parent"])
+    return {
+        "addon_version": list(bl_info["version"]),
+        "armature": armature.name,
+        "settings": {"segments": segments, "mode": mode, "coefficient": coefficient, "as_chain": as_chain,
+                     "add_tip": add_tip, "density_blend": density_blend, "rig": rig},
+        "chains": chains,
+        "reparented": reparented,
+        "totals": {
+            "chains": len(chains),
+            "bones_added": sum(len(c["bones"]) for c in chains),
+            "bones_removed": sum(len(c["removed"]) for c in chains),
+            "constraints": sum(len(c["constraints"]) for c in chains),
+            "drivers": sum(len(c["drivers"]) for c in chains),
+            "collections": sum(len(c["collections"]) for c in chains),
+            "objects": sum(len(c["objects"]) for c in chains),
+        },
+    }
+
+# --- 二级运动求解器 ---
+# 以下 SOLVER 内核只使用 NumPy，不访问 bpy，所有链以 (链 × 段 × 3) 数组一起计算。
+# 段数不同的链按最长的链补齐：补齐段的静止长度为 0，补齐点与链末端重合。
+# tests/conftest.py 按本段首尾两行注释截取这一段，在没有 Blender 的环境中加载测试，段内只能引用 np、os、sys。
+
+def rotation_between(a, b):
+    """返回把单位向量 a 转到单位向量 b 的旋转矩阵，形状 (..., 3, 3)"""
+    v = np.cross(a, b)
+    c = np.sum(a * b, axis=-1)
+    vx = np.zeros(v.shape[:-1] + (3, 3))
+    vx[..., 0, 1], vx[..., 0, 2] = -v[..., 2], v[..., 1]
+    vx[..., 1, 0], vx[..., 1, 2] = v[..., 2], -v[..., 0]
+    vx[..., 2, 0], vx[..., 2, 1] = -v[..., 1], v[..., 0]
+    k = 1.0 / np.maximum(1.0 + c, 1e-8)
+    rot = np.eye(3) + vx + (vx @ vx) * k[..., None, None]
+    # 方向相反时绕任意垂直轴旋转180度
+    opposite = c < -1.0 + 1e-6
+    if np.any(opposite):
+        axis = np.cross(a[opposite], [1.0, 0.0, 0.0])
+        small = np.linalg.norm(axis, axis=-1) < 1e-6
+        axis[small] = np.cross(a[opposite][small], [0.0, 1.0, 0.0])
+        axis /= np.linalg.norm(axis, axis=-1, keepdims=True)
+        rot[opposite] = 2.0 * axis[..., :, None] * axis[..., None, :] - np.eye(3)
+    return rot
+
+def step_chains(pos, prev, target, rest_lengths, stiffness=0.3, damping=0.1, gravity=(0.0, 0.0, 0.0), dt=1.0 / 24.0, pinned=2):
+    """推进一帧 Verlet 弹簧阻尼模拟，返回新的 (pos, prev)
+
+    pos/prev/target 形状 (链, 点, 3)，rest_lengths 形状 (链, 点-1)。前 pinned 个点直接跟随目标，
+    其余点带惯性地向目标弹回，再由根到梢逐段恢复静止长度（follow-the-leader）。
+    """
+    velocity = (pos - prev) * (1.0 - damping)
+    new_pos = pos + velocity + stiffness * (target - pos) + np.asarray(gravity) * (dt * dt)
+    new_pos[:, :pinned] = target[:, :pinned]
+    for i in range(max(1, pinned), new_pos.shape[1]):
+        seg = new_pos[:, i] - new_pos[:, i - 1]
+        dist = np.linalg.norm(seg, axis=-1, keepdims=True)
+        new_pos[:, i] = new_pos[:, i - 1] + seg * (rest_lengths[:, i - 1, None] / np.maximum(dist, 1e-8))
+    return new_pos, pos
+
+def simulate_chains(targets, rest_lengths, stiffness=0.3, damping=0.1, gravity=(0.0, 0.0, 0.0), dt=1.0 / 24.0, pinned=2):
+    """对整段动画做二级运动模拟
+
+    targets 形状 (帧, 链, 点, 3)，是动画给出的目标点位置，第0帧作为静止的初始状态。
+    返回同形状的模拟点位置。
+    """
+    out = np.empty_like(targets, dtype=np.float64)
+    pos = targets[0].astype(np.float64)
+    prev = pos.copy()
+    out[0] = pos
+    for f in range(1, targets.shape[0]):
+        pos, prev = step_chains(pos, prev, targets[f], rest_lengths, stiffness, damping, gravity, dt, pinned)
+        out[f] = pos
+    return out
+
+def solve_chain_poses(points, pose_mats):
+    """把动画姿态矩阵的Y轴摆到模拟方向、头部移到模拟点，得到模拟后的姿态矩阵 (..., 段, 4, 4)"""
+    y_axis = pose_mats[..., :3, 1]
+    y_axis = y_axis / np.maximum(np.linalg.norm(y_axis, axis=-1, keepdims=True), 1e-12)
+    seg = points[..., 1:, :] - points[..., :-1, :]
+    length = np.linalg.norm(seg, axis=-1, keepdims=True)
+    # 零长度（补齐）段保持原方向
+    direction = np.where(length > 1e-8, seg / np.maximum(length, 1e-8), y_axis)
+    out = np.array(pose_mats, dtype=np.float64)
+    out[..., :3, :3] = rotation_between(y_axis, direction) @ out[..., :3, :3]
+    out[..., :3, 3] = points[..., :-1, :]
+    return out
+
+def local_basis_matrices(sim_pose, root_parent, rest_rel):
+    """由模拟姿态反推每根骨骼的局部变换：basis_i = (父姿态 @ 相对静止矩阵)^-1 @ 姿态_i
+
+    sim_pose (帧, 链, 段, 4, 4)，root_parent (帧, 链, 4, 4) 是第一根骨骼父骨骼的姿态，rest_rel (链, 段, 4, 4)。
+    """
+    parents = np.concatenate([root_parent[:, :, None], sim_pose[:, :, :-1]], axis=2)
+    return np.linalg.inv(parents @ rest_rel) @ sim_pose
+
+def matrices_to_quaternions(mats):
+    """把 (..., 3, 3) 旋转矩阵转换为 (..., 4) 的 wxyz 四元数
+
+    按迹和对角元中最大的一项选择分支（Shepperd 方法），旋转接近180度时也不会丢失分量之间的符号关系。
+    """
+    m = mats / np.maximum(np.linalg.norm(mats, axis=-2, keepdims=True), 1e-12)
+    m00, m11, m22 = m[..., 0, 0], m[..., 1, 1], m[..., 2, 2]
+    trace = m00 + m11 + m22
+    # 四个候选分支的 4*q 组合（未归一化），分别以 w、x、y、z 为主分量
+    candidates = np.stack([
+        np.stack([1.0 + trace, m[..., 2, 1] - m[..., 1, 2], m[..., 0, 2] - m[..., 2, 0], m[..., 1, 0] - m[..., 0, 1]], axis=-1),
+        np.stack([m[..., 2, 1] - m[..., 1, 2], 1.0 + m00 - m11 - m22, m[..., 0, 1] + m[..., 1, 0], m[..., 0, 2] + m[..., 2, 0]], axis=-1),
+        np.stack([m[..., 0, 2] - m[..., 2, 0], m[..., 0, 1] + m[..., 1, 0], 1.0 - m00 + m11 - m22, m[..., 1, 2] + m[..., 2, 1]], axis=-1),
+        np.stack([m[..., 1, 0] - m[..., 0, 1], m[..., 0, 2] + m[..., 2, 0], m[..., 1, 2] + m[..., 2, 1], 1.0 - m00 - m11 + m22], axis=-1),
+    ], axis=-2)
+    branch = np.argmax(np.stack([trace, m00, m11, m22], axis=-1), axis=-1)
+    q = np.take_along_axis(candidates, branch[..., None, None], axis=-2)[..., 0, :]
+    q = q / np.linalg.norm(q, axis=-1, keepdims=True)
+    # 统一到 w >= 0 的半球
+    return np.where(q[..., :1] < 0.0, -q, q)
+
+def make_quaternions_continuous(quats):
+    """沿第0维（帧）翻转符号，使相邻帧的四元数点积非负，避免插值绕远路"""
+    if quats.shape[0] < 2:
+        return quats
+    dots = np.sum(quats[1:] * quats[:-1], axis=-1)
+    signs = np.cumprod(np.where(dots < 0.0, -1.0, 1.0), axis=0)
+    out = quats.copy()
+    out[1:] *= signs[..., None]
+    return out
+
+def solve_chain_rotations(samples, stiffness=0.3, damping=0.1, gravity=(0.0, 0.0, 0.0), dt=1.0 / 24.0, pinned=2):
+    """完整的求解流程：模拟点位置 -> 姿态矩阵 -> 局部四元数 (帧, 链, 段, 4)
+
+    samples 为 sample_chains 返回的数组字典，本函数不依赖 bpy。
+    """
+    points = simulate_chains(samples["points"], samples["rest_lengths"], stiffness, damping, gravity, dt, pinned)
+    sim_pose = solve_chain_poses(points, samples["pose"])
+    basis = local_basis_matrices(sim_pose, samples["root_parent"], samples["rest_rel"])
+    return make_quaternions_continuous(matrices_to_quaternions(basis[..., :3, :3]))
+
+# 链数少于该值时进程开销大于收益，每个工作进程至少分到这么多条链
+PARALLEL_MIN_CHAINS = 64
+# 每个工作进程平均分到的任务块数，块越多越早开始回写结果
+PARALLEL_CHUNKS_PER_WORKER = 4
+SOLVER_SECTION_BEGIN = "# --- 二级运动求解器 ---"
+SOLVER_SECTION_END = "# 以下为与 Blender 数据交互的部分"
+# 工作进程导入的求解器模块，首次并行求解时生成
+_worker_module = None
+
+def _solve_chain_slice(part, start, stiffness, damping, gravity, dt, pinned):
+    """工作进程入口：求解一段链，只依赖 NumPy"""
+    quats = solve_chain_rotations(part, stiffness, damping, gravity, dt, pinned)
+    return start, quats.astype(np.float32)
+
+def _chain_slice(samples, start, stop):
+    """截取 [start, stop) 范围内的链；带帧维度的数组第二维是链，其余数组第一维是链"""
+    return {key: value[:, start:stop] if key in ("points", "pose", "root_parent") else value[start:stop]
+            for key, value in samples.items()}
+
+def _load_worker_module():
+    """把本段源码写成临时目录中的独立模块并导入，返回模块
+
+    spawn 启动的工作进程是全新的解释器，不能导入 bpy 和插件本身，只能按名称导入这个不依赖 bpy 的模块。
+    临时目录会加入 sys.path，spawn 会把父进程的 sys.path 传给工作进程。
+    """
+    global _worker_module
+    if _worker_module is not None:
+        return _worker_module
+    import hashlib
+    import importlib
+    import tempfile
+    path = _solve_chain_slice.__code__.co_filename
+    with open(path, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    section = "\n".join(lines[lines.index(SOLVER_SECTION_BEGIN):lines.index(SOLVER_SECTION_END)])
+    source = "import os\nimport sys\n\nimport numpy as np\n\n" + section + "\n"
+    name = "_cartilage_solver_" + hashlib.sha1(source.encode("utf-8")).hexdigest()[:12]
+    directory = os.path.join(tempfile.gettempdir(), "cartilage_solver")
+    os.makedirs(directory, exist_ok=True)
+    module_path = os.path.join(directory, name + ".py")
+    if not os.path.exists(module_path):
+        tmp_path = f"{module_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(source)
+        os.replace(tmp_path, module_path)
+    if directory not in sys.path:
+        sys.path.append(directory)
+    _worker_module = importlib.import_module(name)
+    return _worker_module
+
+def solve_chain_rotations_parallel(samples, stiffness=0.3, damping=0.1, gravity=(0.0, 0.0, 0.0), dt=1.0 / 24.0,
+                                   pinned=2, workers=0):
+    """按链拆分到多个工作进程求解，结果与 solve_chain_rotations 相同（float32）
+
+    workers 为 0 时使用全部CPU核心，实际进程数还受 PARALLEL_MIN_CHAINS 限制。
+    工作进程以 spawn 方式启动，只导入 _load_worker_module 生成的求解器模块；在 Blender 进程里 fork 会复制
+    其线程和 GPU 状态，不安全。无法生成该模块时退回线程池（NumPy 运算期间会释放GIL）。
+    各块按完成顺序写回结果。
+    """
+    chain_count = samples["rest_lengths"].shape[0]
+    workers = min(workers or os.cpu_count() or 1, max(1, chain_count // PARALLEL_MIN_CHAINS))
+    if workers <= 1:
+        return solve_chain_rotations(samples, stiffness, damping, gravity, dt, pinned).astype(np.float32)
+
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+    try:
+        entry = _load_worker_module()._solve_chain_slice
+        executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+    except (OSError, ImportError, ValueError):
+        entry = _solve_chain_slice
+        executor = ThreadPoolExecutor(workers)
+
+    chunks = min(workers * PARALLEL_CHUNKS_PER_WORKER, max(workers, chain_count // PARALLEL_MIN_CHAINS))
+    bounds = np.linspace(0, chain_count, chunks + 1).astype(int)
+    frame_count, seg_count = samples["points"].shape[0], samples["rest_lengths"].shape[1]
+    quats = np.empty((frame_count, chain_count, seg_count, 4), dtype=np.float32)
+    with executor:
+        # spawn 会在工作进程里重新执行父进程的 __main__（Blender 中运行的脚本通常导入 bpy），
+        # 工作进程在 submit 时启动，提交期间换成空模块
+        main_module = sys.modules["__main__"]
+        if entry is not _solve_chain_slice:
+            import types
+            sys.modules["__main__"] = types.ModuleType("__main__")
+        try:
+            futures = [executor.submit(entry, _chain_slice(samples, int(a), int(b)), int(a),
+                                       stiffness, damping, gravity, dt, pinned)
+                       for a, b in zip(bounds[:-1], bounds[1:])]
+        finally:
+            sys.modules["__main__"] = main_module
+        for future in as_completed(futures):
+            start, part = future.result()
+            quats[:, start:start + part.shape[1]] = part
+    return quats
+
+# 以下为与 Blender 数据交互的部分
+
+def _pose_matrices(pose_bones):
+    """一次 foreach_get 读取所有姿态骨骼的矩阵，返回 (骨骼, 4, 4)"""
+    buf = np.empty(len(pose_bones) * 16, dtype=np.float32)
+    pose_bones.foreach_get("matrix", buf)
+    # RNA 矩阵按列存储
+    return buf.reshape(-1, 4, 4).transpose(0, 2, 1)
+
+def sample_chains(armature, chains, frames):
+    """逐帧求值骨架并一次性读取所有链的姿态，返回求解器需要的数组字典，采样期间暂停链LOD
+
+    points (帧, 链, 段+1, 3)、pose (帧, 链, 段, 4, 4)、root_parent (帧, 链, 4, 4)、
+    rest_lengths (链, 段)、rest_rel (链, 段, 4, 4)、mask (链, 段)。
+    """
+    scene = bpy.context.scene
+    _ensure_mode(armature, 'POSE')
+    pose_bones, bones = armature.pose.bones, armature.data.bones
+    bone_index = {pb.name: i for i, pb in enumerate(pose_bones)}
+    chain_count = len(chains)
+    seg_count = max(len(chain["deform"]) for chain in chains)
+
+    idx = np.zeros((chain_count, seg_count), dtype=np.int64)
+    mask = np.zeros((chain_count, seg_count), dtype=bool)
+    parent_idx = np.full(chain_count, -1, dtype=np.int64)
+    rest_lengths = np.zeros((chain_count, seg_count))
+    rest_rel = np.tile(np.eye(4), (chain_count, seg_count, 1, 1))
+    lengths = np.zeros((chain_count, seg_count))
+    for c, chain in enumerate(chains):
+        names = chain["deform"]
+        idx[c, :len(names)] = [bone_index[n] for n in names]
+        idx[c, len(names):] = bone_index[names[-1]]
+        mask[c, :len(names)] = True
+        # 静止长度取自 ctr_ 控制骨骼（与变形骨骼一致），没有控制骨骼时取变形骨骼
+        for s, name in enumerate(names):
+            ctrl = bones.get(f"ctr_{name}")
+            rest_lengths[c, s] = (ctrl or bones[name]).length
+        lengths[c] = bones[names[-1]].length
+        lengths[c, :len(names)] = [bones[n].length for n in names]
+        parent = bones[names[0]].parent
+        prev_rest = np.array(parent.matrix_local) if parent else np.eye(4)
+        if parent:
+            parent_idx[c] = bone_index[parent.name]
+        for s, name in enumerate(names):
+            rest = np.array(bones[name].matrix_local)
+            rest_rel[c, s] = np.linalg.inv(prev_rest) @ rest
+            prev_rest = rest
+
+    pose = np.empty((len(frames), chain_count, seg_count, 4, 4))
+    root_parent = np.tile(np.eye(4), (len(frames), chain_count, 1, 1))
+    has_parent = parent_idx >= 0
+    original_frame = scene.frame_current
+    with chain_lod_suspended(scene):
+        for f, frame in enumerate(frames):
+            scene.frame_set(frame)
+            mats = _pose_matrices(armature.evaluated_get(bpy.context.evaluated_depsgraph_get()).pose.bones)
+            pose[f] = mats[idx]
+            root_parent[f, has_parent] = mats[parent_idx[has_parent]]
+        scene.frame_set(original_frame)
+
+    heads = pose[..., :3, 3]
+    tails = heads + pose[..., :3, 1] * lengths[None, ..., None]
+    points = np.concatenate([heads[:, :, :1], tails], axis=2)
+    return {
+        "points": points,
+        "pose": pose,
+        "root_parent": root_parent,
+        "rest_lengths": rest_lengths,
+        "rest_rel": rest_rel,
+        "mask": mask,
+    }
+
+def write_chain_rotations(armature, chains, frames, quats):
+    """把 (帧, 链, 段, 4) 的局部四元数批量写成变形骨骼的关键帧"""
+    for c, chain in enumerate(chains):
+        for s, name in enumerate(chain["deform"]):
+            pb = armature.pose.bones[name]
+            # 模拟结果按四元数写入
+            pb.rotation_mode = 'QUATERNION'
+            write_fcurve_samples(armature, pb, "rotation_quaternion", frames, quats[:, c, s].T)
+
+# 模拟结果缓存目录，位于 .blend 文件旁
+SIM_CACHE_DIR = "cartilage_cache"
+
+def sim_cache_key(armature, chains, frames, params):
+    """由链结构、静止姿态、求解参数和源动画计算缓存键，任何一项变化都会得到新键"""
+    h = hashlib.sha1()
+    bones, pose_bones = armature.data.bones, armature.pose.bones
+    h.update(repr((frames[0], frames[-1], tuple(params))).encode())
+    h.update(np.array(armature.matrix_world, dtype=np.float64).tobytes())
+    for chain in chains:
+        h.update(chain["base_name"].encode())
+        for name in chain["deform"]:
+            bone = bones[name]
+            ctrl = bones.get(f"ctr_{name}")
+            h.update(name.encode())
+            h.update(np.array(bone.matrix_local, dtype=np.float64).tobytes())
+            h.update(np.float64((ctrl or bone).length).tobytes())
+            # 不计入 mute：LOD、实时抖动和烘焙会临时静音约束，这不代表绑定变化
+            for const in pose_bones[name].constraints:
+                h.update(repr((const.type, round(const.influence, 6))).encode())
+
+    # 源动画：骨架动作中所有F曲线的关键帧、控制柄和插值方式
+    for fcurve in (_action_fcurves(armature) or ()):
+        count = len(fcurve.keyframe_points)
+        h.update(repr((fcurve.data_path, fcurve.array_index, fcurve.mute, count, len(fcurve.modifiers))).encode())
+        buf = np.empty(count * 2, dtype=np.float32)
+        for prop in ("co", "handle_left", "handle_right"):
+            fcurve.keyframe_points.foreach_get(prop, buf)
+            h.update(buf.tobytes())
+        interp = np.empty(count, dtype=np.int32)
+        fcurve.keyframe_points.foreach_get("interpolation", interp)
+        h.update(interp.tobytes())
+    return h.hexdigest()[:16]
+
+def _cache_dir_name(name):
+    """清理后的名称加原名的哈希，名称相近的文件或骨架（如 a 与 a_b、a.b）不会共用目录"""
+    return f"{bpy.path.clean_name(name)}_{hashlib.sha1(name.encode()).hexdigest()[:8]}"
+
+def _sim_cache_dir(armature=None):
+    """返回缓存目录：每个 .blend 一个子目录，其中每个骨架再一个子目录；不指定骨架时返回文件的目录，
+    文件未保存时返回 None
+    """
+    if not bpy.data.filepath:
+        return None
+    stem = os.path.splitext(os.path.basename(bpy.data.filepath))[0]
+    directory = os.path.join(bpy.path.abspath("//" + SIM_CACHE_DIR), _cache_dir_name(stem))
+    return directory if armature is None else os.path.join(directory, _cache_dir_name(armature.name))
+
+def load_sim_cache(armature, key, shape):
+    """按键读取缓存的 (帧, 链, 段, 4) 四元数，未命中返回 None
+
+    命中后结果仍要全部写成关键帧，所以直接整体读入，不使用内存映射。
+    """
+    directory = _sim_cache_dir(armature)
+    if directory is None:
+        return None
+    path = os.path.join(directory, f"{key}.npy")
+    if not os.path.isfile(path):
+        return None
+    try:
+        quats = np.load(path)
+    except (OSError, ValueError):
+        return None
+    return quats if quats.shape == tuple(shape) else None
+
+def _remove_cache_files(directory):
+    """删除目录中的 .npy 缓存文件，目录空了一并删除，返回 (文件数, 字节数)"""
+    files = size = 0
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name.endswith(".npy") and os.path.isfile(path):
+            size += os.path.getsize(path)
+            os.remove(path)
+            files += 1
+    if not os.listdir(directory):
+        os.rmdir(directory)
+    return files, size
+
+def clear_sim_cache(armature=None):
+    """删除指定骨架（或当前文件所有骨架）的缓存，返回 (文件数, 字节数)"""
+    directory = _sim_cache_dir(armature)
+    if directory is None or not os.path.isdir(directory):
+        return 0, 0
+    if armature is not None:
+        return _remove_cache_files(directory)
+    files = size = 0
+    for name in os.listdir(directory):
+        if os.path.isdir(os.path.join(directory, name)):
+            removed = _remove_cache_files(os.path.join(directory, name))
+            files, size = files + removed[0], size + removed[1]
+    if not os.listdir(directory):
+        os.rmdir(directory)
+    return files, size
+
+def save_sim_cache(armature, key, quats):
+    """写入缓存，同一骨架的旧缓存随之失效并被删除，返回写入路径"""
+    directory = _sim_cache_dir(armature)
+    if directory is None:
+        return None
+    clear_sim_cache(armature)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{key}.npy")
+    np.save(path, np.asarray(quats, dtype=np.float32))
+    return path
+
+def simulate_and_bake_chains(armature, chains, frame_start, frame_end, stiffness=0.3, damping=0.1, gravity=0.0,
+                             use_cache=True, workers=1):
+    """对链做二级运动模拟并把结果写成关键帧，约束随后被静音，可用 unbake_chains 撤销
+
+    gravity 为世界空间 -Z 方向的重力加速度（米/秒²）。use_cache 时结果缓存在 .blend 旁，
+    绑定和源动画不变时直接读取缓存，跳过逐帧采样和求解。workers 不为 1 时按链并行求解，
+    0 表示使用全部核心。返回 (模拟帧数, 是否命中缓存)。
+    """
+    if not chains:
+        return 0, False
+    # 已烘焙的链先恢复，保证采样的是实时绑定的动画
+    unbake_chains(armature, chains)
+    scene = bpy.context.scene
+    frames = list(range(frame_start, frame_end + 1))
+    dt = scene.render.fps_base / scene.render.fps
+    gravity_local = armature.matrix_world.inverted().to_3x3() @ Vector((0.0, 0.0, -gravity))
+
+    key = sim_cache_key(armature, chains, frames, (stiffness, damping, gravity, dt)) if use_cache else None
+    shape = (len(frames), len(chains), max(len(c["deform"]) for c in chains), 4)
+    quats = load_sim_cache(armature, key, shape) if key else None
+    cached = quats is not None
+    if not cached:
+        samples = sample_chains(armature, chains, frames)
+        quats = solve_chain_rotations_parallel(samples, stiffness, damping, tuple(gravity_local), dt, workers=workers)
+        if key:
+            save_sim_cache(armature, key, quats)
+    _backup_unbaked_chains(armature, chains)
+    write_chain_rotations(armature, chains, frames, quats)
+    _record_bake(armature, chains, frames, 1)
+    return len(frames), cached
+
+# --- 实时抖动：frame_change_post 处理器逐帧推进所有注册链的 NumPy 状态 ---
+
+# 骨架名 -> 运行时状态（索引数组、模拟点位置、上一帧帧号）
+_jiggle_states = {}
+# 最近一帧处理器耗时与滑动平均（毫秒），显示在面板中
+_jiggle_timing = {"last_ms": 0.0, "avg_ms": 0.0}
+
+def _basis_matrices(pose_bones):
+    """一次 foreach_get 读取所有姿态骨骼的局部变换，返回 (骨骼, 4, 4)"""
+    buf = np.empty(len(pose_bones) * 16, dtype=np.float32)
+    pose_bones.foreach_get("matrix_basis", buf)
+    return buf.reshape(-1, 4, 4).transpose(0, 2, 1)
+
+def add_jiggle_chains(armature, chains):
+    """把链注册到实时抖动：静音链的约束并把变形骨骼切换为四元数旋转，返回注册的链数量
+
+    已烘焙或没有FK控制骨骼的链会被跳过。
+    """
+    _ensure_mode(armature, 'POSE')
+    registry = dict(armature.get(JIGGLE_CHAINS_PROP) or {})
+    backups = armature.get(JIGGLE_BACKUP_PROP)
+    backups = backups.to_dict() if backups else {}
+    baked = armature.get(BAKED_CHAINS_PROP) or {}
+    added = 0
+    for chain in chains:
+        if not chain["controls"] or chain["base_name"] in baked:
+            continue
+        set_chain_constraints_muted(armature, chain, True)
+        # 已注册的链保留第一次加入前的记录
+        if chain["base_name"] not in backups:
+            backups[chain["base_name"]] = {name: _pose_rotation_record(armature.pose.bones[name])
+                                           for name in chain["deform"]}
+        for name in chain["deform"]:
+            armature.pose.bones[name].rotation_mode = 'QUATERNION'
+        registry[chain["base_name"]] = 1
+        added += 1
+    armature[JIGGLE_CHAINS_PROP] = registry
+    armature[JIGGLE_BACKUP_PROP] = backups
+    _jiggle_states.pop(armature.name, None)
+    _lod_index.pop(armature.name, None)
+    return added
+
+def remove_jiggle_chains(armature, chains):
+    """取消链的实时抖动，恢复约束以及加入前的旋转模式和旋转值，返回取消的链数量
+
+    没有记录的链（旧版本加入的）把写入的四元数旋转归零。
+    """
+    _ensure_mode(armature, 'POSE')
+    registry = dict(armature.get(JIGGLE_CHAINS_PROP) or {})
+    backups = armature.get(JIGGLE_BACKUP_PROP)
+    backups = backups.to_dict() if backups else {}
+    removed = 0
+    for chain in chains:
+        if chain["base_name"] not in registry:
+            continue
+        records = backups.pop(chain["base_name"], {})
+        for name in chain["deform"]:
+            pb = armature.pose.bones.get(name)
+            if not pb:
+                continue
+            if name in records:
+                _apply_pose_rotation_record(pb, records[name])
+            else:
+                pb.rotation_quaternion = (1.0, 0.0, 0.0, 0.0)
+        set_chain_constraints_muted(armature, chain, False)
+        del registry[chain["base_name"]]
+        _lod_muted.pop((armature.name, chain["base_name"]), None)
+        removed += 1
+    armature[JIGGLE_CHAINS_PROP] = registry
+    armature[JIGGLE_BACKUP_PROP] = backups
+    _jiggle_states.pop(armature.name, None)
+    _lod_index.pop(armature.name, None)
+    return removed
+
+def _jiggle_build_state(armature):
+    """为骨架上注册的链建立索引数组，骨骼或注册表变化时重建"""
+    registry = armature.get(JIGGLE_CHAINS_PROP) or {}
+    signature = (len(armature.data.bones), tuple(sorted(registry.keys())))
+    state = _jiggle_states.get(armature.name)
+    if state and state["signature"] == signature:
+        return state
+
+    chains = [c for c in list_chains(armature) if c["base_name"] in registry]
+    if not chains:
+        _jiggle_states.pop(armature.name, None)
+        return None
+    pose_bones, bones = armature.pose.bones, armature.data.bones
+    bone_index = {pb.name: i for i, pb in enumerate(pose_bones)}
+    chain_count = len(chains)
+    seg_count = max(len(c["deform"]) for c in chains)
+    def_idx = np.zeros((chain_count, seg_count), dtype=np.int64)
+    ctrl_idx = np.zeros((chain_count, seg_count), dtype=np.int64)
+    mask = np.zeros((chain_count, seg_count), dtype=bool)
+    parent_idx = np.full(chain_count, -1, dtype=np.int64)
+    rest_lengths = np.zeros((chain_count, seg_count))
+    lengths = np.zeros((chain_count, seg_count))
+    rest_rel = np.tile(np.eye(4), (chain_count, seg_count, 1, 1))
+    for c, chain in enumerate(chains):
+        names, count = chain["deform"], len(chain["deform"])
+        def_idx[c, :count] = [bone_index[n] for n in names]
+        def_idx[c, count:] = def_idx[c, count - 1]
+        ctrl_idx[c, :count] = [bone_index[n] for n in chain["controls"]]
+        ctrl_idx[c, count:] = ctrl_idx[c, count - 1]
+        mask[c, :count] = True
+        lengths[c, :count] = rest_lengths[c, :count] = [bones[n].length for n in chain["controls"]]
+        parent = bones[names[0]].parent
+        prev_rest = np.array(parent.matrix_local) if parent else np.eye(4)
+        if parent:
+            parent_idx[c] = bone_index[parent.name]
+        for i, name in enumerate(names):
+            rest = np.array(bones[name].matrix_local)
+            rest_rel[c, i] = np.linalg.inv(prev_rest) @ rest
+            prev_rest = rest
+
+    state = {
+        "signature": signature,
+        "def_idx": def_idx,
+        "ctrl_idx": ctrl_idx,
+        "mask": mask,
+        "parent_idx": parent_idx,
+        "rest_lengths": rest_lengths,
+        "lengths": lengths,
+        "rest_rel": rest_rel,
+        "rot_buf": np.empty(len(pose_bones) * 4, dtype=np.float32),
+        "pos": None,
+        "prev": None,
+        "frame": None,
+    }
+    _jiggle_states[armature.name] = state
+    return state
+
+def _jiggle_step(scene, armature, state, settings, depsgraph):
+    """推进一条骨架上所有注册链的一帧，并一次 foreach_set 写回所有变形骨骼的旋转"""
+    frame = scene.frame_current
+    if frame == state["frame"]:
+        return
+    pose_eval = armature.evaluated_get(depsgraph).pose.bones
+    mats = _pose_matrices(pose_eval)
+    basis = _basis_matrices(pose_eval)
+    ctrl_idx, rest_rel = state["ctrl_idx"], state["rest_rel"]
+
+    # 由控制骨骼的局部变换沿静止链累乘出FK目标姿态；第一根控制骨骼不受抖动影响，直接取求值结果
+    fk = np.empty(ctrl_idx.shape + (4, 4))
+    fk[:, 0] = mats[ctrl_idx[:, 0]]
+    for i in range(1, ctrl_idx.shape[1]):
+        fk[:, i] = fk[:, i - 1] @ rest_rel[:, i] @ basis[ctrl_idx[:, i]]
+    heads = fk[..., :3, 3]
+    tails = heads + fk[..., :3, 1] * state["lengths"][..., None]
+    target = np.concatenate([heads[:, :1], tails], axis=1)
+
+    # 跳帧（含倒放）时重置状态，避免把跳跃当成速度
+    if state["pos"] is None or frame != state["frame"] + 1:
+        state["pos"], state["prev"] = target.copy(), target.copy()
+    else:
+        dt = scene.render.fps_base / scene.render.fps
+        gravity = armature.matrix_world.inverted().to_3x3() @ Vector((0.0, 0.0, -settings.gravity))
+        state["pos"], state["prev"] = step_chains(state["pos"], state["prev"], target, state["rest_lengths"],
+                                                  settings.stiffness, settings.damping, tuple(gravity), dt)
+    state["frame"] = frame
+
+    sim = solve_chain_poses(state["pos"], fk)
+    root_parent = np.tile(np.eye(4), (len(ctrl_idx), 1, 1))
+    has_parent = state["parent_idx"] >= 0
+    root_parent[has_parent] = mats[state["parent_idx"][has_parent]]
+    local = local_basis_matrices(sim[None], root_parent[None], rest_rel)[0]
+    quats = matrices_to_quaternions(local[..., :3, :3])
+
+    pose_bones = armature.pose.bones
+    buf = state["rot_buf"]
+    pose_bones.foreach_get("rotation_quaternion", buf)
+    mask = state["mask"]
+    buf.reshape(-1, 4)[state["def_idx"][mask]] = quats[mask]
+    pose_bones.foreach_set("rotation_quaternion", buf)
+    armature.update_tag(refresh={'OBJECT', 'DATA'})
+
+@bpy.app.handlers.persistent
+def _jiggle_frame_change_post(scene, depsgraph=None):
+    settings = scene.cartilage_jiggle
+    if not settings.enabled:
+        return
+    t0 = time.perf_counter()
+    if depsgraph is None:
+        depsgraph = bpy.context.evaluated_depsgraph_get()
+    for obj in scene.objects:
+        if obj.type != 'ARMATURE' or obj.mode == 'EDIT' or not obj.get(JIGGLE_CHAINS_PROP):
+            continue
+        state = _jiggle_build_state(obj)
+        if state:
+            _jiggle_step(scene, obj, state, settings, depsgraph)
+    elapsed = (time.perf_counter() - t0) * 1000.0
+    _jiggle_timing["last_ms"] = elapsed
+    _jiggle_timing["avg_ms"] = elapsed if not _jiggle_timing["avg_ms"] else 0.9 * _jiggle_timing["avg_ms"] + 0.1 * elapsed
+
+@bpy.app.handlers.persistent
+def _jiggle_reset(*args):
+    _jiggle_states.clear()
+    _jiggle_timing["last_ms"] = _jiggle_timing["avg_ms"] = 0.0
+
+def update_jiggle_settings(self, context):
+    """切换开关时清空运行时状态，下一帧从动画姿态重新开始"""
+    _jiggle_reset()
+
+class JiggleProperties(bpy.types.PropertyGroup):
+    enabled: bpy.props.BoolProperty(
+        name="实时抖动",
+        description="播放时对已注册的链实时模拟惯性摆动，不需要烘焙",
+        default=False,
+        update=update_jiggle_settings
+    )
+    stiffness: bpy.props.FloatProperty(
+        name="跟随刚度",
+        description="每帧向动画姿态弹回的比例，越大越贴近原动画",
+        default=0.3,
+        min=0.0,
+        max=1.0
+    )
+    damping: bpy.props.FloatProperty(
+        name="阻尼",
+        description="每帧损失的速度比例，越大摆动停得越快",
+        default=0.1,
+        min=0.0,
+        max=1.0
+    )
+    gravity: bpy.props.FloatProperty(
+        name="重力",
+        description="世界空间向下的重力加速度（米/秒²）",
+        default=0.0,
+        min=0.0,
+        soft_max=20.0
+    )
+
+JIGGLE_HANDLERS = (
+    (bpy.app.handlers.frame_change_post, _jiggle_frame_change_post),
+    (bpy.app.handlers.load_post, _jiggle_reset),
+    (bpy.app.handlers.undo_post, _jiggle_reset),
+    (bpy.app.handlers.redo_post, _jiggle_reset),
+)
+
 # 插件偏好设置
 class DampedTrackAddonPreferences(bpy.types.AddonPreferences):
     # 动态ID与模块名一致，确保重命名脚本后偏好仍显示
@@ -172,6 +2795,50 @@ class DampedTrackAddonPreferences(bpy.types.AddonPreferences):
         soft_max=1.0,
     )
     
+    # 控制器图形
+    share_control_shapes: bpy.props.BoolProperty(
+        name="共享控制器图形",
+        description="半径接近的链共用同一个圆环图形，不再为每条链单独创建",
+        default=True
+    )
+    use_shape_library: bpy.props.BoolProperty(
+        name="从资产库链接图形",
+        description="从共享的资产库 .blend 链接控制器图形，所有文件共用同一份数据，不再生成圆环",
+        default=False
+    )
+    shape_library_path: bpy.props.StringProperty(
+        name="资产库文件",
+        description="包含控制器图形的 .blend 文件",
+        default="",
+        subtype='FILE_PATH'
+    )
+    shape_library_object: bpy.props.StringProperty(
+        name="图形对象",
+        description="资产库文件中作为控制器图形的网格对象名称，图形应位于 XY 平面内",
+        default="cir_lib"
+    )
+    control_shape_resolution: bpy.props.IntProperty(
+        name="圆环分辨率",
+        description="控制器圆环的顶点数，控制器很多时较低的分辨率能提高视图帧率",
+        default=16,
+        min=4,
+        max=64
+    )
+
+    # 模拟缓存
+    use_sim_cache: bpy.props.BoolProperty(
+        name="缓存模拟结果",
+        description="把二级运动模拟结果保存在 .blend 文件旁的 cartilage_cache 文件夹，绑定和动画不变时直接复用",
+        default=True
+    )
+    sim_workers: bpy.props.IntProperty(
+        name="模拟进程数",
+        description="二级运动模拟按链并行求解的进程数，0 表示使用全部CPU核心，1 表示不并行",
+        default=0,
+        min=0,
+        max=256
+    )
+
     # 右键菜单设置
     enable_right_click_menu: bpy.props.BoolProperty(
         name="启用右键菜单",
@@ -197,78 +2864,74 @@ class DampedTrackAddonPreferences(bpy.types.AddonPreferences):
         col4.prop(self, "default_circle_scale")
         col5 = row2.column()
         col5.prop(self, "default_damped_track_influence")
+
+        row = layout.row()
+        row.prop(self, "share_control_shapes")
+        row.prop(self, "control_shape_resolution")
+        row = layout.row()
+        row.prop(self, "use_shape_library")
+        col = layout.column()
+        col.enabled = self.use_shape_library
+        col.prop(self, "shape_library_path")
+        col.prop(self, "shape_library_object")
+
+        row3 = layout.row()
+        row3.prop(self, "use_sim_cache")
+        row3.prop(self, "sim_workers")
         
         # 提示：更改立即生效
         layout.separator()
         layout.label(text="提示：工具面板的取消启用，重启下N面板即可", icon='INFO')
 
-# 用于防止递归更新的标志
-_visibility_update_lock = False
-
-# 用于防止递归更新的标志
-_visibility_update_lock = False
+# 链的控制器显示状态 -> (ctrl_<base>_all 可见, ctrl_<base>_first 可见)
+CHAIN_VISIBILITY_FLAGS = {
+    'ALL': (True, False),
+    'FIRST': (False, True),
+    'HIDDEN': (False, False),
+}
 
-def update_ctrl_bone_visibility(self, context):
-    """更新控制骨骼的可见性"""
-    global _visibility_update_lock
-    
-    # 防止递归更新
-    if _visibility_update_lock:
+# 链的控制器显示状态，枚举值的编号供 get/set 使用
+CHAIN_VISIBILITY_ITEMS = [
+    ('ALL', "全部", "显示链的所有控制器", 'HIDE_OFF', 0),
+    ('FIRST', "仅根", "只显示链的第一根控制器", 'BONE_DATA', 1),
+    ('HIDDEN', "隐藏", "隐藏链的所有控制器", 'HIDE_ON', 2),
+]
+
+def _props_owner_base_name(props):
+    """旧版本生成的绑定没有记录 chain_base：找到持有该属性组的姿态骨骼，由骨骼名推断链的基础名称"""
+    armature = props.id_data
+    pointer = props.as_pointer()
+    for pb in armature.pose.bones:
+        if pb.my_tool_props.as_pointer() == pointer:
+            return resolve_chain_base_name(pb.name, armature.data.bones)
+    return None
+
+def _props_chain_collections(props):
+    """由控制骨骼上的属性组找到所属链的 (ctrl_<base>_all, ctrl_<base>_first) 集合，缺少时返回 None"""
+    # 挂在姿态骨骼上的属性组不能用 path_from_id 反查骨骼，链的基础名称由 build_fk 写入属性组
+    base_name = props.chain_base or _props_owner_base_name(props)
+    if not base_name:
+        return None
+    collections = props.id_data.data.collections_all
+    all_collection = collections.get(f"ctrl_{base_name}_all")
+    first_collection = collections.get(f"ctrl_{base_name}_first")
+    if all_collection is None or first_collection is None:
+        return None
+    return all_collection, first_collection
+
+def _get_chain_visibility(self):
+    """显示状态不单独存储，直接由两个控制集合的可见性得出"""
+    pair = _props_chain_collections(self)
+    if pair is None or pair[0].is_visible:
+        return 0
+    return 1 if pair[1].is_visible else 2
+
+def _set_chain_visibility(self, value):
+    """把显示状态直接映射为两个控制集合的可见性，不触发其他属性的更新"""
+    pair = _props_chain_collections(self)
+    if pair is None:
         return
-        
-    # 防止在某些情况下可能的错误
-    try:
-        if context and hasattr(context, 'object') and context.object and context.object.type == 'ARMATURE':
-            armature = context.object.data
-            # 获取当前属性所属的骨骼（即调用此更新函数的骨骼）
-            # 在这种情况下，self是MyArmatureProperties实例，它的id_data是PoseBone
-            pose_bone = self.id_data
-            
-            if pose_bone and hasattr(pose_bone, 'name'):
-                # 从控制骨骼名称中提取基础名称 (例如: 从 "ctr_arm.001" 中获取 "arm")
-                bone_name = pose_bone.name.replace('ctr_', '')
-                bone_name_parts = bone_name.split('.')
-                if len(bone_name_parts) > 1 and bone_name_parts[-1].isdigit():
-                    base_name = '.'.join(bone_name_parts[:-1])
-                else:
-                    base_name = bone_name
-
-                # 生成集合名称
-                collection_name_all = f"ctrl_{base_name}_all"
-                collection_name_first = f"ctrl_{base_name}_first"
-                
-                # 检查集合是否存在（使用 collections_all）
-                if collection_name_all in armature.collections_all and collection_name_first in armature.collections_all:
-                    all_collection = armature.collections_all[collection_name_all]
-                    first_collection = armature.collections_all[collection_name_first]
-                    
-                    _visibility_update_lock = True
-                    try:
-                        # 如果用户勾选了"独显第一根"，取消"显示所有"
-                        if getattr(pose_bone.my_tool_props, 'show_only_first_ctrl_bone', False):
-                            pose_bone.my_tool_props.show_all_ctrl_bones = False
-                        # 如果用户勾选了"显示所有"，取消"独显第一根"
-                        elif getattr(pose_bone.my_tool_props, 'show_all_ctrl_bones', False):
-                            pose_bone.my_tool_props.show_only_first_ctrl_bone = False
-
-                        # 根据最新状态设置集合可见性
-                        if getattr(pose_bone.my_tool_props, 'show_only_first_ctrl_bone', False):
-                            all_collection.is_visible = False
-                            first_collection.is_visible = True
-                        elif getattr(pose_bone.my_tool_props, 'show_all_ctrl_bones', False):
-                            all_collection.is_visible = True
-                            first_collection.is_visible = False
-                        else:
-                            all_collection.is_visible = False
-                            first_collection.is_visible = False
-                    finally:
-                        _visibility_update_lock = False
-    except Exception as e:
-        # 确保即使出错也要重置锁
-        _visibility_update_lock = False
-        print(f"更新骨骼可见性时出错: {e}")
-        pass
-
+    pair[0].is_visible, pair[1].is_visible = CHAIN_VISIBILITY_FLAGS[CHAIN_VISIBILITY_ITEMS[value][0]]
 
 # --- Property Group for Custom Properties (Robust UI) ---
 class MyArmatureProperties(bpy.types.PropertyGroup):
@@ -290,18 +2953,303 @@ class MyArmatureProperties(bpy.types.PropertyGroup):
         soft_min=0.0,
         soft_max=5.0,
     )
-    show_all_ctrl_bones: bpy.props.BoolProperty(
-        name="显示所有控制骨骼",
-        description="显示所有控制骨骼",
-        default=True,
-        update=update_ctrl_bone_visibility
+    ctrl_visibility: bpy.props.EnumProperty(
+        name="控制器显示",
+        description="整条链控制器的显示方式，直接对应链的两个控制骨骼集合",
+        items=CHAIN_VISIBILITY_ITEMS,
+        get=_get_chain_visibility,
+        set=_set_chain_visibility
+    )
+    chain_base: bpy.props.StringProperty(
+        name="链基础名",
+        description="该控制骨骼所属链的基础名称，由FK绑定写入",
+        options={'HIDDEN'}
+    )
+
+# --- 批量可见性：一次遍历骨骼集合建立索引，批量切换多条链的控制集合 ---
+
+def chain_collection_pairs(arm):
+    """一次遍历骨骼集合，返回 {基础名: (ctrl_<base>_all 集合, ctrl_<base>_first 集合)}，只包含成对存在的链"""
+    alls, firsts = {}, {}
+    for collection in arm.collections_all:
+        name = collection.name
+        if not name.startswith("ctrl_"):
+            continue
+        if name.endswith("_all"):
+            alls[name[len("ctrl_"):-len("_all")]] = collection
+        elif name.endswith("_first"):
+            firsts[name[len("ctrl_"):-len("_first")]] = collection
+    return {base: (collection, firsts[base]) for base, collection in alls.items() if base in firsts}
+
+def set_chains_visibility(armature, state, base_names=None, others=None):
+    """把 base_names 中的链（None 为全部链）的控制集合设为 state（'ALL'/'FIRST'/'HIDDEN'）
+
+    others 不为 None 时其余链设为 others，用于独显。只写入有变化的标志，返回状态发生变化的链数。
+    """
+    pairs = chain_collection_pairs(armature.data)
+    targets = set(pairs) if base_names is None else set(base_names)
+    changed = 0
+    for base, (all_collection, first_collection) in pairs.items():
+        if base in targets:
+            show_all, show_first = CHAIN_VISIBILITY_FLAGS[state]
+        elif others is not None:
+            show_all, show_first = CHAIN_VISIBILITY_FLAGS[others]
+        else:
+            continue
+        if all_collection.is_visible == show_all and first_collection.is_visible == show_first:
+            continue
+        all_collection.is_visible = show_all
+        first_collection.is_visible = show_first
+        changed += 1
+    return changed
+
+class ChainVisibilityProperties(bpy.types.PropertyGroup):
+    filter: bpy.props.StringProperty(
+        name="筛选",
+        description="只处理基础名称匹配该通配符的链，如 hair_*，留空表示全部链",
+        default=""
+    )
+    selected_only: bpy.props.BoolProperty(
+        name="仅选中的链",
+        description="只处理包含选中骨骼的链",
+        default=False
     )
-    show_only_first_ctrl_bone: bpy.props.BoolProperty(
-        name="独显第一根控制骨骼",
-        description="只显示第一根控制骨骼，隐藏其他控制骨骼",
+
+# --- 链LOD：按规则批量静音次要链的约束和驱动器 ---
+
+# 骨架名 -> (签名, {基础名: LOD条目})，签名变化时才重建
+_lod_index = {}
+# (骨架名, 基础名) -> 当前是否已静音，只有状态变化时才写入约束和驱动器
+_lod_muted = {}
+# 渲染期间所有链都保持启用
+_lod_rendering = False
+# 大于0时LOD暂停（烘焙、模拟采样期间），所有链保持启用，可以嵌套
+_lod_suspended = 0
+
+def _lod_signature(armature):
+    anim_data = armature.animation_data
+    return (len(armature.data.bones), len(armature.data.collections_all),
+            len(anim_data.drivers) if anim_data else 0)
+
+def _lod_chain_index(armature):
+    """返回骨架的LOD索引：每条链的根骨骼、需要静音的约束和驱动器"""
+    if armature.mode == 'EDIT':
+        return _lod_index.get(armature.name, (None, {}))[1]
+    signature = _lod_signature(armature)
+    cached = _lod_index.get(armature.name)
+    if cached and cached[0] == signature:
+        return cached[1]
+
+    index, owner = {}, {}
+    pose_bones = armature.pose.bones
+    # 已烘焙和实时抖动的链自行静音约束，LOD不再接管
+    baked = armature.get(BAKED_CHAINS_PROP) or {}
+    jiggle = armature.get(JIGGLE_CHAINS_PROP) or {}
+    for chain in list_chains(armature):
+        if chain["base_name"] in baked or chain["base_name"] in jiggle:
+            continue
+        entry = {"root": chain["deform"][0], "collections": chain["collections"], "constraints": [], "drivers": []}
+        for name in chain["deform"]:
+            pb = pose_bones.get(name)
+            if pb:
+                entry["constraints"] += [(name, c.name) for c in pb.constraints if c.type in CHAIN_CONSTRAINT_TYPES]
+        for name in chain["deform"] + chain["controls"]:
+            owner[name] = entry
+        index[chain["base_name"]] = entry
+
+    # 驱动器按数据路径里的骨骼名归属到链
+    if armature.animation_data:
+        for fcurve in armature.animation_data.drivers:
+            path = fcurve.data_path
+            if path.startswith('pose.bones["'):
+                entry = owner.get(path[len('pose.bones["'):].split('"]', 1)[0])
+                if entry:
+                    entry["drivers"].append((path, fcurve.array_index))
+
+    _lod_index[armature.name] = (signature, index)
+    return index
+
+def _lod_should_mute(settings, scene, armature, entry, camera_location):
+    if settings.use_simplify and scene.render.use_simplify and scene.render.simplify_subdivision <= settings.simplify_level:
+        return True
+    if settings.use_hidden:
+        if not armature.visible_get():
+            return True
+        collections = armature.data.collections_all
+        if not any(collections[name].is_visible for name in entry["collections"] if name in collections):
+            return True
+    if settings.camera_distance > 0 and camera_location is not None:
+        root = armature.pose.bones.get(entry["root"])
+        if root and ((armature.matrix_world @ root.head) - camera_location).length > settings.camera_distance:
+            return True
+    return False
+
+def _lod_set_chain_muted(armature, entry, muted):
+    pose_bones = armature.pose.bones
+    for bone_name, constraint_name in entry["constraints"]:
+        pb = pose_bones.get(bone_name)
+        const = pb.constraints.get(constraint_name) if pb else None
+        if const and const.mute != muted:
+            const.mute = muted
+    if armature.animation_data:
+        drivers = armature.animation_data.drivers
+        for path, index in entry["drivers"]:
+            fcurve = drivers.find(path, index=index)
+            if fcurve and fcurve.mute != muted:
+                fcurve.mute = muted
+
+def update_chain_lod(scene, force=False):
+    """按LOD规则批量静音或恢复场景中各链的约束和驱动器，返回状态发生变化的链数量
+
+    只有状态变化的链才会写入，未变化时每帧只做少量判断。
+    """
+    settings = scene.cartilage_lod
+    enabled = settings.enabled and not _lod_rendering and not _lod_suspended
+    camera_location = scene.camera.matrix_world.translation if scene.camera else None
+    changed = 0
+    for obj in scene.objects:
+        if obj.type != 'ARMATURE':
+            continue
+        for base_name, entry in _lod_chain_index(obj).items():
+            muted = enabled and _lod_should_mute(settings, scene, obj, entry, camera_location)
+            key = (obj.name, base_name)
+            if not force and _lod_muted.get(key, False) == muted:
+                continue
+            _lod_set_chain_muted(obj, entry, muted)
+            _lod_muted[key] = muted
+            changed += 1
+    return changed
+
+@contextmanager
+def chain_lod_suspended(scene):
+    """在 with 块内暂停LOD：先恢复所有被静音的链，块内逐帧求值时不再静音，结束后按规则重新写入
+
+    烘焙和模拟采样需要实时绑定的完整结果，不能让隐藏或远离相机的链在采样中途被静音。
+    """
+    global _lod_suspended
+    _lod_suspended += 1
+    try:
+        if scene.cartilage_lod.enabled:
+            update_chain_lod(scene, force=True)
+        yield
+    finally:
+        _lod_suspended -= 1
+        if scene.cartilage_lod.enabled and not _lod_suspended:
+            update_chain_lod(scene, force=True)
+
+def _lod_active(scene):
+    return scene.cartilage_lod.enabled and not _lod_rendering and not _lod_suspended
+
+def _lod_update_relevant(scene, depsgraph):
+    """依赖图更新是否可能改变LOD判断：场景（简化、活动相机、对象显示）、骨架数据（骨骼集合可见性）、
+    集合的显示、相机或骨架对象的移动；编辑姿态、网格等其他更新直接跳过"""
+    camera = scene.camera
+    for update in depsgraph.updates:
+        id_data = getattr(update.id, "original", update.id)
+        if isinstance(id_data, (bpy.types.Scene, bpy.types.Armature, bpy.types.Collection)):
+            return True
+        if isinstance(id_data, bpy.types.Object) and update.is_updated_transform and (
+                id_data.type == 'ARMATURE' or id_data == camera):
+            return True
+    return False
+
+@bpy.app.handlers.persistent
+def _lod_frame_change_pre(scene, *args):
+    # 只有相机距离规则随帧变化，其余规则由依赖图更新触发判断
+    if _lod_active(scene) and scene.cartilage_lod.camera_distance > 0:
+        update_chain_lod(scene)
+
+@bpy.app.handlers.persistent
+def _lod_depsgraph_update_post(scene, depsgraph=None, *args):
+    # 写入静音只会产生骨架对象的几何更新，会被过滤掉，不会循环
+    if _lod_active(scene) and (depsgraph is None or _lod_update_relevant(scene, depsgraph)):
+        update_chain_lod(scene)
+
+@bpy.app.handlers.persistent
+def _lod_render_init(scene, *args):
+    global _lod_rendering
+    _lod_rendering = True
+    update_chain_lod(scene)
+
+@bpy.app.handlers.persistent
+def _lod_render_finished(scene, *args):
+    global _lod_rendering
+    _lod_rendering = False
+    update_chain_lod(scene)
+
+@bpy.app.handlers.persistent
+def _lod_reset(*args):
+    # 加载文件和撤销后缓存的静音状态已不可信，清空后按规则重新写入
+    _lod_index.clear()
+    _lod_muted.clear()
+    scene = bpy.context.scene
+    if scene and scene.cartilage_lod.enabled:
+        update_chain_lod(scene, force=True)
+
+LOD_HANDLERS = (
+    (bpy.app.handlers.frame_change_pre, _lod_frame_change_pre),
+    (bpy.app.handlers.depsgraph_update_post, _lod_depsgraph_update_post),
+    (bpy.app.handlers.render_init, _lod_render_init),
+    (bpy.app.handlers.render_complete, _lod_render_finished),
+    (bpy.app.handlers.render_cancel, _lod_render_finished),
+    (bpy.app.handlers.load_post, _lod_reset),
+    (bpy.app.handlers.undo_post, _lod_reset),
+    (bpy.app.handlers.redo_post, _lod_reset),
+)
+
+def update_lod_settings(self, context):
+    """LOD设置变化时立即重新判断所有链，关闭LOD时强制恢复全部链"""
+    try:
+        update_chain_lod(context.scene, force=not self.enabled)
+    except Exception as e:
+        print(f"更新链LOD失败: {e}")
+
+class ChainLODProperties(bpy.types.PropertyGroup):
+    enabled: bpy.props.BoolProperty(
+        name="启用LOD",
+        description="播放时按规则静音次要链的约束和驱动器，渲染时自动恢复",
         default=False,
-        update=update_ctrl_bone_visibility
+        update=update_lod_settings
+    )
+    use_simplify: bpy.props.BoolProperty(
+        name="跟随简化",
+        description="场景开启简化且最大细分级别不高于阈值时静音",
+        default=True,
+        update=update_lod_settings
+    )
+    simplify_level: bpy.props.IntProperty(
+        name="简化阈值",
+        description="简化的最大细分级别不高于该值时静音",
+        default=6,
+        min=0,
+        max=6,
+        update=update_lod_settings
     )
+    use_hidden: bpy.props.BoolProperty(
+        name="隐藏时静音",
+        description="骨架被隐藏，或链的全部控制集合都隐藏时静音",
+        default=True,
+        update=update_lod_settings
+    )
+    camera_distance: bpy.props.FloatProperty(
+        name="相机距离",
+        description="链根部与活动相机的距离超过该值时静音，0表示不按距离判断",
+        default=0.0,
+        min=0.0,
+        unit='LENGTH',
+        update=update_lod_settings
+    )
+
+class WM_OT_UpdateChainLOD(bpy.types.Operator):
+    bl_idname = "armature.update_chain_lod"
+    bl_label = "刷新LOD"
+    bl_description = "重建链索引并按当前规则重新静音或恢复所有链"
+
+    def execute(self, context):
+        _lod_index.clear()
+        changed = update_chain_lod(context.scene, force=True)
+        self.report({'INFO'}, f"已更新 {changed} 条链")
+        return {'FINISHED'}
 
 # --- Mode Switch Operators ---
 class WM_OT_SwitchObjectMode(bpy.types.Operator):
@@ -340,7 +3288,8 @@ class SubdivideFibOperator(bpy.types.Operator):
         description="要分割的段数",
         default=5,
         min=1,
-        max=100
+        max=10000,
+        soft_max=100
     )
     
     coefficient: bpy.props.FloatProperty(
@@ -351,6 +3300,43 @@ class SubdivideFibOperator(bpy.types.Operator):
         max=10.0
     )
     
+    as_chain: bpy.props.BoolProperty(
+        name="整链细分",
+        description="把首尾相连的多根选中骨骼当作一整条链，沿它们的折线重新细分为一条链",
+        default=False
+    )
+
+    split_weights: bpy.props.BoolProperty(
+        name="拆分权重",
+        description="把绑定网格中原骨骼的顶点组按位置拆分到细分后的各段",
+        default=True
+    )
+
+    weight_falloff: bpy.props.FloatProperty(
+        name="权重过渡",
+        description="相邻两段之间权重平滑过渡的宽度，0 为硬切分",
+        default=0.5,
+        min=0.0,
+        max=1.0
+    )
+
+    weight_precision: bpy.props.EnumProperty(
+        name="权重精度",
+        description="写入顶点组的权重精度：自动按网格大小选择原值或量化写入",
+        items=WEIGHT_PRECISION_ITEMS,
+        default='AUTO'
+    )
+    # invoke 时取得的细分计划编号，重做时保持不变；脚本直接执行时为 0
+    plan_token: bpy.props.IntProperty(options={'HIDDEN', 'SKIP_SAVE'})
+    
+    density_blend: bpy.props.FloatProperty(
+        name="按网格密度",
+        description="按绑定网格沿骨骼的顶点密度和曲率调整分段位置，0 为不调整，1 为完全按密度分布，整链细分时不生效",
+        default=0.0,
+        min=0.0,
+        max=1.0
+    )
+
     auto_execute: bpy.props.BoolProperty(
         name="自动执行",
         description="执行细分后自动执行FK绑定和阻尼追踪",
@@ -364,6 +3350,8 @@ class SubdivideFibOperator(bpy.types.Operator):
     def invoke(self, context, event):
         # 使用Alt键状态作为自动执行的默认值
         self.auto_execute = event.alt
+        # 新的一次调用，丢弃上次的细分计划
+        self.plan_token = new_subdivide_plan_token()
         # 使用场景中的当前值作为默认值
         self.segments = context.scene.fib_segments
         self.coefficient = context.scene.fib_coefficient
@@ -374,74 +3362,27 @@ class SubdivideFibOperator(bpy.types.Operator):
         context.scene.fib_segments = self.segments
         context.scene.fib_coefficient = self.coefficient
         
-        segments = self.segments
-        coefficient = self.coefficient
         obj = context.object
-        arm = obj.data
-        
-        selected_bones_at_start = [b for b in arm.edit_bones if b.select]
-        last_first_bone = None
-
-        for bone in selected_bones_at_start:
-            parent = bone.parent
-            children = [c for c in arm.edit_bones if c.parent == bone]
-            head, tail, length = bone.head.copy(), bone.tail.copy(), bone.length
-            if length == 0: continue
-            
-            vec = tail - head
-            dir_vec = vec.normalized()
-            
-            fib = [1.0, 1.0]
-            for i in range(2, segments):
-                fib.append(fib[-1] + coefficient * fib[-2])
-            fib = fib[:segments]
-            fib = fib[::-1]
-            sum_f = sum(fib)
-            
-            new_bones, current_head = [], head
-            # Extract base name and find a unique base name that doesn't conflict with existing bones
-            original_base_name = bone.name.rsplit('.', 1)[0] if '.' in bone.name and bone.name.rsplit('.', 1)[1].isdigit() else bone.name
-            base_name = get_unique_base_name(original_base_name, arm.edit_bones)
-            
-            for i in range(segments):
-                seg_len = (fib[i] / sum_f) * length
-                current_tail = current_head + dir_vec * seg_len
-                new_bone = arm.edit_bones.new(f"{base_name}.{i+1:03d}")
-                new_bone.head, new_bone.tail = current_head, current_tail
-                new_bone.use_deform = True
-                new_bone.parent = new_bones[-1] if new_bones else parent
-                new_bones.append(new_bone)
-                current_head = current_tail
-            
-            if new_bones:
-                last_first_bone = new_bones[0]
-
-            extra_bone = arm.edit_bones.new(f"{base_name}.000")
-            extra_bone.head = new_bones[-1].tail
-            extra_bone.tail = new_bones[-1].tail + dir_vec * new_bones[-1].length
-            extra_bone.use_deform = True
-            extra_bone.parent = new_bones[-1]
-            
-            for child in children:
-                child.parent = extra_bone
-            arm.edit_bones.remove(bone)
-        
-        for b in arm.edit_bones: b.select = False
-        if last_first_bone:
-            last_first_bone.select = True
-            arm.edit_bones.active = last_first_bone
+        selected_bones_at_start = [b.name for b in obj.data.edit_bones if b.select]
+        # 首尾相连的选中骨骼可作为一整条链沿折线细分；在重做面板中调整参数时复用上次的计划
+        runs, plans = cached_subdivide_plans(obj, selected_bones_at_start, self.as_chain, self.plan_token)
+        weight_quantum = WEIGHT_PRECISION_QUANTUM[self.weight_precision]
+        chains = [subdivide_bone_run(obj, run, self.segments, 'FIB', self.coefficient,
+                                     split_weights=self.split_weights, weight_falloff=self.weight_falloff,
+                                     density_blend=self.density_blend, plan=plan, weight_quantum=weight_quantum)
+                  for run, plan in zip(runs, plans)]
+        chains = [c for c in chains if c]
+        if chains:
+            _select_bone(obj, chains[-1]["deform"][0])
+        if self.density_blend > 0.0 and any(len(run) > 1 for run in runs):
+            self.report({'WARNING'}, "按网格密度只对单根骨骼的细分生效，整链细分的链已忽略该选项")
 
         # 根据auto_execute标志决定是否自动执行完整流程
         if self.auto_execute:
-            # 立即执行FK绑定
-            bpy.ops.armature.setup_control_rig()
-            
-            # 切换到姿态模式以执行软骨绑定
-            bpy.ops.object.mode_set(mode='POSE')
-            
-            # 立即执行软骨绑定
-            bpy.ops.armature.apply_pose_setup()
-            
+            # 对每条新链执行FK绑定和软骨绑定，结束时处于姿态模式
+            rigged = _auto_rig_chains(obj, chains)
+            if rigged:
+                _select_bone(obj, rigged[-1]["controls"][0])
             self.report({'INFO'}, "已完成：斐波那契细分 -> FK绑定 -> 阻尼追踪")
         else:
             # 询问是否执行FK绑定
@@ -472,89 +3413,518 @@ class SubdivideAverageOperator(bpy.types.Operator):
         description="要分割的段数",
         default=5,
         min=1,
+        max=10000,
+        soft_max=100
+    )
+    
+    as_chain: bpy.props.BoolProperty(
+        name="整链细分",
+        description="把首尾相连的多根选中骨骼当作一整条链，沿它们的折线重新细分为一条链",
+        default=False
+    )
+
+    split_weights: bpy.props.BoolProperty(
+        name="拆分权重",
+        description="把绑定网格中原骨骼的顶点组按位置拆分到细分后的各段",
+        default=True
+    )
+
+    weight_falloff: bpy.props.FloatProperty(
+        name="权重过渡",
+        description="相邻两段之间权重平滑过渡的宽度，0 为硬切分",
+        default=0.5,
+        min=0.0,
+        max=1.0
+    )
+
+    weight_precision: bpy.props.EnumProperty(
+        name="权重精度",
+        description="写入顶点组的权重精度：自动按网格大小选择原值或量化写入",
+        items=WEIGHT_PRECISION_ITEMS,
+        default='AUTO'
+    )
+    # invoke 时取得的细分计划编号，重做时保持不变；脚本直接执行时为 0
+    plan_token: bpy.props.IntProperty(options={'HIDDEN', 'SKIP_SAVE'})
+    
+    density_blend: bpy.props.FloatProperty(
+        name="按网格密度",
+        description="按绑定网格沿骨骼的顶点密度和曲率调整分段位置，0 为不调整，1 为完全按密度分布，整链细分时不生效",
+        default=0.0,
+        min=0.0,
+        max=1.0
+    )
+
+    auto_execute: bpy.props.BoolProperty(
+        name="自动执行",
+        description="执行细分后自动执行FK绑定和阻尼追踪",
+        default=False
+    )
+
+    @classmethod
+    def poll(cls, context):
+        return context.mode == 'EDIT_ARMATURE' and context.object and context.object.type == 'ARMATURE'
+
+    def invoke(self, context, event):
+        # 使用Alt键状态作为自动执行的默认值
+        self.auto_execute = event.alt
+        # 新的一次调用，丢弃上次的细分计划
+        self.plan_token = new_subdivide_plan_token()
+        # 使用场景中的当前值作为默认值
+        self.segments = context.scene.fib_segments
+        return context.window_manager.invoke_props_dialog(self, width=300)
+
+    def execute(self, context):
+        # 更新场景属性以保持一致性
+        context.scene.fib_segments = self.segments
+        
+        obj = context.object
+        selected_bones_at_start = [b.name for b in obj.data.edit_bones if b.select]
+        # 首尾相连的选中骨骼可作为一整条链沿折线细分；在重做面板中调整参数时复用上次的计划
+        runs, plans = cached_subdivide_plans(obj, selected_bones_at_start, self.as_chain, self.plan_token)
+        weight_quantum = WEIGHT_PRECISION_QUANTUM[self.weight_precision]
+        chains = [subdivide_bone_run(obj, run, self.segments, 'AVERAGE', 1.0,
+                                     split_weights=self.split_weights, weight_falloff=self.weight_falloff,
+                                     density_blend=self.density_blend, plan=plan, weight_quantum=weight_quantum)
+                  for run, plan in zip(runs, plans)]
+        chains = [c for c in chains if c]
+        if chains:
+            _select_bone(obj, chains[-1]["deform"][0])
+        if self.density_blend > 0.0 and any(len(run) > 1 for run in runs):
+            self.report({'WARNING'}, "按网格密度只对单根骨骼的细分生效，整链细分的链已忽略该选项")
+
+        # 根据auto_execute标志决定是否自动执行完整流程
+        if self.auto_execute:
+            # 对每条新链执行FK绑定和阻尼追踪，结束时处于姿态模式
+            rigged = _auto_rig_chains(obj, chains)
+            if rigged:
+                _select_bone(obj, rigged[-1]["controls"][0])
+            self.report({'INFO'}, "已完成：平均细分 -> FK绑定 -> 阻尼追踪")
+        else:
+            # 询问是否执行FK绑定
+            context.window_manager.popup_menu(self.show_continue_dialog_avg, title="执行FK绑定?", icon='INFO')
+        
+        return {'FINISHED'}
+
+    def show_continue_dialog_avg(self, menu, context):
+        layout = menu.layout
+        row = layout.row()
+        row.label(text="是否继续执行FK绑定?", icon='QUESTION')
+        
+        row = layout.row()
+        row.operator_context = 'EXEC_DEFAULT'
+        row.operator("armature.setup_control_rig", text="是", icon='CHECKMARK')
+        
+        row.operator_context = 'INVOKE_DEFAULT'
+        row.operator("wm.close_panel", text="否", icon='X')
+
+class SubdivideBBoneOperator(bpy.types.Operator):
+    bl_idname = "armature.subdivide_bbone"
+    bl_label = "B-Bone细分"
+    bl_description = "只用少量骨骼加B-Bone段数做出软骨弯曲，骨骼和约束数量远少于逐段细分，适合群集角色"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    segments: bpy.props.IntProperty(
+        name="段数",
+        description="整条链的B-Bone弯曲段数合计",
+        default=20,
+        min=1,
         max=100
     )
-    
-    auto_execute: bpy.props.BoolProperty(
-        name="自动执行",
-        description="执行细分后自动执行FK绑定和阻尼追踪",
+
+    controllers: bpy.props.IntProperty(
+        name="控制器数",
+        description="真实骨骼数量，每根骨骼对应一个FK控制器",
+        default=3,
+        min=1,
+        max=32
+    )
+
+    auto_execute: bpy.props.BoolProperty(
+        name="自动执行",
+        description="执行细分后自动执行FK绑定和阻尼追踪",
+        default=False
+    )
+
+    @classmethod
+    def poll(cls, context):
+        return context.mode == 'EDIT_ARMATURE' and context.object and context.object.type == 'ARMATURE'
+
+    def invoke(self, context, event):
+        # 使用Alt键状态作为自动执行的默认值
+        self.auto_execute = event.alt
+        # 使用场景中的当前值作为默认值
+        self.segments = context.scene.fib_segments
+        return context.window_manager.invoke_props_dialog(self, width=300)
+
+    def execute(self, context):
+        # 更新场景属性以保持一致性
+        context.scene.fib_segments = self.segments
+
+        obj = context.object
+        selected_bones_at_start = [b.name for b in obj.data.edit_bones if b.select]
+        chains = [subdivide_bbone_chain(obj, name, self.segments, self.controllers) for name in selected_bones_at_start]
+        chains = [c for c in chains if c]
+        if chains:
+            _select_bone(obj, chains[-1]["deform"][0])
+
+        # 根据auto_execute标志决定是否自动执行完整流程
+        if self.auto_execute:
+            rigged = _auto_rig_chains(obj, chains)
+            if rigged:
+                _select_bone(obj, rigged[-1]["controls"][0])
+            self.report({'INFO'}, "已完成：B-Bone细分 -> FK绑定 -> 阻尼追踪")
+        else:
+            # 询问是否执行FK绑定
+            context.window_manager.popup_menu(self.show_continue_dialog_bbone, title="执行FK绑定?", icon='INFO')
+
+        return {'FINISHED'}
+
+    def show_continue_dialog_bbone(self, menu, context):
+        layout = menu.layout
+        row = layout.row()
+        row.label(text="是否继续执行FK绑定?", icon='QUESTION')
+
+        row = layout.row()
+        row.operator_context = 'EXEC_DEFAULT'
+        row.operator("armature.setup_control_rig", text="是", icon='CHECKMARK')
+
+        row.operator_context = 'INVOKE_DEFAULT'
+        row.operator("wm.close_panel", text="否", icon='X')
+
+class ChainsFromCurveOperator(bpy.types.Operator):
+    bl_idname = "armature.chains_from_curve"
+    bl_label = "从曲线生成链"
+    bl_description = "沿选中曲线的每条样条线生成一条细分骨骼链，可直接继续FK绑定"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    segments: bpy.props.IntProperty(
+        name="段数",
+        description="每条链的骨骼段数",
+        default=5,
+        min=1,
+        max=10000,
+        soft_max=100
+    )
+
+    mode: bpy.props.EnumProperty(
+        name="细分方式",
+        items=[
+            ('AVERAGE', "平均", "沿弧长等分"),
+            ('FIB', "斐波那契", "按斐波那契数列由密到疏分配弧长"),
+        ],
+        default='AVERAGE'
+    )
+
+    coefficient: bpy.props.FloatProperty(
+        name="系数",
+        description="斐波那契系数",
+        default=1.0,
+        min=0.01,
+        max=10.0
+    )
+
+    auto_execute: bpy.props.BoolProperty(
+        name="自动执行",
+        description="生成链后自动执行FK绑定和阻尼追踪",
+        default=False
+    )
+
+    @classmethod
+    def poll(cls, context):
+        return (context.mode in {'OBJECT', 'EDIT_ARMATURE'} and context.object and context.object.type == 'ARMATURE'
+                and any(o.type == 'CURVE' for o in context.selected_objects))
+
+    def invoke(self, context, event):
+        # 使用Alt键状态作为自动执行的默认值
+        self.auto_execute = event.alt
+        self.segments = context.scene.fib_segments
+        self.coefficient = context.scene.fib_coefficient
+        return context.window_manager.invoke_props_dialog(self, width=300)
+
+    def execute(self, context):
+        obj = context.object
+        chains = []
+        for curve_obj in [o for o in context.selected_objects if o.type == 'CURVE']:
+            chains += chains_from_curve(obj, curve_obj, self.segments, self.mode, self.coefficient)
+        if not chains:
+            self.report({'WARNING'}, "选中的曲线中没有可用的样条线")
+            return {'CANCELLED'}
+        _select_bone(obj, chains[-1]["deform"][0])
+
+        if self.auto_execute:
+            rigged = _auto_rig_chains(obj, chains)
+            if rigged:
+                _select_bone(obj, rigged[-1]["controls"][0])
+            self.report({'INFO'}, f"已完成：从曲线生成 {len(chains)} 条链 -> FK绑定 -> 阻尼追踪")
+        else:
+            self.report({'INFO'}, f"已从曲线生成 {len(chains)} 条链")
+        return {'FINISHED'}
+
+class ChainsFromMeshOperator(bpy.types.Operator):
+    bl_idname = "armature.chains_from_mesh"
+    bl_label = "从网格带生成链"
+    bl_description = "沿选中网格每个独立部分（如头发片、飘带）的中心线生成一条细分骨骼链"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    segments: bpy.props.IntProperty(
+        name="段数",
+        description="每条链的骨骼段数",
+        default=5,
+        min=1,
+        max=10000,
+        soft_max=100
+    )
+
+    mode: bpy.props.EnumProperty(
+        name="细分方式",
+        items=[
+            ('AVERAGE', "平均", "沿中心线等分"),
+            ('FIB', "斐波那契", "按斐波那契数列由密到疏分配长度"),
+        ],
+        default='AVERAGE'
+    )
+
+    coefficient: bpy.props.FloatProperty(
+        name="系数",
+        description="斐波那契系数",
+        default=1.0,
+        min=0.01,
+        max=10.0
+    )
+
+    root: bpy.props.EnumProperty(
+        name="根部",
+        items=[
+            ('TOP', "较高的一端", "链从网格带较高的一端开始"),
+            ('CURSOR', "靠近游标的一端", "链从离3D游标较近的一端开始"),
+        ],
+        default='TOP'
+    )
+
+    bins: bpy.props.IntProperty(
+        name="采样数",
+        description="沿主轴求中心线时的分箱数量，越大越贴合弯曲的网格带",
+        default=32,
+        min=2,
+        max=512
+    )
+
+    auto_execute: bpy.props.BoolProperty(
+        name="自动执行",
+        description="生成链后自动执行FK绑定和阻尼追踪",
+        default=False
+    )
+
+    @classmethod
+    def poll(cls, context):
+        return (context.mode in {'OBJECT', 'EDIT_ARMATURE'} and context.object and context.object.type == 'ARMATURE'
+                and any(o.type == 'MESH' for o in context.selected_objects))
+
+    def invoke(self, context, event):
+        # 使用Alt键状态作为自动执行的默认值
+        self.auto_execute = event.alt
+        self.segments = context.scene.fib_segments
+        self.coefficient = context.scene.fib_coefficient
+        return context.window_manager.invoke_props_dialog(self, width=300)
+
+    def execute(self, context):
+        obj = context.object
+        root_hint = context.scene.cursor.location.copy() if self.root == 'CURSOR' else None
+        chains = []
+        for mesh_obj in [o for o in context.selected_objects if o.type == 'MESH']:
+            chains += chains_from_mesh(obj, mesh_obj, self.segments, self.mode, self.coefficient,
+                                       bins=self.bins, root_hint=root_hint)
+        if not chains:
+            self.report({'WARNING'}, "选中的网格中没有可用的网格带")
+            return {'CANCELLED'}
+        _select_bone(obj, chains[-1]["deform"][0])
+
+        if self.auto_execute:
+            rigged = _auto_rig_chains(obj, chains)
+            if rigged:
+                _select_bone(obj, rigged[-1]["controls"][0])
+            self.report({'INFO'}, f"已完成：从网格带生成 {len(chains)} 条链 -> FK绑定 -> 阻尼追踪")
+        else:
+            self.report({'INFO'}, f"已从网格带生成 {len(chains)} 条链")
+        return {'FINISHED'}
+
+class RebakeControlShapesOperator(bpy.types.Operator):
+    bl_idname = "armature.rebake_control_shapes"
+    bl_label = "重建控制器图形"
+    bl_description = "按偏好中的圆环分辨率重建所有控制器图形，并移除旧版本添加的线框修改器"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        count = rebake_control_shapes()
+        self.report({'INFO'}, f"已重建 {count} 个控制器图形（{_shape_resolution()} 个顶点）")
+        return {'FINISHED'}
+
+class CollectShapeGarbageOperator(bpy.types.Operator):
+    bl_idname = "armature.collect_shape_garbage"
+    bl_label = "清理无用图形"
+    bl_description = "删除没有骨骼使用的 cir_ 控制器图形和不含骨骼的 ctrl_ 骨骼集合"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        shapes, collections, reclaimed = collect_control_shape_garbage()
+        if not shapes and not collections:
+            self.report({'INFO'}, "没有需要清理的图形或骨骼集合")
+            return {'FINISHED'}
+        self.report({'INFO'}, f"已删除 {shapes} 个控制器图形、{collections} 个骨骼集合，"
+                              f"约回收 {reclaimed / 1024:.1f} KB")
+        return {'FINISHED'}
+
+class PlanRigOperator(bpy.types.Operator):
+    bl_idname = "armature.plan_rig"
+    bl_label = "预览绑定计划"
+    bl_description = "不修改骨架，计算对选中骨骼细分并生成FK绑定和阻尼追踪将创建的骨骼、约束、驱动器和集合"
+    bl_options = {'REGISTER'}
+
+    segments: bpy.props.IntProperty(
+        name="段数",
+        description="要分割的段数",
+        default=5,
+        min=1,
+        max=10000,
+        soft_max=100
+    )
+
+    mode: bpy.props.EnumProperty(
+        name="细分方式",
+        items=[
+            ('FIB', "斐波那契", "按斐波那契数列由密到疏分配长度"),
+            ('AVERAGE', "平均", "平均分割"),
+        ],
+        default='FIB'
+    )
+
+    coefficient: bpy.props.FloatProperty(
+        name="系数",
+        description="斐波那契系数",
+        default=1.0,
+        min=0.01,
+        max=10.0
+    )
+
+    as_chain: bpy.props.BoolProperty(
+        name="整链细分",
+        description="把首尾相连的多根选中骨骼当作一整条链，沿它们的折线重新细分为一条链",
         default=False
     )
 
+    rig: bpy.props.BoolProperty(
+        name="包含绑定",
+        description="计划中包含FK绑定和阻尼追踪",
+        default=True
+    )
+
+    filepath: bpy.props.StringProperty(
+        name="保存为JSON",
+        description="计划的保存路径，留空时只在控制台输出统计",
+        default="",
+        subtype='FILE_PATH'
+    )
+
     @classmethod
     def poll(cls, context):
-        return context.mode == 'EDIT_ARMATURE' and context.object and context.object.type == 'ARMATURE'
+        return context.mode in {'EDIT_ARMATURE', 'POSE'} and context.object and context.object.type == 'ARMATURE'
 
     def invoke(self, context, event):
-        # 使用Alt键状态作为自动执行的默认值
-        self.auto_execute = event.alt
-        # 使用场景中的当前值作为默认值
         self.segments = context.scene.fib_segments
-        return context.window_manager.invoke_props_dialog(self, width=300)
+        self.coefficient = context.scene.fib_coefficient
+        return context.window_manager.invoke_props_dialog(self, width=400)
 
     def execute(self, context):
-        # 更新场景属性以保持一致性
-        context.scene.fib_segments = self.segments
-        
-        segments = self.segments
         obj = context.object
-        arm = obj.data
+        bones = obj.data.edit_bones if obj.mode == 'EDIT' else obj.data.bones
+        selected = [b.name for b in bones if b.select]
+        if not selected:
+            self.report({'WARNING'}, "请先选择骨骼")
+            return {'CANCELLED'}
+        plan = plan_rig(obj, selected, self.segments, self.mode, self.coefficient, self.as_chain, rig=self.rig)
+        totals = plan["totals"]
+        summary = (f"{totals['chains']} 条链：新增 {totals['bones_added']} 根骨骼，删除 {totals['bones_removed']} 根，"
+                   f"{totals['constraints']} 个约束，{totals['drivers']} 个驱动器，{totals['collections']} 个骨骼集合")
+        print(f"绑定计划 {obj.name}: {summary}")
+        if self.filepath:
+            path = bpy.path.abspath(self.filepath)
+            try:
+                with open(path, "w", encoding="utf-8") as f:
+                    json.dump(plan, f, indent=2, ensure_ascii=False)
+            except OSError as e:
+                self.report({'ERROR'}, f"保存计划失败: {e}")
+                return {'CANCELLED'}
+            summary += f"，已保存到 {path}"
+        self.report({'INFO'}, summary)
+        return {'FINISHED'}
 
-        selected_bones_at_start = [b for b in arm.edit_bones if b.select]
-        last_first_bone = None
+class EnvelopeSkinOperator(bpy.types.Operator):
+    bl_idname = "armature.envelope_skin"
+    bl_label = "快速封套蒙皮"
+    bl_description = "按顶点到骨骼的距离为选中的网格快速计算权重并绑定到活动骨架"
+    bl_options = {'REGISTER', 'UNDO'}
 
-        for bone in selected_bones_at_start:
-            parent = bone.parent
-            children = [c for c in arm.edit_bones if c.parent == bone]
-            head, tail, length = bone.head.copy(), bone.tail.copy(), bone.length
-            if length == 0: continue
+    max_influences: bpy.props.IntProperty(
+        name="最大影响骨骼数",
+        description="每个顶点最多受多少根骨骼影响",
+        default=4,
+        min=1,
+        max=16
+    )
+    falloff: bpy.props.FloatProperty(
+        name="衰减",
+        description="权重与距离的反比次方，越大权重越集中在最近的骨骼",
+        default=2.0,
+        min=0.1,
+        max=8.0
+    )
+    use_kdtree: bpy.props.BoolProperty(
+        name="限制搜索范围",
+        description="用 KD 树只计算每根骨骼附近的顶点，骨骼很多时更快",
+        default=True
+    )
+    search_scale: bpy.props.FloatProperty(
+        name="搜索范围",
+        description="每根骨骼的搜索半径相对骨骼半长的额外倍数",
+        default=1.0,
+        min=0.0,
+        soft_max=5.0
+    )
+    weight_precision: bpy.props.EnumProperty(
+        name="权重精度",
+        description="写入顶点组的权重精度：自动按网格大小选择原值或量化写入",
+        items=WEIGHT_PRECISION_ITEMS,
+        default='AUTO'
+    )
+    all_chains: bpy.props.BoolProperty(
+        name="所有链",
+        description="使用骨架上所有已绑定链的形变骨骼，否则只用选中骨骼和活动骨骼所在的链",
+        default=False
+    )
 
-            vec = tail - head
-            dir_vec = vec.normalized()
-            segment_length = length / segments
-            
-            new_bones, current_head = [], head
-            # Extract base name and find a unique base name that doesn't conflict with existing bones
-            original_base_name = bone.name.rsplit('.', 1)[0] if '.' in bone.name and bone.name.rsplit('.', 1)[1].isdigit() else bone.name
-            base_name = get_unique_base_name(original_base_name, arm.edit_bones)
-
-            for i in range(segments):
-                current_tail = current_head + dir_vec * segment_length
-                new_bone = arm.edit_bones.new(f"{base_name}.{i+1:03d}")
-                new_bone.head, new_bone.tail = current_head, current_tail
-                new_bone.use_deform = True
-                new_bone.parent = new_bones[-1] if new_bones else parent
-                new_bones.append(new_bone)
-                current_head = current_tail
-
-            if new_bones:
-                last_first_bone = new_bones[0]
-
-            for child in children:
-                child.parent = new_bones[-1]
-            arm.edit_bones.remove(bone)
-
-        for b in arm.edit_bones: b.select = False
-        if last_first_bone:
-            last_first_bone.select = True
-            arm.edit_bones.active = last_first_bone
+    @classmethod
+    def poll(cls, context):
+        return (context.mode == 'OBJECT' and context.object and context.object.type == 'ARMATURE' and
+                any(o.type == 'MESH' for o in context.selected_objects))
 
-        # 根据auto_execute标志决定是否自动执行完整流程
-        if self.auto_execute:
-            # 立即执行FK绑定
-            bpy.ops.armature.setup_control_rig()
-            
-            # 切换到姿态模式以执行阻尼追踪
-            bpy.ops.object.mode_set(mode='POSE')
-            
-            # 立即执行阻尼追踪
-            bpy.ops.armature.apply_pose_setup()
-            
-            self.report({'INFO'}, "已完成：平均细分 -> FK绑定 -> 阻尼追踪")
-        else:
-            # 询问是否执行FK绑定
-            context.window_manager.popup_menu(self.show_continue_dialog_avg, title="执行FK绑定?", icon='INFO')
-        
+    def execute(self, context):
+        armature = context.object
+        chains = list_chains(armature) if self.all_chains else _selected_chains(context)
+        bone_names = [name for chain in chains for name in chain["deform"] + ([chain["tip"]] if chain["tip"] else [])]
+        if not bone_names:
+            self.report({'WARNING'}, "请先在骨架上选中软骨链的骨骼")
+            return {'CANCELLED'}
+        meshes = [o for o in context.selected_objects if o.type == 'MESH']
+        t0 = time.perf_counter()
+        total = 0
+        for obj in meshes:
+            _, count = envelope_skin(armature, obj, bone_names, self.max_influences, self.falloff,
+                                     self.use_kdtree, self.search_scale,
+                                     weight_quantum=WEIGHT_PRECISION_QUANTUM[self.weight_precision])
+            total += count
+        elapsed = time.perf_counter() - t0
+        self.report({'INFO'}, f"已把 {len(meshes)} 个网格绑定到 {len(chains)} 条链，写入 {total} 个权重，"
+                              f"用时 {elapsed:.2f} 秒")
         return {'FINISHED'}
 
 # --- Update Check Operator ---
@@ -617,18 +3987,6 @@ class WM_OT_CheckAddonUpdate(bpy.types.Operator):
         except Exception as e:
             self.report({'ERROR'}, f"更新失败: {e}")
             return {'CANCELLED'}
-    
-    def show_continue_dialog_avg(self, menu, context):
-        layout = menu.layout
-        row = layout.row()
-        row.label(text="是否继续执行FK绑定?", icon='QUESTION')
-        
-        row = layout.row()
-        row.operator_context = 'EXEC_DEFAULT'
-        row.operator("armature.setup_control_rig", text="是", icon='CHECKMARK')
-        
-        row.operator_context = 'INVOKE_DEFAULT'
-        row.operator("wm.close_panel", text="否", icon='X')
 
 class SetupControlRigOperator(bpy.types.Operator):
     bl_idname = "armature.setup_control_rig"
@@ -642,189 +4000,20 @@ class SetupControlRigOperator(bpy.types.Operator):
 
     def execute(self, context):
         obj = context.object
-        arm = obj.data
-        edit_bones = arm.edit_bones
-
         active_bone = context.active_bone
         if not active_bone:
             self.report({'WARNING'}, "请先选择链中的一根骨骼")
             return {'CANCELLED'}
 
-        # 从活动骨骼中提取基础名称部分，考虑可能有下划线后缀的情况
-        bone_name_parts = active_bone.name.split('.')
-        if len(bone_name_parts) > 1 and bone_name_parts[-1].isdigit():
-            # 如果骨骼名格式为 base_name.number，则取除了数字后缀的部分
-            original_part = '.'.join(bone_name_parts[:-1])
-        else:
-            original_part = active_bone.name
-            
-        # 处理可能包含下划线的名称 (如 bone_1.001)
-        base_parts = original_part.rsplit('_', 1)
-        if len(base_parts) > 1 and base_parts[1].isdigit():
-            # 如果名称包含下划线数字后缀，尝试找到匹配的名称模式
-            potential_base = base_parts[0]
-            # 检查是否这种命名模式存在，否则回退到原名
-            matching_bones = [b for b in edit_bones if b.name.startswith(potential_base + '.')]
-            if matching_bones:
-                base_name = potential_base
-            else:
-                base_name = original_part
-        else:
-            base_name = original_part
-        
-        deform_chain = [b for b in edit_bones if b.name.startswith(base_name + '.') and b.name.split('.')[-1].isdigit() and int(b.name.split('.')[-1]) > 0]
-        deform_chain.sort(key=lambda b: int(b.name.split('.')[-1]))
-        tip_bone = edit_bones.get(base_name + ".000")
-        
-        chain_to_duplicate = deform_chain + ([tip_bone] if tip_bone else [])
-
-        if len(chain_to_duplicate) < 2:
-            self.report({'WARNING'}, f"根据 '{active_bone.name}' 未找到足够长的骨骼链 (至少需要2节)")
+        chain = find_chain(obj, active_bone.name)
+        active_name = active_bone.name
+        chain = build_fk(obj, chain) if chain else None
+        if not chain:
+            self.report({'WARNING'}, f"根据 '{active_name}' 未找到足够长的骨骼链 (至少需要2节)")
             return {'CANCELLED'}
 
-        new_bone_map = {}
-        for old_bone in chain_to_duplicate:
-            new_bone = arm.edit_bones.new(old_bone.name + "_temp_dup")
-            new_bone.head, new_bone.tail, new_bone.roll = old_bone.head.copy(), old_bone.tail.copy(), old_bone.roll
-            new_bone_map[old_bone.name] = new_bone
-
-        for old_bone in chain_to_duplicate:
-            if old_bone.parent and old_bone.parent.name in new_bone_map:
-                new_bone_map[old_bone.name].parent = new_bone_map[old_bone.parent.name]
-
-        duplicated_deform_bones = [new_bone_map[b.name] for b in deform_chain]
-        duplicated_tip_bone = new_bone_map.get(tip_bone.name) if tip_bone else None
-
-        num_controls = len(duplicated_deform_bones)
-        control_bone_names = []
-        for i in range(num_controls):
-            ctrl = duplicated_deform_bones[i]
-            new_name = f"ctr_{base_name}.{i+1:03d}"
-            ctrl.name, ctrl.use_deform = new_name, False
-            control_bone_names.append(new_name)
-        
-        if duplicated_tip_bone:
-            edit_bones.remove(duplicated_tip_bone)
-        
-        # 首先找到原始骨骼的父骨骼，以便后续将控制链连接到正确位置
-        original_chain_start = chain_to_duplicate[0] if chain_to_duplicate else None
-        original_parent = original_chain_start.parent if original_chain_start else None
-
-        for name in control_bone_names:
-            ctrl_bone = edit_bones.get(name)
-            if ctrl_bone: ctrl_bone.parent = None
-
-        first_control_bone_edit = edit_bones.get(control_bone_names[0])
-        if not first_control_bone_edit: return {'CANCELLED'}
-        
-        # 如果原始骨骼链有父骨骼，则将整个控制链连接到该父骨骼上
-        if original_parent and first_control_bone_edit:
-            first_control_bone_edit.parent = original_parent
-
-        radius = (first_control_bone_edit.length * obj.scale.x) / 2
-        ctr_base_name = control_bone_names[0].split('.')[0]
-        shape_name = f"cir_{ctr_base_name}"
-
-        bpy.ops.object.mode_set(mode='OBJECT')
-        if shape_name in bpy.data.objects:
-            bpy.data.objects.remove(bpy.data.objects[shape_name], do_unlink=True)
-
-        bpy.ops.mesh.primitive_circle_add(radius=radius, vertices=32, fill_type='NOTHING', location=obj.location)
-        cir_shap = context.active_object
-        cir_shap.name = shape_name
-        cir_shap.rotation_euler = (math.radians(90), 0, 0)
-        cir_shap.hide_render = True
-        cir_shap.hide_viewport = True # Compatibility fix for 4.x
-        mod = cir_shap.modifiers.new(type='WIREFRAME', name='Wire')
-        mod.thickness, mod.use_replace = 0.02, False
-
-        context.view_layer.objects.active = obj
-        bpy.ops.object.mode_set(mode='POSE')
-        
-        scale_prop_name = "circle_scale"
-        scale_controller_bone_name = control_bone_names[0]
-        scale_controller_bone = obj.pose.bones.get(scale_controller_bone_name)
-
-        if scale_controller_bone:
-            # 从偏好设置获取默认圆环缩放值
-            try:
-                addon_prefs = context.preferences.addons.get(__name__ if __name__ != "__main__" else "damped_track_addon")
-                if addon_prefs and hasattr(addon_prefs, 'preferences') and addon_prefs.preferences:
-                    default_circle_scale = addon_prefs.preferences.default_circle_scale
-                else:
-                    default_circle_scale = 1.0
-            except:
-                default_circle_scale = 1.0
-            scale_controller_bone.my_tool_props.circle_scale = default_circle_scale
-
-        for name in control_bone_names:
-            pb = obj.pose.bones.get(name)
-            if pb:
-                pb.custom_shape = cir_shap
-                pb.custom_shape_rotation_euler = (math.radians(90), 0, 0)
-                if scale_controller_bone:
-                    for i in range(2):
-                        fcurve = pb.driver_add("custom_shape_scale_xyz", i)
-                        driver = fcurve.driver
-                        driver.expression = "scale_var"
-                        var = driver.variables.new()
-                        var.name, var.type = "scale_var", 'SINGLE_PROP'
-                        var.targets[0].id = obj
-                        var.targets[0].data_path = f'pose.bones["{scale_controller_bone_name}"].my_tool_props.{scale_prop_name}'
-
-        bpy.ops.object.mode_set(mode='EDIT')
-        for i in range(num_controls, 1, -1):
-            ctr_bone = edit_bones.get(f"ctr_{base_name}.{i:03d}")
-            parent_def_bone = edit_bones.get(f"{base_name}.{i-1:03d}")
-            if ctr_bone and parent_def_bone: ctr_bone.parent = parent_def_bone
-
-        def_bone_001 = edit_bones.get(f"{base_name}.001")
-        ctr_bone_001 = edit_bones.get(f"ctr_{base_name}.001")
-        if def_bone_001 and ctr_bone_001: def_bone_001.parent = ctr_bone_001
-
         # --- Final Automation Step ---
-        bpy.ops.object.mode_set(mode='POSE')
-        for b in arm.bones: b.select = False
-        
-        first_control_bone_data = arm.bones.get(control_bone_names[0])
-        if first_control_bone_data:
-            first_control_bone_data.select = True
-            arm.bones.active = first_control_bone_data
-
-        # 创建骨骼集合并分配控制骨骼
-        try:
-            # 获取或创建骨骼集合
-            collection_name_all = f"ctrl_{base_name}_all"
-            collection_name_first = f"ctrl_{base_name}_first"
-            
-            # 删除可能已存在的同名集合
-            if collection_name_all in arm.collections:
-                arm.collections.remove(arm.collections[collection_name_all])
-            if collection_name_first in arm.collections:
-                arm.collections.remove(arm.collections[collection_name_first])
-            
-            # 创建骨骼集合
-            ctrl_collection_all = arm.collections.new(name=collection_name_all)
-            ctrl_collection_first = arm.collections.new(name=collection_name_first)
-            
-            # 将所有控制骨骼添加到 "all" 集合
-            for ctrl_bone_name in control_bone_names:
-                bone = arm.bones.get(ctrl_bone_name)
-                if bone:
-                    ctrl_collection_all.assign(bone)
-            
-            # 将第一个控制骨骼添加到 "first" 集合
-            first_ctrl_bone = arm.bones.get(control_bone_names[0])
-            if first_ctrl_bone:
-                ctrl_collection_first.assign(first_ctrl_bone)
-                
-            # 设置新创建的骨骼集合的初始可见性状态
-            # 由于属性默认是show_all_ctrl_bones=True，所以显示所有
-            ctrl_collection_all.is_visible = True
-            ctrl_collection_first.is_visible = False
-            
-        except Exception as e:
-            print(f"创建骨骼集合时出错: {e}")
+        _select_bone(obj, chain["controls"][0])
 
         # 询问是否执行阻尼追踪
         context.window_manager.popup_menu(self.show_continue_dialog_damped, title="执行阻尼追踪?", icon='INFO')
@@ -855,93 +4044,261 @@ class ApplyPoseConstraintsOperator(bpy.types.Operator):
 
     def execute(self, context):
         obj = context.object
-        pose_bones = obj.pose.bones
         active_bone = context.active_bone
         if not active_bone: return {'CANCELLED'}
 
-        # 从活动骨骼中提取基础名称部分，移除ctr_前缀并考虑可能的下划线后缀
-        bone_name = active_bone.name.replace('ctr_', '')
-        bone_name_parts = bone_name.split('.')
-        if len(bone_name_parts) > 1 and bone_name_parts[-1].isdigit():
-            # 如果骨骼名格式为 base_name.number，则取除了数字后缀的部分
-            original_part = '.'.join(bone_name_parts[:-1])
-        else:
-            original_part = bone_name
-            
-        # 处理可能包含下划线的名称 (如 ctr_bone_1.001)
-        base_parts = original_part.rsplit('_', 1)
-        if len(base_parts) > 1 and base_parts[1].isdigit():
-            # 如果名称包含下划线数字后缀，尝试找到匹配的名称模式
-            potential_base = base_parts[0]
-            # 检查是否这种命名模式存在，否则回退到原名
-            matching_bones = [b for b in obj.data.bones if b.name.startswith(potential_base + '.')]
-            if matching_bones:
-                base_name = potential_base
-            else:
-                base_name = original_part
-        else:
-            base_name = original_part
-            
-        max_num = 0
-        for bone in obj.data.bones:
-            if bone.name.startswith(f"{base_name}.") and bone.name.split('.')[-1].isdigit() and int(bone.name.split('.')[-1]) > 0:
-                num = int(bone.name.split('.')[-1])
-                if num > max_num: max_num = num
-
-        if max_num == 0: return {'CANCELLED'}
-
-        # --- 1. FK Constraints ---
-        for i in range(1, max_num + 1):
-            def_bone = pose_bones.get(f"{base_name}.{i:03d}")
-            if def_bone:
-                for const in def_bone.constraints:
-                    if const.type == 'COPY_ROTATION': def_bone.constraints.remove(const)
-                const = def_bone.constraints.new('COPY_ROTATION')
-                const.target, const.subtarget = obj, f"ctr_{base_name}.{i:03d}"
-
-        # --- 2. Damped Track Constraints & Driver Setup ---
-        constrained_bones = []
-        last_numbered_bone = pose_bones.get(f"{base_name}.{max_num:03d}")
-        if last_numbered_bone and obj.data.bones.get(f"{base_name}.000"):
-            for const in last_numbered_bone.constraints:
-                if const.type == 'DAMPED_TRACK': last_numbered_bone.constraints.remove(const)
-            const = last_numbered_bone.constraints.new('DAMPED_TRACK')
-            const.target, const.subtarget = obj, f"{base_name}.000"
-            constrained_bones.append(last_numbered_bone)
-
-        for i in range(max_num - 1, 0, -1):
-            pose_bone = pose_bones.get(f"{base_name}.{i:03d}")
-            if pose_bone:
-                for const in pose_bone.constraints:
-                    if const.type == 'DAMPED_TRACK': pose_bone.constraints.remove(const)
-                const = pose_bone.constraints.new('DAMPED_TRACK')
-                const.target, const.subtarget = obj, f"{base_name}.{i+1:03d}"
-                constrained_bones.append(pose_bone)
-        
-        controller_bone = pose_bones.get(f"ctr_{base_name}.001")
-        if controller_bone and constrained_bones:
-            prop_name = "damped_track_influence"
-            # 从偏好设置获取默认追踪强度值
-            try:
-                addon_prefs = context.preferences.addons.get(__name__ if __name__ != "__main__" else "damped_track_addon")
-                if addon_prefs and hasattr(addon_prefs, 'preferences') and addon_prefs.preferences:
-                    default_influence = addon_prefs.preferences.default_damped_track_influence
-                else:
-                    default_influence = 0.6
-            except:
-                default_influence = 0.6
-            controller_bone.my_tool_props.damped_track_influence = default_influence
-            for bone in constrained_bones:
-                for const in bone.constraints:
-                    if const.type == 'DAMPED_TRACK':
-                        fcurve = const.driver_add("influence")
-                        driver = fcurve.driver
-                        driver.expression = "influence_var"
-                        var = driver.variables.new()
-                        var.name, var.type = "influence_var", 'SINGLE_PROP'
-                        var.targets[0].id = obj
-                        var.targets[0].data_path = f'pose.bones["{controller_bone.name}"].my_tool_props.{prop_name}'
-        
+        chain = find_chain(obj, active_bone.name)
+        if not chain: return {'CANCELLED'}
+
+        apply_damped_track(obj, chain)
+        return {'FINISHED'}
+
+class ApplySplineIKOperator(bpy.types.Operator):
+    bl_idname = "armature.apply_spline_ik"
+    bl_label = "3.生成样条IK绑定"
+    bl_description = "用一条由控制器驱动的曲线和单个样条IK约束代替逐骨骼约束，约束数量不随链长增加，适合长链"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    @classmethod
+    def poll(cls, context):
+        return context.mode == 'POSE' and context.object and context.object.type == 'ARMATURE'
+
+    def execute(self, context):
+        obj = context.object
+        active_bone = context.active_bone
+        if not active_bone: return {'CANCELLED'}
+
+        chain = find_chain(obj, active_bone.name)
+        if not chain or not chain["controls"]:
+            self.report({'WARNING'}, "请先为该链生成FK绑定")
+            return {'CANCELLED'}
+
+        apply_spline_ik(obj, chain)
+        return {'FINISHED'}
+
+def _target_chains(context, all_chains):
+    """操作符作用的链：全部链，或活动骨骼所在的链"""
+    obj = context.object
+    if all_chains:
+        return list_chains(obj)
+    active_bone = context.active_bone
+    chain = find_chain(obj, active_bone.name) if active_bone else None
+    return [chain] if chain else []
+
+def _selected_chains(context):
+    """选中骨骼和活动骨骼所在的链（不要求已生成FK绑定），每条链只返回一次"""
+    obj = context.object
+    bones = obj.data.edit_bones if obj.mode == 'EDIT' else obj.data.bones
+    names = [b.name for b in bones if b.select]
+    if context.active_bone:
+        names.append(context.active_bone.name)
+    chains = {}
+    for name in names:
+        base_name = resolve_chain_base_name(name, bones)
+        if base_name not in chains:
+            chains[base_name] = find_chain(obj, name)
+    return [chain for chain in chains.values() if chain]
+
+class BakeChainsOperator(bpy.types.Operator):
+    bl_idname = "armature.bake_chains"
+    bl_label = "烘焙软骨链"
+    bl_description = "把链在帧范围内的效果烘焙为变形骨骼的旋转关键帧，并静音约束，播放开销与普通FK相同"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    frame_start: bpy.props.IntProperty(name="起始帧", default=1)
+    frame_end: bpy.props.IntProperty(name="结束帧", default=250)
+    step: bpy.props.IntProperty(name="步长", default=1, min=1, max=100)
+    all_chains: bpy.props.BoolProperty(
+        name="所有链",
+        description="烘焙骨架上的所有链，否则只烘焙活动骨骼所在的链",
+        default=False
+    )
+
+    @classmethod
+    def poll(cls, context):
+        return context.mode == 'POSE' and context.object and context.object.type == 'ARMATURE'
+
+    def invoke(self, context, event):
+        self.frame_start = context.scene.frame_start
+        self.frame_end = context.scene.frame_end
+        return context.window_manager.invoke_props_dialog(self, width=300)
+
+    def execute(self, context):
+        chains = _target_chains(context, self.all_chains)
+        if not chains:
+            self.report({'WARNING'}, "未找到可烘焙的链")
+            return {'CANCELLED'}
+        frame_count = bake_chains(context.object, chains, self.frame_start, self.frame_end, self.step)
+        self.report({'INFO'}, f"已烘焙 {len(chains)} 条链，共 {frame_count} 帧")
+        return {'FINISHED'}
+
+class UnbakeChainsOperator(bpy.types.Operator):
+    bl_idname = "armature.unbake_chains"
+    bl_label = "取消烘焙"
+    bl_description = "删除烘焙的关键帧并恢复链的约束和驱动器"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    all_chains: bpy.props.BoolProperty(
+        name="所有链",
+        description="恢复骨架上的所有链，否则只恢复活动骨骼所在的链",
+        default=False
+    )
+
+    @classmethod
+    def poll(cls, context):
+        return context.mode == 'POSE' and context.object and context.object.type == 'ARMATURE'
+
+    def execute(self, context):
+        restored = unbake_chains(context.object, _target_chains(context, self.all_chains))
+        self.report({'INFO'}, f"已恢复 {restored} 条链")
+        return {'FINISHED'}
+
+class ReduceBakedKeysOperator(bpy.types.Operator):
+    bl_idname = "armature.reduce_baked_keys"
+    bl_label = "精简关键帧"
+    bl_description = "在角度容差内删除已烘焙链的冗余旋转关键帧"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    tolerance: bpy.props.FloatProperty(
+        name="角度容差",
+        description="精简后的旋转与原烘焙结果之间允许的最大夹角（度）",
+        default=0.5,
+        min=0.001,
+        soft_max=5.0,
+        precision=3
+    )
+    all_chains: bpy.props.BoolProperty(
+        name="所有链",
+        description="精简骨架上所有已烘焙的链，否则只精简活动骨骼所在的链",
+        default=False
+    )
+
+    @classmethod
+    def poll(cls, context):
+        return context.mode == 'POSE' and context.object and context.object.type == 'ARMATURE'
+
+    def execute(self, context):
+        before, after = reduce_chain_keys(context.object, _target_chains(context, self.all_chains), self.tolerance)
+        if not before:
+            self.report({'WARNING'}, "没有可精简的烘焙关键帧")
+            return {'CANCELLED'}
+        saved_kb = (before - after) * KEYFRAME_BYTES / 1024
+        self.report({'INFO'}, f"关键帧 {before} → {after}，减少 {100 * (before - after) / before:.0f}%，"
+                              f"按每个关键帧 {KEYFRAME_BYTES} 字节估算，文件约减小 {saved_kb:.1f} KB")
+        return {'FINISHED'}
+
+class SimulateChainsOperator(bpy.types.Operator):
+    bl_idname = "armature.simulate_chains"
+    bl_label = "模拟二级运动"
+    bl_description = "在动画基础上用弹簧阻尼模拟链的惯性摆动，并把结果烘焙为关键帧"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    frame_start: bpy.props.IntProperty(name="起始帧", default=1)
+    frame_end: bpy.props.IntProperty(name="结束帧", default=250)
+    stiffness: bpy.props.FloatProperty(
+        name="跟随刚度",
+        description="每帧向动画姿态弹回的比例，越大越贴近原动画",
+        default=0.3,
+        min=0.0,
+        max=1.0
+    )
+    damping: bpy.props.FloatProperty(
+        name="阻尼",
+        description="每帧损失的速度比例，越大摆动停得越快",
+        default=0.1,
+        min=0.0,
+        max=1.0
+    )
+    gravity: bpy.props.FloatProperty(
+        name="重力",
+        description="世界空间向下的重力加速度（米/秒²）",
+        default=0.0,
+        min=0.0,
+        soft_max=20.0
+    )
+    all_chains: bpy.props.BoolProperty(
+        name="所有链",
+        description="模拟骨架上的所有链，否则只模拟活动骨骼所在的链",
+        default=False
+    )
+
+    @classmethod
+    def poll(cls, context):
+        return context.mode == 'POSE' and context.object and context.object.type == 'ARMATURE'
+
+    def invoke(self, context, event):
+        self.frame_start = context.scene.frame_start
+        self.frame_end = context.scene.frame_end
+        return context.window_manager.invoke_props_dialog(self, width=300)
+
+    def execute(self, context):
+        chains = _target_chains(context, self.all_chains)
+        if not chains:
+            self.report({'WARNING'}, "未找到可模拟的链")
+            return {'CANCELLED'}
+        prefs = _get_addon_prefs()
+        use_cache = prefs.use_sim_cache if prefs else True
+        workers = prefs.sim_workers if prefs else 0
+        frame_count, cached = simulate_and_bake_chains(context.object, chains, self.frame_start, self.frame_end,
+                                                       self.stiffness, self.damping, self.gravity, use_cache, workers)
+        source = "（读取缓存）" if cached else ""
+        self.report({'INFO'}, f"已模拟 {len(chains)} 条链，共 {frame_count} 帧{source}")
+        return {'FINISHED'}
+
+class ClearSimCacheOperator(bpy.types.Operator):
+    bl_idname = "armature.clear_sim_cache"
+    bl_label = "清除模拟缓存"
+    bl_description = "删除当前文件旁保存的二级运动模拟缓存"
+    bl_options = {'REGISTER'}
+
+    def execute(self, context):
+        if not bpy.data.filepath:
+            self.report({'WARNING'}, "文件尚未保存，没有模拟缓存")
+            return {'CANCELLED'}
+        files, size = clear_sim_cache()
+        self.report({'INFO'}, f"已删除 {files} 个缓存文件，释放 {size / (1024 * 1024):.2f} MB")
+        return {'FINISHED'}
+
+class JiggleAddChainsOperator(bpy.types.Operator):
+    bl_idname = "armature.jiggle_add_chains"
+    bl_label = "加入实时抖动"
+    bl_description = "把链注册到实时抖动，播放时由处理器驱动，链的约束会被静音"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    all_chains: bpy.props.BoolProperty(
+        name="所有链",
+        description="注册骨架上的所有链，否则只注册活动骨骼所在的链",
+        default=False
+    )
+
+    @classmethod
+    def poll(cls, context):
+        return context.mode == 'POSE' and context.object and context.object.type == 'ARMATURE'
+
+    def execute(self, context):
+        added = add_jiggle_chains(context.object, _target_chains(context, self.all_chains))
+        self.report({'INFO'}, f"已注册 {added} 条链")
+        return {'FINISHED'}
+
+class JiggleRemoveChainsOperator(bpy.types.Operator):
+    bl_idname = "armature.jiggle_remove_chains"
+    bl_label = "移出实时抖动"
+    bl_description = "取消链的实时抖动并恢复约束"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    all_chains: bpy.props.BoolProperty(
+        name="所有链",
+        description="取消骨架上所有链的实时抖动，否则只取消活动骨骼所在的链",
+        default=False
+    )
+
+    @classmethod
+    def poll(cls, context):
+        return context.mode == 'POSE' and context.object and context.object.type == 'ARMATURE'
+
+    def execute(self, context):
+        removed = remove_jiggle_chains(context.object, _target_chains(context, self.all_chains))
+        self.report({'INFO'}, f"已取消 {removed} 条链")
         return {'FINISHED'}
 
 def get_panel_class(category):
@@ -990,6 +4347,11 @@ def get_panel_class(category):
             row = col.row(align=True)
             row.operator(SubdivideFibOperator.bl_idname, icon='IPO_ELASTIC')
             row.operator(SubdivideAverageOperator.bl_idname, icon='MESH_GRID')
+            col.operator(SubdivideBBoneOperator.bl_idname, icon='IPO_BEZIER')
+            row = col.row(align=True)
+            row.operator(ChainsFromCurveOperator.bl_idname, icon='CURVE_BEZCURVE')
+            row.operator(ChainsFromMeshOperator.bl_idname, icon='MESH_DATA')
+            box.operator(PlanRigOperator.bl_idname, icon='VIEWZOOM')
             
             layout.separator()
 
@@ -1004,49 +4366,82 @@ def get_panel_class(category):
             dt_col = row.column()
             dt_col.enabled = is_pose_mode
             dt_col.operator(ApplyPoseConstraintsOperator.bl_idname, icon='CON_TRACKTO')
+            dt_col.operator(ApplySplineIKOperator.bl_idname, icon='CON_SPLINEIK')
+
+            # 烘焙部分
+            row = box.row(align=True)
+            row.enabled = is_pose_mode
+            row.operator(BakeChainsOperator.bl_idname, icon='ACTION')
+            row.operator(UnbakeChainsOperator.bl_idname, icon='LOOP_BACK')
+            row.operator(ReduceBakedKeysOperator.bl_idname, text="", icon='IPO_LINEAR')
+            row = box.row()
+            row.enabled = is_pose_mode
+            row.operator(SimulateChainsOperator.bl_idname, icon='FORCE_HARMONIC')
+            row.operator(ClearSimCacheOperator.bl_idname, text="", icon='TRASH')
+            row = box.row(align=True)
+            row.operator(RebakeControlShapesOperator.bl_idname, icon='MESH_CIRCLE')
+            row.operator(CollectShapeGarbageOperator.bl_idname, icon='ORPHAN_DATA')
             # 刷新版本按钮已移动到顶部模式切换栏
 
+            # 实时抖动部分
+            jiggle = context.scene.cartilage_jiggle
+            box = layout.box()
+            box.prop(jiggle, "enabled")
+            col = box.column(align=True)
+            col.prop(jiggle, "stiffness", slider=True)
+            col.prop(jiggle, "damping", slider=True)
+            col.prop(jiggle, "gravity")
+            row = box.row(align=True)
+            row.enabled = is_pose_mode
+            row.operator(JiggleAddChainsOperator.bl_idname, icon='ADD')
+            row.operator(JiggleRemoveChainsOperator.bl_idname, icon='REMOVE')
+            if jiggle.enabled:
+                box.label(text=f"每帧耗时: {_jiggle_timing['last_ms']:.2f} ms (平均 {_jiggle_timing['avg_ms']:.2f} ms)", icon='TIME')
+
+            # 批量可见性部分
+            visibility = context.scene.cartilage_visibility
+            box = layout.box()
+            box.label(text="控制器显示", icon='HIDE_OFF')
+            row = box.row(align=True)
+            row.prop(visibility, "filter", text="", icon='FILTER')
+            row.prop(visibility, "selected_only", text="", icon='RESTRICT_SELECT_OFF')
+            row = box.row(align=True)
+            for state, text, icon, solo in (('ALL', "显示", 'HIDE_OFF', False), ('FIRST', "仅根", 'BONE_DATA', False),
+                                            ('HIDDEN', "隐藏", 'HIDE_ON', False), ('ALL', "独显", 'SOLO_ON', True)):
+                op = row.operator(SetChainsVisibilityOperator.bl_idname, text=text, icon=icon)
+                op.state, op.solo = state, solo
+                op.pattern, op.selected_only = visibility.filter, visibility.selected_only
+
+            # 链LOD部分
+            lod = context.scene.cartilage_lod
+            box = layout.box()
+            row = box.row()
+            row.prop(lod, "enabled")
+            row.operator(WM_OT_UpdateChainLOD.bl_idname, text="", icon='FILE_REFRESH')
+            col = box.column()
+            col.enabled = lod.enabled
+            row = col.row(align=True)
+            row.prop(lod, "use_simplify")
+            row.prop(lod, "simplify_level")
+            col.prop(lod, "use_hidden")
+            col.prop(lod, "camera_distance")
+
             # 控制器属性部分（仅在姿态模式下且有活动骨骼时显示）
             if is_pose_mode and context.active_bone:
                 layout.separator()
                 try:
-                    # 从活动骨骼中提取基础名称部分，移除ctr_前缀并考虑可能的下划线后缀
-                    bone_name = context.active_bone.name.replace('ctr_', '')
-                    bone_name_parts = bone_name.split('.')
-                    if len(bone_name_parts) > 1 and bone_name_parts[-1].isdigit():
-                        # 如果骨骼名格式为 base_name.number，则取除了数字后缀的部分
-                        original_part = '.'.join(bone_name_parts[:-1])
-                    else:
-                        original_part = bone_name
-                        
-                    # 处理可能包含下划线的名称 (如 ctr_bone_1.001)
-                    base_parts = original_part.rsplit('_', 1)
-                    if len(base_parts) > 1 and base_parts[1].isdigit():
-                        # 如果名称包含下划线数字后缀，尝试找到匹配的名称模式
-                        potential_base = base_parts[0]
-                        # 检查是否这种命名模式存在，否则回退到原名
-                        matching_bones = [b for b in context.object.data.bones if b.name.startswith(potential_base + '.')]
-                        if matching_bones:
-                            base_name = potential_base
-                        else:
-                            base_name = original_part
-                    else:
-                        base_name = original_part
-                        
-                    controller_bone = context.object.pose.bones.get(f"ctr_{base_name}.001")
+                    base_name = resolve_chain_base_name(context.active_bone.name, context.object.data.bones)
+                    deform, _ = _collect_chain_names(context.object.data.bones, base_name)
+                    controller_bone = context.object.pose.bones.get(f"ctr_{deform[0]}") if deform else None
                     if controller_bone:
                         box = layout.box()
                         box.label(text="控制器属性", icon='PROPERTIES')
                         box.prop(controller_bone.my_tool_props, "damped_track_influence", slider=True)
                         box.prop(controller_bone.my_tool_props, "circle_scale", slider=True)
-                        # 添加控制骨骼可见性选项
+                        # 控制器显示状态，直接读写链的两个控制骨骼集合
                         visibility_box = box.box()
-                        
-                        # 使用操作符按钮进行控制
                         row_btns = visibility_box.row()
-                        op_show_hide_all = row_btns.operator("armature.toggle_show_all_ctrl_bones", text="控制骨", icon='HIDE_OFF')
-                        op_toggle_first_only = row_btns.operator("armature.toggle_show_first_only_ctrl_bone", text="控制根骨", icon='HIDE_OFF')
-                        # 去除状态显示行
+                        row_btns.prop(controller_bone.my_tool_props, "ctrl_visibility", expand=True)
                 except Exception:
                     pass
     
@@ -1091,10 +4486,24 @@ def register():
     
     if not hasattr(bpy.types.PoseBone, 'my_tool_props'):
         bpy.types.PoseBone.my_tool_props = bpy.props.PointerProperty(type=MyArmatureProperties)
+    if not hasattr(bpy.types.Scene, 'cartilage_lod'):
+        bpy.types.Scene.cartilage_lod = bpy.props.PointerProperty(type=ChainLODProperties)
+    if not hasattr(bpy.types.Scene, 'cartilage_jiggle'):
+        bpy.types.Scene.cartilage_jiggle = bpy.props.PointerProperty(type=JiggleProperties)
+    if not hasattr(bpy.types.Scene, 'cartilage_visibility'):
+        bpy.types.Scene.cartilage_visibility = bpy.props.PointerProperty(type=ChainVisibilityProperties)
+    for handlers, handler in LOD_HANDLERS + JIGGLE_HANDLERS:
+        if handler not in handlers:
+            handlers.append(handler)
     register_right_click_menu()
 
 def unregister():
     unregister_right_click_menu()
+    for handlers, handler in LOD_HANDLERS + JIGGLE_HANDLERS:
+        if handler in handlers:
+            handlers.remove(handler)
+    _subdivide_plan_cache.clear()
+    _linked_shapes.clear()
     
     # 安全地删除自定义属性，如果它们存在
     if hasattr(bpy.types.Scene, 'fib_segments'):
@@ -1103,6 +4512,12 @@ def unregister():
         del bpy.types.Scene.fib_coefficient
     if hasattr(bpy.types.PoseBone, 'my_tool_props'):
         del bpy.types.PoseBone.my_tool_props
+    if hasattr(bpy.types.Scene, 'cartilage_lod'):
+        del bpy.types.Scene.cartilage_lod
+    if hasattr(bpy.types.Scene, 'cartilage_jiggle'):
+        del bpy.types.Scene.cartilage_jiggle
+    if hasattr(bpy.types.Scene, 'cartilage_visibility'):
+        del bpy.types.Scene.cartilage_visibility
     
     # 注销所有类，除了面板
     classes_to_register = [cls for cls in classes if cls.__name__ != 'DampedTrackPanel']
@@ -1132,7 +4547,11 @@ class VIEW3D_MT_damped_track_edit_menu(bpy.types.Menu):
         # 保留功能按钮
         layout.operator(SubdivideFibOperator.bl_idname, text="斐波那契细分", icon='IPO_ELASTIC')
         layout.operator(SubdivideAverageOperator.bl_idname, text="平均细分", icon='MESH_GRID')
+        layout.operator(SubdivideBBoneOperator.bl_idname, text="B-Bone细分", icon='IPO_BEZIER')
+        layout.operator(ChainsFromCurveOperator.bl_idname, text="从曲线生成链", icon='CURVE_BEZCURVE')
+        layout.operator(ChainsFromMeshOperator.bl_idname, text="从网格带生成链", icon='MESH_DATA')
         layout.operator(SetupControlRigOperator.bl_idname, text="生成FK绑定", icon='CON_FOLLOWPATH')
+        layout.operator(PlanRigOperator.bl_idname, icon='VIEWZOOM')
 
 
 # 定义一个子菜单（用于姿态模式）
@@ -1148,6 +4567,14 @@ class VIEW3D_MT_damped_track_pose_menu(bpy.types.Menu):
         layout.separator()
         # 保留功能按钮
         layout.operator(ApplyPoseConstraintsOperator.bl_idname, text="2.生成阻尼追踪", icon='CON_TRACKTO')
+        layout.operator(ApplySplineIKOperator.bl_idname, text="生成样条IK绑定", icon='CON_SPLINEIK')
+        layout.separator()
+        layout.operator(BakeChainsOperator.bl_idname, icon='ACTION')
+        layout.operator(SimulateChainsOperator.bl_idname, icon='FORCE_HARMONIC')
+        layout.operator(UnbakeChainsOperator.bl_idname, icon='LOOP_BACK')
+        layout.operator(ReduceBakedKeysOperator.bl_idname, icon='IPO_LINEAR')
+        layout.separator()
+        layout.operator(PlanRigOperator.bl_idname, icon='VIEWZOOM')
 
 
 # 定义一个子菜单（用于对象模式）
@@ -1164,8 +4591,16 @@ class VIEW3D_MT_damped_track_object_menu(bpy.types.Menu):
         # 保留功能按钮
         layout.operator(SubdivideFibOperator.bl_idname, text="斐波那契细分", icon='IPO_ELASTIC')
         layout.operator(SubdivideAverageOperator.bl_idname, text="平均细分", icon='MESH_GRID')
+        layout.operator(SubdivideBBoneOperator.bl_idname, text="B-Bone细分", icon='IPO_BEZIER')
+        layout.operator(ChainsFromCurveOperator.bl_idname, text="从曲线生成链", icon='CURVE_BEZCURVE')
+        layout.operator(ChainsFromMeshOperator.bl_idname, text="从网格带生成链", icon='MESH_DATA')
         layout.operator(SetupControlRigOperator.bl_idname, text="生成FK绑定", icon='CON_FOLLOWPATH')
         layout.operator(ApplyPoseConstraintsOperator.bl_idname, text="生成阻尼追踪", icon='CON_TRACKTO')
+        layout.operator(ApplySplineIKOperator.bl_idname, text="生成样条IK绑定", icon='CON_SPLINEIK')
+        layout.separator()
+        layout.operator(EnvelopeSkinOperator.bl_idname, icon='MOD_VERTEX_WEIGHT')
+        layout.operator(RebakeControlShapesOperator.bl_idname, icon='MESH_CIRCLE')
+        layout.operator(CollectShapeGarbageOperator.bl_idname, icon='ORPHAN_DATA')
 
 
 # 添加对象模式右键菜单
@@ -1235,6 +4670,64 @@ class WM_OT_ClosePanel(bpy.types.Operator):
     
     def execute(self, context):
         return {'FINISHED'}
+
+
+class SetChainsVisibilityOperator(bpy.types.Operator):
+    bl_idname = "armature.set_chains_visibility"
+    bl_label = "批量设置控制器显示"
+    bl_description = "一次性显示、隐藏或独显骨架上所有链（或筛选出的链）的控制器"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    state: bpy.props.EnumProperty(
+        name="显示",
+        items=[
+            ('ALL', "全部控制器", "显示链的所有控制器"),
+            ('FIRST', "仅根控制器", "只显示链的第一根控制器"),
+            ('HIDDEN', "隐藏", "隐藏链的所有控制器"),
+        ],
+        default='ALL'
+    )
+    solo: bpy.props.BoolProperty(
+        name="独显",
+        description="同时隐藏其余所有链的控制器",
+        default=False
+    )
+    pattern: bpy.props.StringProperty(
+        name="筛选",
+        description="只处理基础名称匹配该通配符的链，留空表示全部链",
+        default=""
+    )
+    selected_only: bpy.props.BoolProperty(
+        name="仅选中的链",
+        description="只处理包含选中骨骼的链",
+        default=False
+    )
+
+    @classmethod
+    def poll(cls, context):
+        return context.object and context.object.type == 'ARMATURE'
+
+    def execute(self, context):
+        obj = context.object
+        pairs = chain_collection_pairs(obj.data)
+        names = set(pairs)
+        if self.pattern:
+            names = {name for name in names if fnmatch.fnmatchcase(name, self.pattern)}
+        if self.selected_only:
+            bones = obj.data.edit_bones if obj.mode == 'EDIT' else obj.data.bones
+            picked = set()
+            for b in bones:
+                if b.select:
+                    name = b.name[len("ctr_"):] if b.name.startswith("ctr_") else b.name
+                    picked.add(split_numbered_name(name)[0])
+            names &= picked
+        if not names:
+            self.report({'WARNING'}, "没有匹配的链")
+            return {'CANCELLED'}
+        changed = set_chains_visibility(obj, self.state, names, 'HIDDEN' if self.solo else None)
+        self.report({'INFO'}, f"已处理 {len(names)} 条链，{changed} 条链的显示发生变化")
+        return {'FINISHED'}
+
 class WM_OT_ToggleShowAllCtrlBones(bpy.types.Operator):
     bl_idname = "armature.toggle_show_all_ctrl_bones"
     bl_label = "切换显示所有控制骨骼"
@@ -1242,8 +4735,6 @@ class WM_OT_ToggleShowAllCtrlBones(bpy.types.Operator):
     bl_options = {'REGISTER', 'UNDO'}
     
     def execute(self, context):
-        global _visibility_update_lock
-
         arm_obj = context.object
         if not arm_obj or arm_obj.type != 'ARMATURE':
             return {'CANCELLED'}
@@ -1307,8 +4798,6 @@ class WM_OT_ToggleShowFirstOnlyCtrlBone(bpy.types.Operator):
     bl_options = {'REGISTER', 'UNDO'}
     
     def execute(self, context):
-        global _visibility_update_lock
-
         arm_obj = context.object
         if not arm_obj or arm_obj.type != 'ARMATURE':
             return {'CANCELLED'}
@@ -1366,14 +4855,34 @@ class WM_OT_ToggleShowFirstOnlyCtrlBone(bpy.types.Operator):
 classes = (
     DampedTrackAddonPreferences,
     MyArmatureProperties,
+    ChainLODProperties,
+    WM_OT_UpdateChainLOD,
+    ChainVisibilityProperties,
+    JiggleProperties,
     WM_OT_SwitchObjectMode,
     WM_OT_SwitchEditMode,
     WM_OT_SwitchPoseMode,
     SubdivideFibOperator,
     SubdivideAverageOperator,
+    SubdivideBBoneOperator,
     SetupControlRigOperator,
     ApplyPoseConstraintsOperator,
+    ApplySplineIKOperator,
+    BakeChainsOperator,
+    UnbakeChainsOperator,
+    ReduceBakedKeysOperator,
+    SimulateChainsOperator,
+    ClearSimCacheOperator,
+    JiggleAddChainsOperator,
+    JiggleRemoveChainsOperator,
+    ChainsFromCurveOperator,
+    ChainsFromMeshOperator,
+    PlanRigOperator,
+    RebakeControlShapesOperator,
+    CollectShapeGarbageOperator,
+    EnvelopeSkinOperator,
     WM_OT_CheckAddonUpdate,
+    SetChainsVisibilityOperator,
     WM_OT_ToggleShowAllCtrlBones,
     WM_OT_ToggleShowFirstOnlyCtrlBone,
     WM_OT_ClosePanel,
@@ -0,0 +1,182 @@
+"""
+基准测试公共工具
+所有脚本都在 Blender 后台模式下运行：
+    blender -b --factory-startup --python benchmarks/<脚本>.py -- [参数]
+"""
+
+import importlib.util
+import json
+import math
+import os
+import random
+import sys
+import time
+
+import bpy
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ADDON_PATH = os.path.join(REPO_DIR, "Quick Cartilage Rigging.py")
+
+
+def script_args():
+    """返回 -- 之后传给脚本的参数"""
+    return sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+
+
+def load_addon():
+    """按文件路径加载插件模块并注册，返回模块对象"""
+    spec = importlib.util.spec_from_file_location("quick_cartilage_rigging", ADDON_PATH)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    module.register()
+    return module
+
+
+def reset_scene():
+    """清空对象和相关数据，保证每组测试从同样的状态开始"""
+    obj = bpy.context.view_layer.objects.active
+    if obj and obj.mode != 'OBJECT':
+        bpy.ops.object.mode_set(mode='OBJECT')
+    for collection in (bpy.data.objects, bpy.data.armatures, bpy.data.meshes, bpy.data.curves, bpy.data.actions):
+        for idblock in list(collection):
+            collection.remove(idblock)
+    bpy.context.scene.frame_set(1)
+
+
+def create_armature(name="Rig", chains=1, length=2.0, spacing=0.5):
+    """创建带有 chains 根竖直骨骼的骨架，返回 (骨架对象, 骨骼名列表)，结束时处于编辑模式"""
+    arm_data = bpy.data.armatures.new(name)
+    obj = bpy.data.objects.new(name, arm_data)
+    bpy.context.scene.collection.objects.link(obj)
+    bpy.context.view_layer.objects.active = obj
+    bpy.ops.object.mode_set(mode='EDIT')
+
+    bone_names = []
+    columns = max(1, int(math.ceil(math.sqrt(chains))))
+    for i in range(chains):
+        x, y = (i % columns) * spacing, (i // columns) * spacing
+        bone = arm_data.edit_bones.new(f"chain{i:04d}")
+        bone.head, bone.tail = (x, y, 0.0), (x, y, length)
+        bone_names.append(bone.name)
+    return obj, bone_names
+
+
+def rig_chains(qcr, obj, chains, drivers=True):
+    """对细分后的链执行FK绑定和阻尼追踪，drivers=False 时移除生成的驱动器"""
+    rigged = []
+    for chain in chains:
+        chain = qcr.build_fk(obj, chain)
+        if chain:
+            rigged.append(qcr.apply_damped_track(obj, chain))
+    if not drivers and obj.animation_data:
+        for fcurve in list(obj.animation_data.drivers):
+            obj.animation_data.drivers.remove(fcurve)
+    return rigged
+
+
+def bind_strip_mesh(obj, chain, width=0.1, rows_per_bone=4):
+    """沿链创建一条网格带并按骨骼区间分配顶点组，用于把形变计入求值耗时"""
+    if obj.mode != 'OBJECT':
+        bpy.ops.object.mode_set(mode='OBJECT')
+    bones = obj.data.bones
+    verts, faces, groups = [], [], []
+    for name in chain["deform"]:
+        head, tail = bones[name].head_local, bones[name].tail_local
+        for r in range(rows_per_bone):
+            p = head.lerp(tail, r / rows_per_bone)
+            verts += [(p.x - width, p.y, p.z), (p.x + width, p.y, p.z)]
+            groups.append(name)
+    last = bones[chain["deform"][-1]].tail_local
+    verts += [(last.x - width, last.y, last.z), (last.x + width, last.y, last.z)]
+    groups.append(chain["deform"][-1])
+    for r in range(len(groups) - 1):
+        a = r * 2
+        faces.append((a, a + 1, a + 3, a + 2))
+
+    mesh = bpy.data.meshes.new(f"strip_{chain['base_name']}")
+    mesh.from_pydata(verts, [], faces)
+    strip = bpy.data.objects.new(mesh.name, mesh)
+    bpy.context.scene.collection.objects.link(strip)
+    strip.matrix_world = obj.matrix_world
+
+    rows_by_group = {}
+    for r, name in enumerate(groups):
+        rows_by_group.setdefault(name, []).extend((r * 2, r * 2 + 1))
+    for name, indices in rows_by_group.items():
+        strip.vertex_groups.new(name=name).add(indices, 1.0, 'REPLACE')
+    mod = strip.modifiers.new(name="Armature", type='ARMATURE')
+    mod.object = obj
+    return strip
+
+
+def animate_controllers(obj, chains, frame_start, frame_end, seed=0, amplitude=0.6, step=4, root_only=False):
+    """用确定性的噪声为 ctr_ 控制骨骼打旋转关键帧，同一 seed 下不同绑定得到相同的动画"""
+    rng = random.Random(seed)
+    pose_bones = obj.pose.bones
+    for chain in chains:
+        controls = chain["controls"][:1] if root_only else chain["controls"]
+        for name in controls:
+            pb = pose_bones[name]
+            pb.rotation_mode = 'XYZ'
+            phases = [rng.uniform(0.0, 2.0 * math.pi) for _ in range(3)]
+            freqs = [rng.uniform(0.05, 0.2) for _ in range(3)]
+            for frame in range(frame_start, frame_end + 1, step):
+                pb.rotation_euler = [amplitude * math.sin(frame * f + p) for f, p in zip(freqs, phases)]
+                pb.keyframe_insert("rotation_euler", frame=frame)
+
+
+def rig_stats(obj):
+    """统计骨骼、约束和驱动器数量"""
+    return {
+        "bones": len(obj.data.bones),
+        "constraints": sum(len(pb.constraints) for pb in obj.pose.bones),
+        "drivers": len(obj.animation_data.drivers) if obj.animation_data else 0,
+    }
+
+
+def measure_playback(frame_start, frame_end, warmup=5, repeats=1):
+    """逐帧调用 frame_set，返回每帧求值耗时（毫秒）列表"""
+    scene = bpy.context.scene
+    for frame in range(frame_start, frame_start + warmup):
+        scene.frame_set(frame)
+    samples = []
+    for _ in range(repeats):
+        for frame in range(frame_start, frame_end + 1):
+            t0 = time.perf_counter()
+            scene.frame_set(frame)
+            samples.append((time.perf_counter() - t0) * 1000.0)
+    return samples
+
+
+def summarize(samples):
+    """计算均值、p95、最小值和最大值"""
+    ordered = sorted(samples)
+    p95_index = min(len(ordered) - 1, max(0, int(math.ceil(0.95 * len(ordered))) - 1))
+    return {
+        "frames": len(ordered),
+        "mean_ms": sum(ordered) / len(ordered),
+        "p95_ms": ordered[p95_index],
+        "min_ms": ordered[0],
+        "max_ms": ordered[-1],
+    }
+
+
+def write_json(path, results, **meta):
+    """写出带 Blender 版本信息的 JSON 结果"""
+    payload = {"blender": bpy.app.version_string, "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    payload.update(meta)
+    payload["results"] = results
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2, ensure_ascii=False)
+
+
+def print_table(rows, columns):
+    """按列打印结果"""
+    print(" | ".join(f"{c:>12}" for c in columns))
+    for row in rows:
+        cells = []
+        for c in columns:
+            value = row.get(c, "")
+            cells.append(f"{value:>12.3f}" if isinstance(value, float) else f"{value!s:>12}")
+        print(" | ".join(cells))
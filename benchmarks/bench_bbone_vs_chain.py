@@ -0,0 +1,64 @@
+"""
+B-Bone 模式与逐段细分链的播放求值耗时对比
+两种绑定使用相同的根控制器动画和相同的网格带，便于为群集角色选择更省的方案。
+
+用法：
+    blender -b --factory-startup --python benchmarks/bench_bbone_vs_chain.py -- --segments 20 --chains 50
+"""
+
+import argparse
+import os
+import sys
+
+import bpy
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import _common
+
+
+def build(qcr, kind, args):
+    _common.reset_scene()
+    obj, bone_names = _common.create_armature("Rig", chains=args.chains)
+    if kind == 'BBONE':
+        chains = [qcr.subdivide_bbone_chain(obj, name, args.segments, args.controllers) for name in bone_names]
+    else:
+        chains = [qcr.subdivide_chain(obj, name, args.segments, 'FIB', 1.0) for name in bone_names]
+    chains = _common.rig_chains(qcr, obj, chains)
+    if args.mesh:
+        for chain in chains:
+            _common.bind_strip_mesh(obj, chain)
+    bpy.context.view_layer.objects.active = obj
+    bpy.ops.object.mode_set(mode='POSE')
+    _common.animate_controllers(obj, chains, 1, args.frames, seed=args.seed, root_only=True)
+    bpy.ops.object.mode_set(mode='OBJECT')
+    return obj
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--segments", type=int, default=20)
+    parser.add_argument("--controllers", type=int, default=3)
+    parser.add_argument("--chains", type=int, default=50)
+    parser.add_argument("--frames", type=int, default=250)
+    parser.add_argument("--repeats", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-mesh", dest="mesh", action="store_false")
+    parser.add_argument("--json", default="")
+    args = parser.parse_args(_common.script_args())
+
+    qcr = _common.load_addon()
+    rows = []
+    for kind in ('CHAIN', 'BBONE'):
+        obj = build(qcr, kind, args)
+        row = {"rig": kind}
+        row.update(_common.rig_stats(obj))
+        row.update(_common.summarize(_common.measure_playback(1, args.frames, repeats=args.repeats)))
+        rows.append(row)
+
+    _common.print_table(rows, ["rig", "bones", "constraints", "drivers", "mean_ms", "p95_ms"])
+    if args.json:
+        _common.write_json(args.json, rows, benchmark="bbone_vs_chain", args=vars(args))
+
+
+if __name__ == "__main__":
+    main()
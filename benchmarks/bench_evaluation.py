@@ -0,0 +1,57 @@
+"""
+生成绑定的逐帧求值基准测试
+按链数量、是否保留驱动器、是否生成末端骨骼组合出多组绑定，给所有 ctr_ 控制骨骼打上噪声关键帧，
+逐帧调用 frame_set 并记录每帧求值耗时的均值和 p95，结果可写成 JSON 用于回归对比。
+
+用法：
+    blender -b --factory-startup --python benchmarks/bench_evaluation.py -- --chains 1 10 50 --frames 200 --json eval.json
+"""
+
+import argparse
+import itertools
+import os
+import sys
+
+import bpy
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import _common
+
+
+def build(qcr, chain_count, drivers, tip, args):
+    _common.reset_scene()
+    obj, bone_names = _common.create_armature("Rig", chains=chain_count)
+    chains = [qcr.subdivide_chain(obj, name, args.segments, 'FIB', 1.0, add_tip=tip) for name in bone_names]
+    chains = _common.rig_chains(qcr, obj, chains, drivers=drivers)
+    _common.animate_controllers(obj, chains, 1, args.frames, seed=args.seed)
+    bpy.ops.object.mode_set(mode='OBJECT')
+    return obj
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chains", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--segments", type=int, default=10)
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--repeats", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", default="")
+    args = parser.parse_args(_common.script_args())
+
+    qcr = _common.load_addon()
+    rows = []
+    for chain_count, drivers, tip in itertools.product(args.chains, (True, False), (True, False)):
+        obj = build(qcr, chain_count, drivers, tip, args)
+        row = {"chains": chain_count, "drivers": drivers, "tip": tip}
+        row.update(_common.rig_stats(obj))
+        row.update(_common.summarize(_common.measure_playback(1, args.frames, repeats=args.repeats)))
+        rows.append(row)
+        print(f"chains={chain_count} drivers={drivers} tip={tip}: mean {row['mean_ms']:.3f} ms, p95 {row['p95_ms']:.3f} ms")
+
+    _common.print_table(rows, ["chains", "drivers", "tip", "bones", "constraints", "mean_ms", "p95_ms"])
+    if args.json:
+        _common.write_json(args.json, rows, benchmark="evaluation", args=vars(args))
+
+
+if __name__ == "__main__":
+    main()
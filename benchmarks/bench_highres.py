@@ -0,0 +1,55 @@
+"""
+高分辨率细分链的生成耗时
+分别测量细分、FK绑定和阻尼追踪三个步骤在不同段数下的耗时，以及平均每段耗时，用于确认耗时随段数线性增长。
+
+用法：
+    blender -b --factory-startup --python benchmarks/bench_highres.py -- --segments 100 500 2000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import bpy
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import _common
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--segments", type=int, nargs="+", default=[100, 500, 2000])
+    parser.add_argument("--mode", default='AVERAGE', choices=['AVERAGE', 'FIB'])
+    parser.add_argument("--json", default="")
+    args = parser.parse_args(_common.script_args())
+
+    qcr = _common.load_addon()
+    rows = []
+    for segments in args.segments:
+        _common.reset_scene()
+        obj, bone_names = _common.create_armature("Rig", chains=1, length=segments * 0.01)
+        t0 = time.perf_counter()
+        chain = qcr.subdivide_chain(obj, bone_names[0], segments, args.mode, 1.0)
+        t1 = time.perf_counter()
+        chain = qcr.build_fk(obj, chain)
+        t2 = time.perf_counter()
+        chain = qcr.apply_damped_track(obj, chain)
+        t3 = time.perf_counter()
+        bpy.ops.object.mode_set(mode='OBJECT')
+        rows.append({
+            "segments": segments,
+            "bones": len(obj.data.bones),
+            "subdivide_s": t1 - t0,
+            "build_fk_s": t2 - t1,
+            "damped_track_s": t3 - t2,
+            "ms_per_segment": (t3 - t0) / segments * 1000.0,
+        })
+
+    _common.print_table(rows, ["segments", "bones", "subdivide_s", "build_fk_s", "damped_track_s", "ms_per_segment"])
+    if args.json:
+        _common.write_json(args.json, rows, benchmark="highres", args=vars(args))
+
+
+if __name__ == "__main__":
+    main()
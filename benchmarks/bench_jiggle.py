@@ -0,0 +1,61 @@
+"""
+实时抖动处理器的每帧开销
+分别在关闭和开启实时抖动时逐帧播放，并读取插件自带的处理器计时。
+
+用法：
+    blender -b --factory-startup --python benchmarks/bench_jiggle.py -- --chains 200 --segments 10
+"""
+
+import argparse
+import os
+import sys
+
+import bpy
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import _common
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--segments", type=int, default=10)
+    parser.add_argument("--chains", type=int, default=200)
+    parser.add_argument("--frames", type=int, default=250)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", default="")
+    args = parser.parse_args(_common.script_args())
+
+    qcr = _common.load_addon()
+    _common.reset_scene()
+    obj, bone_names = _common.create_armature("Rig", chains=args.chains)
+    chains = [qcr.subdivide_chain(obj, name, args.segments, 'FIB', 1.0) for name in bone_names]
+    chains = _common.rig_chains(qcr, obj, chains)
+    bpy.context.view_layer.objects.active = obj
+    bpy.ops.object.mode_set(mode='POSE')
+    _common.animate_controllers(obj, chains, 1, args.frames, seed=args.seed, root_only=True)
+
+    scene = bpy.context.scene
+    rows = []
+    row = {"mode": "CONSTRAINTS"}
+    row.update(_common.summarize(_common.measure_playback(1, args.frames)))
+    rows.append(row)
+
+    qcr.add_jiggle_chains(obj, chains)
+    bpy.ops.object.mode_set(mode='OBJECT')
+    scene.cartilage_jiggle.enabled = True
+    handler_ms = []
+    for frame in range(1, args.frames + 1):
+        scene.frame_set(frame)
+        handler_ms.append(qcr._jiggle_timing["last_ms"])
+    row = {"mode": "JIGGLE"}
+    row.update(_common.summarize(_common.measure_playback(1, args.frames)))
+    row["handler_mean_ms"] = sum(handler_ms[1:]) / max(1, len(handler_ms) - 1)
+    rows.append(row)
+
+    _common.print_table(rows, ["mode", "mean_ms", "p95_ms", "handler_mean_ms"])
+    if args.json:
+        _common.write_json(args.json, rows, benchmark="jiggle", args=vars(args))
+
+
+if __name__ == "__main__":
+    main()
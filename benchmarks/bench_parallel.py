@@ -0,0 +1,56 @@
+"""
+二级运动求解器按链并行的扩展性测试
+使用与 bench_solver.py 相同的合成数据，分别以 1..N 个工作进程求解，并与串行结果比对。
+
+用法：
+    blender -b --factory-startup --python benchmarks/bench_parallel.py -- --chains 2000 --workers 1 2 4 8
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import _common
+from bench_solver import synthetic_samples
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chains", type=int, default=2000)
+    parser.add_argument("--segments", type=int, default=20)
+    parser.add_argument("--frames", type=int, default=250)
+    parser.add_argument("--workers", type=int, nargs="+", default=[])
+    parser.add_argument("--json", default="")
+    args = parser.parse_args(_common.script_args())
+
+    qcr = _common.load_addon()
+    samples = synthetic_samples(args.chains, args.segments, args.frames)
+    workers_list = args.workers or list(range(1, (os.cpu_count() or 1) + 1))
+
+    rows = []
+    reference = None
+    for workers in workers_list:
+        t0 = time.perf_counter()
+        quats = qcr.solve_chain_rotations_parallel(samples, gravity=(0.0, 0.0, -9.8), workers=workers)
+        elapsed = time.perf_counter() - t0
+        if reference is None:
+            reference = (quats, elapsed)
+        rows.append({
+            "workers": workers,
+            "chains": args.chains,
+            "solve_s": elapsed,
+            "speedup": reference[1] / elapsed,
+            "max_error": float(np.abs(quats - reference[0]).max()),
+        })
+
+    _common.print_table(rows, ["workers", "chains", "solve_s", "speedup", "max_error"])
+    if args.json:
+        _common.write_json(args.json, rows, benchmark="parallel", args=vars(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+控制器图形的求值耗时对比：旧版带线框修改器的 32 顶点圆环，与不带修改器的预生成圆环（不同分辨率）
+每组创建同样数量的图形对象，标记全部图形需要更新后计时 depsgraph 的求值，近似视图中重绘大量控制器的开销。
+
+用法：
+    blender -b --factory-startup --python benchmarks/bench_shapes.py -- --shapes 2000 --resolutions 8 16 32
+"""
+
+import argparse
+import math
+import os
+import sys
+import time
+
+import bpy
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import _common
+
+
+def legacy_shape(name, radius, vertices=32):
+    """按旧版本的方式创建圆环：只有边的网格加一个线框修改器"""
+    verts = [(radius * math.cos(2 * math.pi * i / vertices), radius * math.sin(2 * math.pi * i / vertices), 0.0)
+             for i in range(vertices)]
+    edges = [(i, (i + 1) % vertices) for i in range(vertices)]
+    mesh = bpy.data.meshes.new(name)
+    mesh.from_pydata(verts, edges, [])
+    obj = bpy.data.objects.new(name, mesh)
+    mod = obj.modifiers.new(type='WIREFRAME', name='Wire')
+    mod.thickness, mod.use_replace = 0.02, False
+    return obj
+
+
+def build(qcr, kind, resolution, count):
+    """创建 count 个图形对象并放在同一个集合中，返回对象列表"""
+    _common.reset_scene()
+    collection = bpy.context.scene.collection
+    shapes = []
+    for i in range(count):
+        name = f"shape{i:05d}"
+        radius = 0.05 + 0.001 * i
+        obj = legacy_shape(name, radius) if kind == 'LEGACY' else bpy.data.objects.new(
+            name, qcr._circle_mesh(name, radius, resolution))
+        collection.objects.link(obj)
+        obj.location = ((i % 50) * 0.2, (i // 50) * 0.2, 0.0)
+        shapes.append(obj)
+    return shapes
+
+
+def measure(shapes, repeats):
+    """反复标记图形的数据需要更新并求值 depsgraph，返回每次求值的耗时（毫秒）和求值后的总顶点数"""
+    depsgraph = bpy.context.evaluated_depsgraph_get()
+    depsgraph.update()
+    samples = []
+    for _ in range(repeats):
+        for obj in shapes:
+            obj.update_tag(refresh={'DATA'})
+        t0 = time.perf_counter()
+        depsgraph.update()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    verts = 0
+    for obj in shapes:
+        evaluated = obj.evaluated_get(depsgraph)
+        mesh = evaluated.to_mesh()
+        verts += len(mesh.vertices)
+        evaluated.to_mesh_clear()
+    return samples, verts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shapes", type=int, default=2000)
+    parser.add_argument("--resolutions", type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--json", default="")
+    args = parser.parse_args(_common.script_args())
+
+    qcr = _common.load_addon()
+    rows = []
+    for kind, resolution in [('LEGACY', 32)] + [('BAKED', r) for r in args.resolutions]:
+        shapes = build(qcr, kind, resolution, args.shapes)
+        samples, verts = measure(shapes, args.repeats)
+        row = {"shape": kind, "resolution": resolution, "evaluated_verts": verts}
+        row.update(_common.summarize(samples))
+        rows.append(row)
+
+    _common.print_table(rows, ["shape", "resolution", "evaluated_verts", "mean_ms", "p95_ms"])
+    if args.json:
+        _common.write_json(args.json, rows, benchmark="shapes", args=vars(args))
+
+
+if __name__ == "__main__":
+    main()
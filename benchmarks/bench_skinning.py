@@ -0,0 +1,95 @@
+"""
+NumPy 封套蒙皮与 Blender 自动权重（parent_set ARMATURE_AUTO）的耗时对比
+在每条细分链周围生成一根圆管网格，分别用两种方式绑定同样的网格。
+
+用法：
+    blender -b --factory-startup --python benchmarks/bench_skinning.py -- --chains 20 --segments 10 --rings 200 --sides 64
+"""
+
+import argparse
+import math
+import os
+import sys
+import time
+
+import bpy
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import _common
+
+
+def tube_mesh(name, obj, chains, rings, sides, radius=0.1):
+    """沿每条链生成圆管网格，返回网格对象"""
+    bones = obj.data.bones
+    verts, faces = [], []
+    angles = np.linspace(0.0, 2.0 * math.pi, sides, endpoint=False)
+    circle = np.stack([np.cos(angles), np.sin(angles), np.zeros(sides)], axis=1) * radius
+    for chain in chains:
+        head = np.array(bones[chain["deform"][0]].head_local)
+        tail = np.array(bones[chain["deform"][-1]].tail_local)
+        offset = sum(len(v) for v in verts)
+        t = np.linspace(0.0, 1.0, rings)[:, None, None]
+        ring_pts = head + t * (tail - head) + circle[None]
+        verts.append(ring_pts.reshape(-1, 3))
+        r, s = np.meshgrid(np.arange(rings - 1), np.arange(sides), indexing='ij')
+        a = offset + r * sides + s
+        b = offset + r * sides + (s + 1) % sides
+        faces.append(np.stack([a, b, b + sides, a + sides], axis=-1).reshape(-1, 4))
+    verts, faces = np.concatenate(verts), np.concatenate(faces)
+
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(len(verts))
+    mesh.vertices.foreach_set("co", verts.astype(np.float32).ravel())
+    mesh.loops.add(faces.size)
+    mesh.loops.foreach_set("vertex_index", faces.astype(np.int32).ravel())
+    mesh.polygons.add(len(faces))
+    mesh.polygons.foreach_set("loop_start", np.arange(0, faces.size, 4, dtype=np.int32))
+    mesh.update()
+    mesh_obj = bpy.data.objects.new(name, mesh)
+    bpy.context.scene.collection.objects.link(mesh_obj)
+    return mesh_obj
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chains", type=int, default=20)
+    parser.add_argument("--segments", type=int, default=10)
+    parser.add_argument("--rings", type=int, default=200)
+    parser.add_argument("--sides", type=int, default=64)
+    parser.add_argument("--no-auto", dest="auto", action="store_false", help="跳过自动权重（大网格时很慢）")
+    parser.add_argument("--json", default="")
+    args = parser.parse_args(_common.script_args())
+
+    qcr = _common.load_addon()
+    _common.reset_scene()
+    obj, bone_names = _common.create_armature("Rig", chains=args.chains)
+    chains = [qcr.subdivide_chain(obj, name, args.segments, 'AVERAGE') for name in bone_names]
+    bpy.ops.object.mode_set(mode='OBJECT')
+
+    rows = []
+    for use_kdtree in (False, True):
+        mesh_obj = tube_mesh("tube_envelope", obj, chains, args.rings, args.sides)
+        t0 = time.perf_counter()
+        groups, weights = qcr.envelope_skin(obj, mesh_obj, use_kdtree=use_kdtree)
+        rows.append({"method": "ENVELOPE_KD" if use_kdtree else "ENVELOPE", "verts": len(mesh_obj.data.vertices),
+                     "groups": groups, "seconds": time.perf_counter() - t0})
+
+    if args.auto:
+        mesh_obj = tube_mesh("tube_auto", obj, chains, args.rings, args.sides)
+        bpy.ops.object.select_all(action='DESELECT')
+        mesh_obj.select_set(True)
+        obj.select_set(True)
+        bpy.context.view_layer.objects.active = obj
+        t0 = time.perf_counter()
+        bpy.ops.object.parent_set(type='ARMATURE_AUTO')
+        rows.append({"method": "ARMATURE_AUTO", "verts": len(mesh_obj.data.vertices),
+                     "groups": len(mesh_obj.vertex_groups), "seconds": time.perf_counter() - t0})
+
+    _common.print_table(rows, ["method", "verts", "groups", "seconds"])
+    if args.json:
+        _common.write_json(args.json, rows, benchmark="skinning", args=vars(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+二级运动求解器内核的吞吐量测试
+只调用插件中不依赖 bpy 的 NumPy 内核，输入为合成的直链动画，不创建任何场景数据。
+
+用法：
+    blender -b --factory-startup --python benchmarks/bench_solver.py -- --chains 100 1000 5000 --segments 20 --frames 250
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import _common
+
+
+def synthetic_samples(chains, segments, frames, seed=0):
+    """生成竖直直链的采样数据，根部做随机的水平摆动"""
+    rng = np.random.default_rng(seed)
+    length = 0.1
+    # 骨骼Y轴指向世界Z轴
+    rest = np.tile(np.eye(4), (chains, segments, 1, 1))
+    rest[..., :3, :3] = [[1.0, 0.0, 0.0], [0.0, 0.0, -1.0], [0.0, 1.0, 0.0]]
+    rest[..., 2, 3] = np.arange(segments) * length
+    rest_rel = rest.copy()
+    rest_rel[:, 1:] = np.linalg.inv(rest[:, :-1]) @ rest[:, 1:]
+
+    t = np.arange(frames)[:, None]
+    phase = rng.uniform(0.0, 2.0 * np.pi, chains)[None, :]
+    root = np.zeros((frames, chains, 3))
+    root[..., 0] = 0.3 * np.sin(0.15 * t + phase)
+    pose = np.broadcast_to(rest, (frames,) + rest.shape).copy()
+    pose[..., :3, 3] += root[:, :, None, :]
+    heads = pose[..., :3, 3]
+    tails = heads + pose[..., :3, 1] * length
+    return {
+        "points": np.concatenate([heads[:, :, :1], tails], axis=2),
+        "pose": pose,
+        "root_parent": np.tile(np.eye(4), (frames, chains, 1, 1)),
+        "rest_lengths": np.full((chains, segments), length),
+        "rest_rel": rest_rel,
+        "mask": np.ones((chains, segments), dtype=bool),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chains", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--segments", type=int, default=20)
+    parser.add_argument("--frames", type=int, default=250)
+    parser.add_argument("--json", default="")
+    args = parser.parse_args(_common.script_args())
+
+    qcr = _common.load_addon()
+    rows = []
+    for chains in args.chains:
+        samples = synthetic_samples(chains, args.segments, args.frames)
+        t0 = time.perf_counter()
+        qcr.simulate_chains(samples["points"], samples["rest_lengths"], gravity=(0.0, 0.0, -9.8))
+        t1 = time.perf_counter()
+        qcr.solve_chain_rotations(samples, gravity=(0.0, 0.0, -9.8))
+        t2 = time.perf_counter()
+        rows.append({
+            "chains": chains,
+            "segments": args.segments,
+            "frames": args.frames,
+            "simulate_s": t1 - t0,
+            "full_solve_s": t2 - t1,
+            "us_per_chain_frame": (t2 - t1) / (chains * args.frames) * 1e6,
+        })
+
+    _common.print_table(rows, ["chains", "segments", "frames", "simulate_s", "full_solve_s", "us_per_chain_frame"])
+    if args.json:
+        _common.write_json(args.json, rows, benchmark="solver", args=vars(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+样条IK风格与阻尼追踪风格的逐帧求值耗时对比
+默认在 10、50、100 段下各生成一组链，所有控制骨骼使用相同的噪声动画。
+
+用法：
+    blender -b --factory-startup --python benchmarks/bench_spline_vs_damped.py -- --segments 10 50 100 --chains 10
+"""
+
+import argparse
+import os
+import sys
+
+import bpy
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import _common
+
+
+def build(qcr, style, segments, args):
+    _common.reset_scene()
+    obj, bone_names = _common.create_armature("Rig", chains=args.chains, length=4.0)
+    chains = [qcr.subdivide_chain(obj, name, segments, 'AVERAGE', add_tip=True) for name in bone_names]
+    chains = [qcr.build_fk(obj, chain) for chain in chains]
+    if style == 'SPLINE_IK':
+        chains = [qcr.apply_spline_ik(obj, chain) for chain in chains]
+    else:
+        chains = [qcr.apply_damped_track(obj, chain) for chain in chains]
+    _common.animate_controllers(obj, chains, 1, args.frames, seed=args.seed)
+    bpy.ops.object.mode_set(mode='OBJECT')
+    return obj
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--segments", type=int, nargs="+", default=[10, 50, 100])
+    parser.add_argument("--chains", type=int, default=10)
+    parser.add_argument("--frames", type=int, default=250)
+    parser.add_argument("--repeats", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", default="")
+    args = parser.parse_args(_common.script_args())
+
+    qcr = _common.load_addon()
+    rows = []
+    for segments in args.segments:
+        for style in ('DAMPED_TRACK', 'SPLINE_IK'):
+            obj = build(qcr, style, segments, args)
+            row = {"style": style, "segments": segments}
+            row.update(_common.rig_stats(obj))
+            row.update(_common.summarize(_common.measure_playback(1, args.frames, repeats=args.repeats)))
+            rows.append(row)
+
+    _common.print_table(rows, ["style", "segments", "constraints", "drivers", "mean_ms", "p95_ms"])
+    if args.json:
+        _common.write_json(args.json, rows, benchmark="spline_vs_damped", args=vars(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+顶点组拆分的耗时：逐顶点读取原权重、按原值或量化写入拆分结果
+在一根骨骼周围生成随机顶点，原顶点组权重全为 1，拆分到若干段后读回各段权重检查总和。
+
+用法：
+    blender -b --factory-startup --python benchmarks/bench_weights.py -- --verts 10000 50000 200000 600000 --segments 8
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import bpy
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import _common
+
+
+def cloud_mesh(name, obj, bone_name, count, radius=0.1, seed=0):
+    """在骨骼周围的圆柱内生成 count 个顶点的网格，全部加入与骨骼同名、权重为 1 的顶点组"""
+    bone = obj.data.bones[bone_name]
+    head, tail = np.array(bone.head_local), np.array(bone.tail_local)
+    rng = np.random.default_rng(seed)
+    t = rng.uniform(0.0, 1.0, count)[:, None]
+    angle = rng.uniform(0.0, 2.0 * np.pi, count)
+    r = radius * np.sqrt(rng.uniform(0.0, 1.0, count))
+    points = head + t * (tail - head) + np.stack([r * np.cos(angle), r * np.sin(angle), np.zeros(count)], axis=1)
+
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(count)
+    mesh.vertices.foreach_set("co", points.astype(np.float32).ravel())
+    mesh.update()
+    mesh_obj = bpy.data.objects.new(name, mesh)
+    bpy.context.scene.collection.objects.link(mesh_obj)
+    mesh_obj.vertex_groups.new(name=bone_name).add(range(count), 1.0, 'REPLACE')
+    mod = mesh_obj.modifiers.new(name="Armature", type='ARMATURE')
+    mod.object = obj
+    return mesh_obj
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--verts", type=int, nargs="+", default=[10000, 50000, 200000, 600000])
+    parser.add_argument("--segments", type=int, default=8)
+    parser.add_argument("--falloff", type=float, default=0.5)
+    parser.add_argument("--json", default="")
+    args = parser.parse_args(_common.script_args())
+
+    qcr = _common.load_addon()
+    rows = []
+    for count in args.verts:
+        for precision in ('EXACT', 'QUANTIZED'):
+            _common.reset_scene()
+            obj, bone_names = _common.create_armature("Rig", chains=1)
+            bpy.ops.object.mode_set(mode='OBJECT')
+            name = bone_names[0]
+            mesh_obj = cloud_mesh("cloud", obj, name, count)
+            bone = obj.data.bones[name]
+            targets = [f"seg.{j:03d}" for j in range(args.segments)]
+            bounds = np.linspace(0.0, 1.0, args.segments + 1)
+
+            cache = {}
+            t0 = time.perf_counter()
+            qcr.cache_source_weights(obj, [name], cache)
+            read_s = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            qcr.split_vertex_groups(obj, name, bone.head_local, bone.tail_local, targets, bounds, args.falloff,
+                                    cache, qcr.WEIGHT_PRECISION_QUANTUM[precision])
+            split_s = time.perf_counter() - t0
+
+            # 一次遍历读回全部目标组
+            t0 = time.perf_counter()
+            weights = qcr._read_group_weights(mesh_obj, [mesh_obj.vertex_groups[n] for n in targets])
+            read_targets_s = time.perf_counter() - t0
+            rows.append({
+                "verts": count,
+                "precision": precision,
+                "read_s": read_s,
+                "split_s": split_s,
+                "read_all_s": read_targets_s,
+                "max_sum_error": float(np.abs(weights.sum(axis=1) - 1.0).max()),
+            })
+
+    _common.print_table(rows, ["verts", "precision", "read_s", "split_s", "read_all_s", "max_sum_error"])
+    if args.json:
+        _common.write_json(args.json, rows, benchmark="weights", args=vars(args))
+
+
+if __name__ == "__main__":
+    main()
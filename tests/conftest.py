@@ -0,0 +1,69 @@
+"""
+测试公共工具
+插件文件在模块顶层导入 bpy，不能在 Blender 之外直接导入。二级运动求解器内核只依赖 NumPy，
+这里按源码中的分段注释截取该段单独加载，不需要 Blender，也不替换任何模块。
+核心API中只依赖 NumPy 的辅助函数按函数名单独加载。
+"""
+
+import ast
+import os
+import sys
+import types
+
+import numpy as np
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ADDON_PATH = os.path.join(REPO_DIR, "Quick Cartilage Rigging.py")
+SOLVER_BEGIN = "# --- 二级运动求解器 ---"
+SOLVER_END = "# 以下为与 Blender 数据交互的部分"
+MODULE_NAME = "cartilage_solver"
+# 只依赖 NumPy 的核心API辅助函数
+HELPER_NAMES = (
+    "density_bounds", "split_weights_along_axis", "segment_distances", "top_k_weights",
+    "resample_polyline", "resample_polylines", "mesh_islands", "island_centerlines", "reduce_keys",
+    "split_numbered_name", "get_unique_base_name", "unique_base_names", "orient_polylines",
+)
+
+
+def load_solver():
+    """把插件中求解器段的顶层语句编译成独立模块，返回模块对象"""
+    with open(ADDON_PATH, encoding="utf-8") as f:
+        source = f.read()
+    lines = source.splitlines()
+    begin = lines.index(SOLVER_BEGIN) + 1
+    end = lines.index(SOLVER_END) + 1
+    tree = ast.parse(source, ADDON_PATH)
+    body = [node for node in tree.body if begin < node.lineno < end]
+
+    module = types.ModuleType(MODULE_NAME)
+    module.__dict__.update(np=np, os=os, sys=sys)
+    sys.modules[MODULE_NAME] = module
+    exec(compile(ast.Module(body=body, type_ignores=[]), ADDON_PATH, "exec"), module.__dict__)
+    return module
+
+
+def load_functions(names, module_name="cartilage_helpers"):
+    """只加载插件中指定名称的顶层函数，返回模块对象"""
+    with open(ADDON_PATH, encoding="utf-8") as f:
+        source = f.read()
+    tree = ast.parse(source, ADDON_PATH)
+    body = [node for node in tree.body if isinstance(node, ast.FunctionDef) and node.name in names]
+    missing = set(names) - {node.name for node in body}
+    if missing:
+        raise LookupError(f"插件中没有函数: {', '.join(sorted(missing))}")
+
+    module = types.ModuleType(module_name)
+    module.__dict__.update(np=np)
+    exec(compile(ast.Module(body=body, type_ignores=[]), ADDON_PATH, "exec"), module.__dict__)
+    return module
+
+
+@pytest.fixture(scope="session")
+def solver():
+    return load_solver()
+
+
+@pytest.fixture(scope="session")
+def helpers():
+    return load_functions(HELPER_NAMES)
@@ -0,0 +1,222 @@
+"""
+核心API中只依赖 NumPy 的辅助函数的测试，不需要 Blender
+"""
+
+import numpy as np
+import pytest
+
+
+def strip_mesh(origin, direction, rows, width=0.02, step=0.05):
+    """沿 direction 生成一条 2 × rows 个顶点的网格带，返回 (顶点, 边)"""
+    direction = np.asarray(direction, dtype=np.float64)
+    side = np.cross(direction, [0.0, 0.0, 1.0] if abs(direction[2]) < 0.9 else [1.0, 0.0, 0.0])
+    side *= width / np.linalg.norm(side)
+    along = np.asarray(origin) + np.arange(rows)[:, None] * step * direction
+    points = np.concatenate([along, along + side])
+    left, right = np.arange(rows), np.arange(rows) + rows
+    edges = np.concatenate([
+        np.stack([left[:-1], left[1:]], axis=1),
+        np.stack([right[:-1], right[1:]], axis=1),
+        np.stack([left, right], axis=1),
+    ])
+    return points, edges
+
+
+def test_reduce_keys_within_tolerance(helpers):
+    frames = np.arange(200, dtype=np.float64)
+    rng = np.random.default_rng(0)
+    values = np.stack([np.sin(frames * 0.05), np.cos(frames * 0.03), 0.3 * np.sin(frames * 0.02)])
+    values += rng.normal(scale=1e-3, size=values.shape)
+    tolerance = 0.01
+    keep = helpers.reduce_keys(frames, values, tolerance)
+    assert keep[0] and keep[-1]
+    assert keep.sum() < len(frames) // 2
+    rebuilt = np.stack([np.interp(frames, frames[keep], channel[keep]) for channel in values])
+    assert np.abs(rebuilt - values).max() <= tolerance
+
+
+def test_reduce_keys_linear_keeps_endpoints(helpers):
+    frames = np.arange(50, dtype=np.float64)
+    keep = helpers.reduce_keys(frames, np.stack([2.0 * frames, -frames]), 1e-6)
+    assert np.flatnonzero(keep).tolist() == [0, 49]
+
+
+def test_reduce_keys_quaternion_angle(helpers):
+    frames = np.arange(120, dtype=np.float64)
+    angle = 1.5 * np.sin(frames * 0.07)
+    quats = np.stack([np.cos(angle / 2), np.zeros_like(angle), np.zeros_like(angle), np.sin(angle / 2)])
+    tolerance = np.radians(0.5)
+    keep = helpers.reduce_keys(frames, quats, tolerance, quaternion=True)
+    rebuilt = np.stack([np.interp(frames, frames[keep], channel[keep]) for channel in quats])
+    rebuilt /= np.linalg.norm(rebuilt, axis=0)
+    error = 2.0 * np.arccos(np.clip(np.abs((rebuilt * quats).sum(axis=0)), 0.0, 1.0))
+    assert error.max() <= tolerance + 1e-9
+    assert keep.sum() < len(frames)
+
+
+def test_segment_distances_matches_brute_force(helpers):
+    rng = np.random.default_rng(1)
+    points = rng.normal(size=(40, 3))
+    heads = rng.normal(size=(5, 3))
+    tails = heads + rng.normal(size=(5, 3))
+    expected = np.empty((40, 5))
+    for j in range(5):
+        axis = tails[j] - heads[j]
+        t = np.clip((points - heads[j]) @ axis / (axis @ axis), 0.0, 1.0)
+        expected[:, j] = np.linalg.norm(points - heads[j] - t[:, None] * axis, axis=1)
+    np.testing.assert_allclose(helpers.segment_distances(points, heads, tails), expected, atol=1e-9)
+
+
+@pytest.mark.parametrize("max_influences", [1, 3, 8])
+def test_top_k_weights_normalised(helpers, max_influences):
+    rng = np.random.default_rng(2)
+    vertex_count, bone_count = 60, 6
+    points = rng.normal(size=(vertex_count, 3))
+    heads = rng.normal(size=(bone_count, 3))
+    dists = helpers.segment_distances(points, heads, heads + rng.normal(size=(bone_count, 3)))
+    verts = np.repeat(np.arange(vertex_count), bone_count)
+    bones = np.tile(np.arange(bone_count), vertex_count)
+    order = rng.permutation(len(verts))
+    out_verts, out_bones, weights = helpers.top_k_weights(verts[order], bones[order], dists.ravel()[order],
+                                                          vertex_count, max_influences)
+    np.testing.assert_allclose(np.bincount(out_verts, weights, minlength=vertex_count), 1.0)
+    assert np.bincount(out_verts, minlength=vertex_count).max() == min(max_influences, bone_count)
+    # 保留的是每个顶点最近的几根骨骼
+    nearest = np.sort(dists, axis=1)[:, min(max_influences, bone_count) - 1]
+    assert np.all(dists[out_verts, out_bones] <= nearest[out_verts])
+
+
+def test_resample_polyline_arc_length(helpers):
+    points = [(0.0, 0.0, 0.0), (1.0, 0.0, 0.0), (1.0, 0.0, 0.0), (1.0, 3.0, 0.0)]
+    out = helpers.resample_polyline(points, [0.0, 0.25, 0.5, 1.0])
+    np.testing.assert_allclose(out[0], points[0])
+    np.testing.assert_allclose(out[-1], points[-1])
+    np.testing.assert_allclose(out[1], (1.0, 0.0, 0.0))
+    np.testing.assert_allclose(out[2], (1.0, 1.0, 0.0))
+
+
+def test_density_bounds_monotonic_and_denser_where_vertices_are(helpers):
+    rng = np.random.default_rng(3)
+    # 前 20% 的顶点密度是其余部分的 10 倍
+    t = np.concatenate([rng.uniform(0.0, 0.2, 2000), rng.uniform(0.2, 1.0, 800)])
+    bounds = helpers.density_bounds(t, None, 8)
+    assert bounds.shape == (9,)
+    assert bounds[0] == 0.0 and bounds[-1] == 1.0
+    assert np.all(np.diff(bounds) > 0.0)
+    lengths = np.diff(bounds)
+    assert lengths[0] < lengths[-1]
+
+
+def test_density_bounds_empty_is_uniform(helpers):
+    np.testing.assert_allclose(helpers.density_bounds(np.zeros(0), None, 4), np.linspace(0.0, 1.0, 5))
+
+
+def test_mesh_islands_labels_disjoint_strips(helpers):
+    parts = [strip_mesh((x, 0.0, 0.0), (0.0, 0.0, -1.0), rows) for x, rows in ((0.0, 8), (1.0, 12), (2.0, 5))]
+    offsets = np.cumsum([0] + [len(p) for p, _ in parts])
+    points = np.concatenate([p for p, _ in parts])
+    edges = np.concatenate([e + offset for (_, e), offset in zip(parts, offsets)])
+    # 打乱顶点编号，岛不再是连续的编号区间
+    perm = np.random.default_rng(4).permutation(len(points))
+    inverse = np.argsort(perm)
+    labels = helpers.mesh_islands(len(points), inverse[edges])[inverse]
+    truth = np.repeat(np.arange(len(parts)), np.diff(offsets))
+    assert len(np.unique(labels)) == len(parts)
+    for island in range(len(parts)):
+        assert len(np.unique(labels[truth == island])) == 1
+
+
+def test_island_centerlines_span_each_strip(helpers):
+    parts = [strip_mesh((0.0, 0.0, 0.0), (0.0, 0.0, -1.0), 11), strip_mesh((1.0, 0.0, 0.0), (1.0, 0.0, 0.0), 21)]
+    points = np.concatenate([p for p, _ in parts])
+    labels = np.repeat([0, 1], [len(p) for p, _ in parts])
+    lines = helpers.island_centerlines(points, labels, bins=8)
+    assert len(lines) == 2
+    for (strip, _), line in zip(parts, lines):
+        axis = strip[1] - strip[0]
+        axis /= np.linalg.norm(axis)
+        t = strip @ axis
+        ends = sorted(line[[0, -1]] @ axis)
+        np.testing.assert_allclose(ends, [t.min(), t.max()], atol=1e-9)
+
+
+@pytest.mark.parametrize("falloff", [0.0, 0.5, 1.0])
+def test_split_weights_along_axis_partitions_weight(helpers, falloff):
+    rng = np.random.default_rng(5)
+    points = rng.uniform(-0.1, 1.1, size=(300, 3))
+    weights = rng.uniform(0.0, 1.0, 300)
+    bounds = np.array([0.0, 0.1, 0.35, 0.7, 1.0])
+    verts, segs, values = helpers.split_weights_along_axis(points, weights, (0.0, 0.0, 0.0), (1.0, 0.0, 0.0),
+                                                           bounds, falloff)
+    assert segs.min() >= 0 and segs.max() <= len(bounds) - 2
+    assert np.all(values >= 0.0)
+    np.testing.assert_allclose(np.bincount(verts, values, minlength=300), weights)
+    if falloff == 0.0:
+        assert np.all(np.bincount(verts, values > 0.0, minlength=300) <= 1)
+
+
+def test_resample_polylines_matches_single(helpers):
+    rng = np.random.default_rng(6)
+    polylines = [np.cumsum(rng.normal(size=(n, 3)), axis=0) for n in (2, 5, 17, 40)]
+    # 重合的点不影响弧长
+    polylines[2] = np.insert(polylines[2], 3, polylines[2][3], axis=0)
+    fractions = np.concatenate([[0.0], np.sort(rng.uniform(0.0, 1.0, 7)), [1.0]])
+    out = helpers.resample_polylines(polylines, fractions)
+    assert out.shape == (len(polylines), len(fractions), 3)
+    for points, joints in zip(polylines, out):
+        np.testing.assert_allclose(joints, helpers.resample_polyline(points, fractions), atol=1e-9)
+    assert helpers.resample_polylines([], fractions).shape == (0, len(fractions), 3)
+
+
+class Bone:
+    def __init__(self, name):
+        self.name = name
+
+
+def test_unique_base_names_matches_sequential(helpers):
+    bones = [Bone(name) for name in ("hair.001", "hair.002", "hair_2.001", "hair_3", "hair.tip", "body")]
+    count = 6
+    expected = []
+    for _ in range(count):
+        base_name = helpers.get_unique_base_name("hair", bones)
+        expected.append(base_name)
+        bones += [Bone(f"{base_name}.001"), Bone(f"{base_name}.002")]
+    assert helpers.unique_base_names("hair", count, bones[:6]) == expected
+    assert expected[:3] == ["hair_1", "hair_3", "hair_4"]
+
+
+def test_orient_polylines(helpers):
+    up = np.array([[0.0, 0.0, 0.0], [0.0, 0.0, 1.0]])
+    down = up[::-1]
+    oriented = helpers.orient_polylines([up, down])
+    assert all(line[0, 2] == 1.0 for line in oriented)
+    oriented = helpers.orient_polylines([up, down], root_hint=(0.0, 0.0, -1.0))
+    assert all(line[0, 2] == 0.0 for line in oriented)
+    assert helpers.orient_polylines([]) == []
+
+
+def test_mesh_chains_pipeline_thousand_islands(helpers):
+    """chains_from_mesh 中不依赖 bpy 的部分在 1000 个岛上的结果，命名只遍历一次已有骨骼"""
+    islands, rows, segments = 1000, 12, 6
+    columns = 40
+    parts = [strip_mesh(((i % columns) * 0.1, (i // columns) * 0.1, 1.0), (0.0, 0.0, -1.0), rows)
+             for i in range(islands)]
+    offsets = np.cumsum([0] + [len(p) for p, _ in parts])
+    points = np.concatenate([p for p, _ in parts])
+    edges = np.concatenate([e + offset for (_, e), offset in zip(parts, offsets)])
+
+    labels = helpers.mesh_islands(len(points), edges)
+    lines = helpers.orient_polylines(helpers.island_centerlines(points, labels, bins=8))
+    assert len(lines) == islands
+    fractions = np.linspace(0.0, 1.0, segments + 1)
+    joints = helpers.resample_polylines(lines, fractions)
+    assert joints.shape == (islands, segments + 1, 3)
+    # 每条链从网格带顶端开始、到底端结束
+    np.testing.assert_allclose(joints[:, 0, 2], 1.0, atol=1e-9)
+    np.testing.assert_allclose(joints[:, -1, 2], 1.0 - (rows - 1) * 0.05, atol=1e-9)
+
+    # 骨架上已有 500 条 strip 链，每条 segments 根骨骼
+    bones = [Bone(f"strip{'' if k == 0 else f'_{k}'}.{j:03d}") for k in range(500) for j in range(1, segments + 1)]
+    names = helpers.unique_base_names("strip", islands, bones)
+    assert len(set(names)) == islands
+    assert names[0] == "strip_500" and names[-1] == f"strip_{500 + islands - 1}"
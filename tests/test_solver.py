@@ -0,0 +1,97 @@
+"""
+二级运动求解器 NumPy 内核的测试，不需要 Blender
+"""
+
+import numpy as np
+import pytest
+
+LENGTH = 0.1
+
+
+def chain_samples(chains, segments, frames, axis=(0.0, 0.0, 1.0), sway=0.0, seed=0):
+    """生成沿 axis 方向的直链采样数据，sway 不为 0 时根部沿 X 做随机相位的摆动"""
+    rng = np.random.default_rng(seed)
+    y_axis = np.asarray(axis, dtype=np.float64)
+    x_axis = np.cross(y_axis, [0.0, 1.0, 0.0] if abs(y_axis[1]) < 0.9 else [1.0, 0.0, 0.0])
+    x_axis /= np.linalg.norm(x_axis)
+    z_axis = np.cross(x_axis, y_axis)
+    rest = np.tile(np.eye(4), (chains, segments, 1, 1))
+    rest[..., :3, :3] = np.stack([x_axis, y_axis, z_axis], axis=1)
+    rest[..., :3, 3] = np.arange(segments)[:, None] * LENGTH * y_axis
+    rest_rel = rest.copy()
+    rest_rel[:, 1:] = np.linalg.inv(rest[:, :-1]) @ rest[:, 1:]
+
+    t = np.arange(frames)[:, None]
+    phase = rng.uniform(0.0, 2.0 * np.pi, chains)[None, :]
+    pose = np.broadcast_to(rest, (frames,) + rest.shape).copy()
+    pose[..., 0, 3] += (sway * np.sin(0.3 * t + phase))[:, :, None]
+    heads = pose[..., :3, 3]
+    tails = heads + pose[..., :3, 1] * LENGTH
+    return {
+        "points": np.concatenate([heads[:, :, :1], tails], axis=2),
+        "pose": pose,
+        "root_parent": np.tile(np.eye(4), (frames, chains, 1, 1)),
+        "rest_lengths": np.full((chains, segments), LENGTH),
+        "rest_rel": rest_rel,
+        "mask": np.ones((chains, segments), dtype=bool),
+    }
+
+
+def quaternion_matrix(q):
+    """wxyz 四元数转旋转矩阵"""
+    w, x, y, z = q
+    return np.array([
+        [1 - 2 * (y * y + z * z), 2 * (x * y - w * z), 2 * (x * z + w * y)],
+        [2 * (x * y + w * z), 1 - 2 * (x * x + z * z), 2 * (y * z - w * x)],
+        [2 * (x * z - w * y), 2 * (y * z + w * x), 1 - 2 * (x * x + y * y)],
+    ])
+
+
+def test_static_chain_solves_to_identity(solver):
+    samples = chain_samples(chains=3, segments=6, frames=20)
+    quats = solver.solve_chain_rotations(samples)
+    assert quats.shape == (20, 3, 6, 4)
+    np.testing.assert_allclose(quats, np.broadcast_to([1.0, 0.0, 0.0, 0.0], quats.shape), atol=1e-6)
+
+
+def test_gravity_only_chain_hangs_down(solver):
+    samples = chain_samples(chains=2, segments=5, frames=600, axis=(1.0, 0.0, 0.0))
+    points = solver.simulate_chains(samples["points"], samples["rest_lengths"], stiffness=0.0, damping=0.2,
+                                    gravity=(0.0, 0.0, -9.8), pinned=1)
+    seg = points[-1, :, 1:] - points[-1, :, :-1]
+    length = np.linalg.norm(seg, axis=-1)
+    np.testing.assert_allclose(length, LENGTH, rtol=1e-6)
+    np.testing.assert_allclose(points[-1, :, 0], samples["points"][-1, :, 0])
+    assert np.all(seg[..., 2] / length < -0.99)
+
+
+@pytest.mark.parametrize("axis", [
+    (1.0, 0.0, 0.0), (0.0, 1.0, 0.0), (0.0, 0.0, 1.0),
+    (1.0, 1.0, 0.0), (1.0, -1.0, 0.0), (0.0, 1.0, -1.0), (-1.0, 0.0, 1.0), (1.0, -2.0, 3.0),
+])
+def test_matrices_to_quaternions_half_turn(solver, axis):
+    axis = np.asarray(axis) / np.linalg.norm(axis)
+    half_turn = 2.0 * np.outer(axis, axis) - np.eye(3)
+    q = solver.matrices_to_quaternions(half_turn[None])[0]
+    assert abs(q[0]) < 1e-7
+    np.testing.assert_allclose(np.abs(q[1:]), np.abs(axis), atol=1e-7)
+    np.testing.assert_allclose(quaternion_matrix(q), half_turn, atol=1e-7)
+
+
+def test_matrices_to_quaternions_round_trip(solver):
+    rng = np.random.default_rng(1)
+    quats = rng.normal(size=(500, 4))
+    quats /= np.linalg.norm(quats, axis=1, keepdims=True)
+    quats[quats[:, 0] < 0] *= -1.0
+    mats = np.array([quaternion_matrix(q) for q in quats])
+    np.testing.assert_allclose(solver.matrices_to_quaternions(mats), quats, atol=1e-7)
+
+
+def test_parallel_matches_serial(solver):
+    chains = 2 * solver.PARALLEL_MIN_CHAINS
+    samples = chain_samples(chains=chains, segments=5, frames=40, sway=0.2, seed=3)
+    args = dict(stiffness=0.3, damping=0.1, gravity=(0.0, 0.0, -9.8))
+    serial = solver.solve_chain_rotations(samples, **args).astype(np.float32)
+    parallel = solver.solve_chain_rotations_parallel(samples, workers=2, **args)
+    assert parallel.dtype == np.float32
+    np.testing.assert_allclose(parallel, serial, atol=1e-6)